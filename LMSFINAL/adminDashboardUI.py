@@ -6,8 +6,10 @@ from datetime import timedelta
 from book_management_ui import create_book_management_ui
 from user_management_ui import create_user_management_ui, get_current_user_table, open_add_user_modal
 from transactions_ui import create_transactions_ui, get_transaction_list_frame, display_recent_transactions
+from telemetry_ui import toggle_telemetry_overlay
 
 # Use API client as the single source of truth
+from api_client import aio, telemetry
 from api_client import (
     get_books as api_get_books,
     create_book as api_create_book,
@@ -18,8 +20,11 @@ from api_client import (
     update_user as api_update_user,
     delete_user as api_delete_user,
     get_loans as api_get_loans,
+    iter_loans as api_iter_loans,
     create_loan as api_create_loan,
-    return_loan as api_return_loan,
+    bulk_create_loans as api_bulk_create_loans,
+    return_loan_by_book as api_return_loan_by_book,
+    lookup_user as api_lookup_user,
 )
 
 
@@ -27,75 +32,25 @@ def get_books():
     return api_get_books()
 
 
-def get_overdue_books():
-    loans = api_get_loans()
-    today = datetime.datetime.now().date()
-    overdue = [l for l in loans if l.get('status') == 'borrowed' and l.get('due_date') and datetime.datetime.fromisoformat(l['due_date']).date() < today]
-    return overdue
-
-
 def borrow_book(book_id_or_isbn, student_identifier=None):
     # student_identifier: can be user id (int) or username/email
     # book_id_or_isbn: can be book id (int) or ISBN string
-    
-    # Find book by ID or ISBN
-    books = api_get_books()
-    book = None
-    try:
-        # Try as book ID first
-        bid = int(book_id_or_isbn)
-        book = next((b for b in books if b['id'] == bid), None)
-    except ValueError:
-        # Try as ISBN
-        book = next((b for b in books if b.get('isbn') == book_id_or_isbn), None)
-    
-    if not book:
-        raise Exception(f"Book not found: {book_id_or_isbn}")
-    
-    if book.get('available', 0) <= 0:
-        raise Exception(f"Book '{book.get('title')}' is not available")
-    
-    payload = {'book': book['id']}
+    # The server resolves both and checks availability in the same request
+    payload = {'book': book_id_or_isbn}
     if student_identifier:
-        # try to determine user id
-        try:
-            payload['user'] = int(student_identifier)
-        except ValueError:
-            # try to resolve by username/email
-            users = api_get_users()
-            found = None
-            for u in users:
-                if u.get('username') == student_identifier or u.get('email') == student_identifier:
-                    found = u
-                    break
-            if found:
-                payload['user'] = found['id']
-            else:
-                raise Exception(f"User not found: {student_identifier}")
+        payload['user'] = student_identifier
     api_create_loan(payload)
     return True
 
 
+def borrow_books(items):
+    # items: list of (book_id_or_isbn, student_identifier) pairs, checked out in one request
+    return api_bulk_create_loans([{'book': book, 'user': student} for book, student in items])
+
+
 def return_book(book_id_or_isbn):
-    # find active loan for the book by ID or ISBN
-    books = api_get_books()
-    book = None
-    try:
-        # Try as book ID first
-        bid = int(book_id_or_isbn)
-        book = next((b for b in books if b['id'] == bid), None)
-    except ValueError:
-        # Try as ISBN
-        book = next((b for b in books if b.get('isbn') == book_id_or_isbn), None)
-    
-    if not book:
-        raise Exception(f"Book not found: {book_id_or_isbn}")
-    
-    loans = api_get_loans()
-    active = next((l for l in loans if l.get('book') == book['id'] and l.get('status') == 'borrowed'), None)
-    if not active:
-        raise Exception(f"No active loan found for book '{book.get('title')}'")
-    api_return_loan(active['id'])
+    # The server finds the book's active loan by ID or ISBN and returns it
+    api_return_loan_by_book(book_id_or_isbn)
     return True
 
 
@@ -121,17 +76,11 @@ def delete_student(user_id):
 
 
 def get_student_borrowed_books(name_or_id):
-    users = api_get_users()
-    user = None
     try:
-        uid = int(name_or_id)
-        user = next((u for u in users if u['id'] == uid), None)
+        user = api_lookup_user(name_or_id)
     except Exception:
-        user = next((u for u in users if u.get('username') == name_or_id or u.get('email') == name_or_id), None)
-    if not user:
         return []
-    loans = api_get_loans()
-    return [l for l in loans if l.get('user') == user['id'] and l.get('status') == 'borrowed']
+    return api_get_loans(user_id=user['id'], status='borrowed')
 
 
 def get_student_overdue_books(name_or_id):
@@ -362,36 +311,16 @@ def open_main_ui(username, role="admin"):
     stats_frame = tk.Frame(dashboard_scrollable, bg="#f5f7fa")
     stats_frame.pack(fill="x", pady=(0, 20), padx=10)
 
-    # Variables to hold the dashboard labels for dynamic updates
-    try:
-        total_books = len(get_books())
-    except Exception:
-        total_books = 0
-    
-    try:
-        total_users = len(get_students())
-    except Exception:
-        total_users = 0
-    
-    try:
-        overdue_count = len(get_overdue_books())
-    except Exception:
-        overdue_count = 0
-    
-    try:
-        all_loans = api_get_loans()
-        checked_out_count = len([l for l in all_loans if l.get('status') == 'borrowed'])
-    except Exception:
-        checked_out_count = 0
-    
-    total_books_label = create_card(stats_frame, "Total Books", total_books, "#5d5fef", "📚", "In library collection",
-                                    "#27ae60")
-    total_users_label = create_card(stats_frame, "Total Users", total_users, "#00b894", "👥", "Registered users",
-                                    "#27ae60")
-    overdue_label = create_card(stats_frame, "Overdue Books", overdue_count, "#d63031", "⏰",
+    # Variables to hold the dashboard labels for dynamic updates; filled in
+    # by refresh_all_data() once the stats request returns
+    total_books_label = create_card(stats_frame, "Total Books", "—", "#5d5fef", "📚",
+                                    "In library collection", "#27ae60")
+    total_users_label = create_card(stats_frame, "Total Users", "—", "#00b894", "👥",
+                                    "Registered users", "#27ae60")
+    overdue_label = create_card(stats_frame, "Overdue Books", "—", "#d63031", "⏰",
                                 "Need attention", "#d63031")
-    checked_out_label = create_card(stats_frame, "Currently Checked Out", checked_out_count, "#f39c12", "📤",
-                                    "Active loans", "#27ae60")
+    checked_out_label = create_card(stats_frame, "Currently Checked Out", "—", "#f39c12",
+                                    "📤", "Active loans", "#27ae60")
 
     # Main Content Area (Graph and Quick Actions)
     main_content_frame = tk.Frame(dashboard_scrollable, bg="#f5f7fa")
@@ -412,52 +341,57 @@ def open_main_ui(username, role="admin"):
     activity_container = tk.Frame(activity_card, bg="white")
     activity_container.pack(fill="both", expand=True)
     
-    try:
-        loans = api_get_loans()
-        # Sort by borrow_date, most recent first
-        sorted_loans = sorted(loans, key=lambda x: x.get('borrow_date', ''), reverse=True)[:10]
+    def show_recent_activity(loans):
+        for widget in activity_container.winfo_children():
+            widget.destroy()
+        if isinstance(loans, Exception):
+            tk.Label(activity_container, text=f"Error loading activity: {loans}", bg="white", fg="#e74c3c",
+                     font=("Segoe UI", 10)).pack(pady=10)
+            return
+        try:
+            sorted_loans = sorted(loans, key=lambda x: x.get('borrow_date', ''), reverse=True)
         
-        if not sorted_loans:
-            tk.Label(activity_container, text="No recent activity.", bg="white", fg="#7f8c8d",
-                    font=("Segoe UI", 11)).pack(pady=10)
-        else:
-            for loan in sorted_loans:
-                item_frame = tk.Frame(activity_container, bg="white", pady=5)
-                item_frame.pack(fill="x")
+            if not sorted_loans:
+                tk.Label(activity_container, text="No recent activity.", bg="white", fg="#7f8c8d",
+                        font=("Segoe UI", 11)).pack(pady=10)
+            else:
+                for loan in sorted_loans:
+                    item_frame = tk.Frame(activity_container, bg="white", pady=5)
+                    item_frame.pack(fill="x")
                 
-                username = loan.get('username', f"User {loan.get('user')}")
-                book_title = loan.get('book_title', 'Unknown Book')
-                status = loan.get('status', 'unknown')
-                date = loan.get('borrow_date', '')
+                    username = loan.get('username', f"User {loan.get('user')}")
+                    book_title = loan.get('book_title', 'Unknown Book')
+                    status = loan.get('status', 'unknown')
+                    date = loan.get('borrow_date', '')
                 
-                if status == 'borrowed':
-                    icon = "📤"
-                    action = "Borrowed"
-                    color = "#3498db"
-                elif status == 'returned':
-                    icon = "↩️"
-                    action = "Returned"
-                    color = "#2ecc71"
-                else:
-                    icon = "📋"
-                    action = status.title()
-                    color = "#7f8c8d"
+                    if status == 'borrowed':
+                        icon = "📤"
+                        action = "Borrowed"
+                        color = "#3498db"
+                    elif status == 'returned':
+                        icon = "↩️"
+                        action = "Returned"
+                        color = "#2ecc71"
+                    else:
+                        icon = "📋"
+                        action = status.title()
+                        color = "#7f8c8d"
                 
-                tk.Label(item_frame, text=icon, bg="white", fg=color, font=("Segoe UI", 12)).pack(side="left", padx=5)
-                text_frame = tk.Frame(item_frame, bg="white")
-                text_frame.pack(side="left", fill="x", expand=True)
-                tk.Label(text_frame, text=f"{username} {action.lower()} '{book_title}'", bg="white", fg="#2c3e50",
-                        font=("Segoe UI", 10, "bold")).pack(anchor="w")
-                if date:
-                    try:
-                        formatted_date = datetime.datetime.fromisoformat(date).strftime('%b %d, %Y')
-                        tk.Label(text_frame, text=formatted_date, bg="white", fg="#7f8c8d",
-                                font=("Segoe UI", 9)).pack(anchor="w")
-                    except:
-                        pass
-    except Exception as e:
-        tk.Label(activity_container, text=f"Error loading activity: {e}", bg="white", fg="#e74c3c",
-                font=("Segoe UI", 10)).pack(pady=10)
+                    tk.Label(item_frame, text=icon, bg="white", fg=color, font=("Segoe UI", 12)).pack(side="left", padx=5)
+                    text_frame = tk.Frame(item_frame, bg="white")
+                    text_frame.pack(side="left", fill="x", expand=True)
+                    tk.Label(text_frame, text=f"{username} {action.lower()} '{book_title}'", bg="white", fg="#2c3e50",
+                            font=("Segoe UI", 10, "bold")).pack(anchor="w")
+                    if date:
+                        try:
+                            formatted_date = datetime.datetime.fromisoformat(date).strftime('%b %d, %Y')
+                            tk.Label(text_frame, text=formatted_date, bg="white", fg="#7f8c8d",
+                                    font=("Segoe UI", 9)).pack(anchor="w")
+                        except:
+                            pass
+        except Exception as e:
+            tk.Label(activity_container, text=f"Error loading activity: {e}", bg="white", fg="#e74c3c",
+                    font=("Segoe UI", 10)).pack(pady=10)
 
     # Right Column (Quick Actions - 30% width)
     right_col = tk.Frame(main_content_frame, bg="#f5f7fa", width=300)
@@ -498,25 +432,23 @@ def open_main_ui(username, role="admin"):
     # Removed Reports button here
 
     # ---------------- Common Refresh Function (Updated to use new labels) ----------------
+    def show_dashboard(results):
+        stats = results['stats'] if not isinstance(results['stats'], Exception) else {}
+        total_books_label.config(text=stats.get('total_books', "—"))
+        total_users_label.config(text=stats.get('total_users', "—"))
+        overdue_label.config(text=stats.get('overdue', "—"))
+        checked_out_label.config(text=stats.get('checked_out', "—"))
+        show_recent_activity(results['loans'])
+
+    @telemetry.screen('Admin Dashboard')
     def refresh_all_data():
-        # 1. Update Dashboard Stats
-        try:
-            total_books_label.config(text=len(api_get_books()))
-        except Exception:
-            total_books_label.config(text="—")
-        try:
-            total_users_label.config(text=len(api_get_users()))
-        except Exception:
-            total_users_label.config(text="—")
-        try:
-            overdue_label.config(text=len(get_overdue_books()))
-        except Exception:
-            overdue_label.config(text="—")
-        try:
-            all_loans = api_get_loans()
-            checked_out_label.config(text=len([l for l in all_loans if l.get('status') == 'borrowed']))
-        except Exception:
-            checked_out_label.config(text="—")
+        # 1. Update Dashboard Stats and Recent Activity. Both requests run in
+        # parallel, off the Tk thread; loans come back newest first, so the
+        # first page is all the activity list needs
+        aio.run_in_tk(activity_container, aio.gather(
+            stats=aio.get_dashboard_stats(),
+            loans=aio.first_page(aio.iter_loans(page_size=10)),
+        ), show_dashboard)
 
         # 2. Refresh Tables (if visible)
         if students_frame.winfo_viewable():
@@ -581,6 +513,23 @@ def open_main_ui(username, role="admin"):
         except Exception as e:
             messagebox.showerror("Error", f"Checkout failed: {e}")
 
+    def handle_bulk_borrow_logic(items):
+        # Returns the items that were not checked out
+        try:
+            response = borrow_books(items)
+        except Exception as e:
+            messagebox.showerror("Error", f"Batch checkout failed: {e}")
+            return items
+        failed = [r for r in response['results'] if not r['ok']]
+        failures = [f"Line {r['index'] + 1} ({items[r['index']][0]}): {r['error']}" for r in failed]
+        summary = f"{response['succeeded']} of {len(items)} books checked out."
+        if failures:
+            messagebox.showwarning("Batch Checkout", summary + "\n\n" + "\n".join(failures[:15]))
+        else:
+            messagebox.showinfo("Success", summary)
+        refresh_all_data()
+        return [items[r['index']] for r in failed]
+
     def handle_return_logic(book_id):
         try:
             return_book(book_id)
@@ -603,11 +552,16 @@ def open_main_ui(username, role="admin"):
     create_transactions_ui(
         transactions_frame,
         get_books_func=get_books,
-        get_borrow_records_func=lambda: api_get_loans(),
+        # Only the recent transactions are shown, so fetch their page, not every loan
+        get_borrow_records_func=lambda: next(api_iter_loans(page_size=5), []),
         borrow_cmd=handle_borrow_logic,
-        return_cmd=handle_return_logic
+        return_cmd=handle_return_logic,
+        bulk_borrow_cmd=handle_bulk_borrow_logic
     )
 
+    # F12 shows what every screen asks the server for, and how long it takes
+    app.bind_all("<F12>", lambda event: toggle_telemetry_overlay(app))
+
     # Load dashboard first
     refresh_all_data()
     app.mainloop()
@@ -0,0 +1,480 @@
+import atexit
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, Any, Iterator
+
+from . import telemetry
+
+API_BASE = "http://127.0.0.1:8000/api"
+
+# Rows requested per page from the cursor-paginated list endpoints
+DEFAULT_PAGE_SIZE = 100
+
+# Connections kept open to the server; more than the number of threads that
+# call the API at once only wastes sockets
+POOL_SIZE = 10
+# Seconds to wait for the server to accept a connection, and for a response
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+# Bulk checkouts/returns and the first recommendation request after a server
+# start (which builds the model) can take much longer
+SLOW_READ_TIMEOUT = 60
+# GETs are retried on connection errors, timeouts and these statuses, waiting
+# RETRY_BACKOFF * 2 ** (n - 1) seconds before the n-th retry. Other methods
+# are only retried when the connection could not be made at all, so a
+# checkout is never sent twice.
+GET_RETRIES = 3
+RETRY_BACKOFF = 0.3
+RETRY_STATUSES = (502, 503, 504)
+# GET responses kept with their ETag. Asking again sends the ETag, and a
+# "304 Not Modified" reply reuses the kept body, so an unchanged list costs
+# one header-only round trip.
+RESPONSE_CACHE_SIZE = 256
+# Asked for in every request: lists come with their field names once
+# instead of on every row (see core/renderers.py in the backend). Responses
+# are also gzipped, which requests asks for and undoes by itself.
+COLUMNAR_JSON = "application/vnd.lms.columnar+json"
+
+_token: Optional[str] = None
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class _ResponseCache:
+    """Least recently used GET responses: ``key -> (etag, content type, body)``. Thread-safe."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, etag: str, content_type: str, body: bytes):
+        with self._lock:
+            self._entries[key] = (etag, content_type, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_responses = _ResponseCache(RESPONSE_CACHE_SIZE)
+
+
+def set_token(token: Optional[str]):
+    global _token
+    _token = token
+    # another user may see other data
+    _responses.clear()
+
+
+def _headers():
+    headers = {"Content-Type": "application/json", "Accept": COLUMNAR_JSON}
+    if _token:
+        headers["Authorization"] = f"Bearer {_token}"
+    return headers
+
+
+def _new_session() -> requests.Session:
+    retry = Retry(
+        total=GET_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _get_session() -> requests.Session:
+    """The session shared by every call, created on first use.
+
+    Connections are reused across calls (keep-alive) instead of opening one
+    per request. The session is safe to share between threads because its
+    state is never changed after creation: the token goes in each request's
+    headers, and the connection pool does its own locking.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _new_session()
+    return _session
+
+
+def configure(pool_size: Optional[int] = None, connect_timeout: Optional[float] = None,
+              read_timeout: Optional[float] = None, retries: Optional[int] = None,
+              backoff: Optional[float] = None, cache_size: Optional[int] = None):
+    """Change the connection pool size, default timeouts, GET retries or response cache size.
+
+    Options left as ``None`` are unchanged. Requests already running finish
+    on the old connections.
+    """
+    global POOL_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT, GET_RETRIES, RETRY_BACKOFF
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+    if retries is not None:
+        GET_RETRIES = retries
+    if backoff is not None:
+        RETRY_BACKOFF = backoff
+    if cache_size is not None:
+        _responses.size = cache_size
+    close()
+
+
+@atexit.register
+def close():
+    """Close the pooled connections and forget cached responses; the next call opens new ones."""
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+    _responses.clear()
+
+
+def _rows(data):
+    # a columnar list back to a list of dicts
+    if isinstance(data, dict) and data.keys() == {'columns', 'rows'}:
+        columns = data['columns']
+        return [dict(zip(columns, row)) for row in data['rows']]
+    return data
+
+
+def _decode(body: bytes, content_type: str):
+    """Parse a JSON or columnar JSON response body."""
+    data = json.loads(body)
+    if content_type.startswith(COLUMNAR_JSON):
+        if isinstance(data, dict) and 'results' in data:
+            data['results'] = _rows(data['results'])
+        else:
+            data = _rows(data)
+    return data
+
+
+def _request(method: str, url: str, read_timeout: Optional[float] = None, **kwargs):
+    """Helper to perform HTTP requests and raise informative errors.
+
+    Goes through the shared session with ``(CONNECT_TIMEOUT, read_timeout)``
+    as the timeout; ``read_timeout`` defaults to ``READ_TIMEOUT``. GETs are
+    revalidated against the response cache. Every request is recorded in
+    :mod:`api_client.telemetry`.
+    """
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, read_timeout or READ_TIMEOUT))
+    key = cached = None
+    if method.lower() == 'get':
+        key = (url, tuple(sorted((kwargs.get('params') or {}).items())))
+        cached = _responses.get(key)
+        if cached is not None:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **{'If-None-Match': cached[0]})
+    start = time.perf_counter()
+    try:
+        r = _get_session().request(method, url, **kwargs)
+    except requests.RequestException as e:
+        telemetry.record(time.perf_counter() - start, None, 0)
+        raise Exception(f"Network error: {e}")
+    # bytes on the wire, i.e. before gzip is undone
+    telemetry.record(time.perf_counter() - start, r.status_code, int(r.headers.get('Content-Length', len(r.content))))
+
+    if r.status_code == 304 and cached is not None:
+        # parsed again on every hit, so callers may modify what they get
+        return _decode(cached[2], cached[1])
+
+    content_type = r.headers.get('Content-Type', '')
+    if r.status_code >= 400:
+        # try to extract JSON error message
+        try:
+            err = _decode(r.content, content_type)
+        except Exception:
+            err = r.text
+        raise Exception(f"{r.status_code} {r.reason}: {err}")
+
+    try:
+        data = _decode(r.content, content_type)
+    except Exception:
+        return r.text
+    if key is not None and r.headers.get('ETag'):
+        _responses.put(key, r.headers['ETag'], content_type, r.content)
+    return data
+
+
+def _iter_pages(url: str, params: Optional[Dict[str, Any]] = None, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[list]:
+    """Yield the ``results`` of each page of a cursor-paginated endpoint.
+
+    Pages are requested lazily, so a caller that stops iterating early never
+    downloads the rest of the table.
+    """
+    params = dict(params or {})
+    params['page_size'] = page_size
+    while url:
+        data = _request('get', url, headers=_headers(), params=params)
+        yield data.get('results', [])
+        # the ``next`` link already carries the cursor and the query string
+        url = data.get('next')
+        params = None
+
+
+@telemetry.endpoint
+def login(username: str, password: str) -> Dict[str, Any]:
+    """Obtain JWT token pair."""
+    url = f"{API_BASE}/auth/login/"
+    data = _request('post', url, json={"username": username, "password": password})
+    access = data.get("access") if isinstance(data, dict) else None
+    if access:
+        set_token(access)
+    return data
+
+
+@telemetry.endpoint
+def get_me() -> Dict[str, Any]:
+    url = f"{API_BASE}/users/me/"
+    return _request('get', url, headers=_headers())
+
+
+@telemetry.endpoint
+def iter_books(search: Optional[str] = None, category: Optional[str] = None, ordering: Optional[str] = None,
+               page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[list]:
+    """Yield books one page at a time, newest first unless ``ordering`` is given.
+
+    Filtering happens on the server: every word of ``search`` starts a word of
+    the title or author, or the whole of it starts the ISBN,
+    ``category`` is an exact match and ``ordering`` is a field name, prefixed
+    with ``-`` for descending order.
+    """
+    url = f"{API_BASE}/books/"
+    params = {}
+    if search:
+        params['search'] = search
+    if category:
+        params['category'] = category
+    if ordering:
+        params['ordering'] = ordering
+    return _iter_pages(url, params, page_size=page_size)
+
+
+@telemetry.endpoint
+def get_books(search: Optional[str] = None, category: Optional[str] = None, ordering: Optional[str] = None) -> list:
+    return [book for page in iter_books(search, category, ordering) for book in page]
+
+
+@telemetry.endpoint
+def get_categories() -> list:
+    """Book categories in the catalog, by name; needs no login (used by the registration form)."""
+    url = f"{API_BASE}/books/categories/"
+    return _request('get', url, headers=_headers())
+
+
+@telemetry.endpoint
+def search_books(query: str, category: Optional[str] = None, limit: int = 20) -> list:
+    """Ranked full-text search over title, author, category and description.
+
+    Words are matched as prefixes, so partial input such as "tolk" works.
+    """
+    url = f"{API_BASE}/books/search/"
+    params = {'q': query, 'limit': limit}
+    if category:
+        params['category'] = category
+    return _request('get', url, headers=_headers(), params=params)
+
+
+@telemetry.endpoint
+def get_book(book_id: int) -> dict:
+    url = f"{API_BASE}/books/{book_id}/"
+    return _request('get', url, headers=_headers())
+
+
+@telemetry.endpoint
+def get_similar_books(book_id: int, k: int = 10, source: str = 'loans') -> list:
+    """Books similar to ``book_id``, each with a ``similarity`` score.
+
+    ``source='loans'`` ranks by co-borrowing, ``'content'`` by similar text.
+    """
+    url = f"{API_BASE}/books/{book_id}/similar/"
+    return _request('get', url, headers=_headers(), params={'k': k, 'source': source},
+                    read_timeout=SLOW_READ_TIMEOUT)
+
+
+@telemetry.endpoint
+def get_book_by_isbn(isbn: str) -> dict:
+    # typed or scanned in, so it may hold spaces, "?" or "#"
+    url = f"{API_BASE}/books/by-isbn/{quote(isbn, safe='')}/"
+    return _request('get', url, headers=_headers())
+
+
+@telemetry.endpoint
+def create_book(payload: dict) -> dict:
+    url = f"{API_BASE}/books/"
+    return _request('post', url, json=payload, headers=_headers())
+
+
+@telemetry.endpoint
+def update_book(book_id: int, payload: dict) -> dict:
+    url = f"{API_BASE}/books/{book_id}/"
+    return _request('put', url, json=payload, headers=_headers())
+
+
+@telemetry.endpoint
+def delete_book(book_id: int) -> None:
+    url = f"{API_BASE}/books/{book_id}/"
+    _request('delete', url, headers=_headers())
+
+
+@telemetry.endpoint
+def create_user(payload: dict) -> dict:
+    url = f"{API_BASE}/users/"
+    return _request('post', url, json=payload, headers=_headers())
+
+
+@telemetry.endpoint
+def get_users() -> list:
+    url = f"{API_BASE}/users/"
+    return _request('get', url, headers=_headers())
+
+
+@telemetry.endpoint
+def lookup_user(identifier) -> dict:
+    """Find one user by id, username or email."""
+    url = f"{API_BASE}/users/lookup/"
+    return _request('get', url, headers=_headers(), params={'q': identifier})
+
+
+@telemetry.endpoint
+def update_user(user_id: int, payload: dict) -> dict:
+    url = f"{API_BASE}/users/{user_id}/"
+    return _request('put', url, json=payload, headers=_headers())
+
+
+@telemetry.endpoint
+def delete_user(user_id: int) -> None:
+    url = f"{API_BASE}/users/{user_id}/"
+    _request('delete', url, headers=_headers())
+
+
+@telemetry.endpoint
+def iter_loans(user_id: Optional[int] = None, status: Optional[str] = None,
+               page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[list]:
+    """Yield loans one page at a time, newest first."""
+    url = f"{API_BASE}/loans/"
+    params = {}
+    if user_id is not None:
+        params['user'] = user_id
+    if status is not None:
+        params['status'] = status
+    return _iter_pages(url, params, page_size=page_size)
+
+
+@telemetry.endpoint
+def get_loans(user_id: Optional[int] = None, status: Optional[str] = None) -> list:
+    return [loan for page in iter_loans(user_id, status) for loan in page]
+
+
+@telemetry.endpoint
+def create_loan(payload: dict) -> dict:
+    """Check a book out. ``book`` may be an id or ISBN, ``user`` an id, username or email."""
+    url = f"{API_BASE}/loans/"
+    return _request('post', url, json=payload, headers=_headers())
+
+
+@telemetry.endpoint
+def return_loan(loan_id: int) -> dict:
+    url = f"{API_BASE}/loans/{loan_id}/return/"
+    return _request('post', url, headers=_headers())
+
+
+@telemetry.endpoint
+def bulk_create_loans(items: list) -> dict:
+    """Check out many books in one request.
+
+    ``items`` are dicts with ``book`` (id or ISBN) and ``user`` (id, username
+    or email). Returns ``succeeded``/``failed`` counts and per-item ``results``.
+    """
+    url = f"{API_BASE}/loans/bulk/"
+    return _request('post', url, json={'items': items}, headers=_headers(), read_timeout=SLOW_READ_TIMEOUT)
+
+
+@telemetry.endpoint
+def bulk_return_loans(loan_ids: list) -> dict:
+    """Return many loans in one request; same response shape as bulk_create_loans."""
+    url = f"{API_BASE}/loans/bulk-return/"
+    return _request('post', url, json={'loans': loan_ids}, headers=_headers(), read_timeout=SLOW_READ_TIMEOUT)
+
+
+@telemetry.endpoint
+def return_loan_by_book(book, user=None) -> dict:
+    """Return a book by id or ISBN; the server finds its active loan."""
+    url = f"{API_BASE}/loans/return/"
+    payload = {'book': book}
+    if user:
+        payload['user'] = user
+    return _request('post', url, json=payload, headers=_headers())
+
+
+@telemetry.endpoint
+def get_active_loans(book, user=None) -> list:
+    """Open loans of a book (id or ISBN), optionally of one user."""
+    url = f"{API_BASE}/loans/active/"
+    params = {'book': book}
+    if user:
+        params['user'] = user
+    return _request('get', url, headers=_headers(), params=params)
+
+
+@telemetry.endpoint
+def get_dashboard_stats() -> dict:
+    """Book, user and loan counters for the admin dashboard in one request."""
+    url = f"{API_BASE}/stats/dashboard/"
+    return _request('get', url, headers=_headers())
+
+
+@telemetry.endpoint
+def iter_my_loans(status: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[list]:
+    """Yield the logged-in user's loans one page at a time, newest first."""
+    url = f"{API_BASE}/users/me/loans/"
+    params = {}
+    if status is not None:
+        params['status'] = status
+    return _iter_pages(url, params, page_size=page_size)
+
+
+@telemetry.endpoint
+def get_my_loans(status: Optional[str] = None) -> list:
+    return [loan for page in iter_my_loans(status) for loan in page]
+
+
+@telemetry.endpoint
+def get_my_summary() -> dict:
+    """Borrowed/returned/overdue counts, late returns, reads this year and total fines."""
+    url = f"{API_BASE}/users/me/summary/"
+    return _request('get', url, headers=_headers())
+
+
+@telemetry.endpoint
+def get_my_recommendations(k: int = 5) -> list:
+    """Books suggested from the logged-in user's loan history (or, before their first loan, from the
+    categories they picked at registration), available ones first, each with a ``score``."""
+    url = f"{API_BASE}/users/me/recommendations/"
+    return _request('get', url, headers=_headers(), params={'k': k}, read_timeout=SLOW_READ_TIMEOUT)
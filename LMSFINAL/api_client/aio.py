@@ -0,0 +1,187 @@
+"""asyncio versions of the api_client calls, for screens that load several things at once.
+
+Every function of the synchronous API that makes a request has a coroutine
+of the same name here (``iter_*`` become async generators), e.g.
+``await aio.get_book(1)``; ``set_token`` makes none, so it is only in
+:mod:`api_client`. The calls run on a small thread pool through the same
+pooled session as the synchronous API, so both share connections,
+timeouts, retries and cached responses. The pool is as large as the
+connection pool.
+
+A screen fetches everything it needs in parallel with :func:`gather`, and
+from a Tk callback hands the coroutine to :func:`run_in_tk`, which runs it
+on a background event loop and calls back on the Tk thread::
+
+    def load():
+        aio.run_in_tk(frame, aio.gather(stats=aio.get_dashboard_stats(), loans=aio.get_loans()), show)
+
+    def show(results):
+        ...  # results['stats'], results['loans']: the response, or the exception it raised
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import (
+    login, get_me, iter_books, get_books, get_categories, search_books, get_book,
+    get_similar_books, get_book_by_isbn, create_book, update_book, delete_book, create_user, get_users,
+    lookup_user, update_user, delete_user, iter_loans, get_loans, create_loan, return_loan,
+    bulk_create_loans, bulk_return_loans, return_loan_by_book, get_active_loans, get_dashboard_stats,
+    iter_my_loans, get_my_loans, get_my_summary, get_my_recommendations,
+)
+from . import configure as _configure, close as _close
+from . import telemetry
+
+# How often a Tk callback checks whether its coroutine is done
+POLL_MS = 15
+
+_executor = None
+_loop = None
+_lock = threading.Lock()
+_DONE = object()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                from . import POOL_SIZE
+                # one thread per pooled connection: more would only open extra ones
+                _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='api-client')
+    return _executor
+
+
+async def _run(func, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+# The wrappers are plain functions returning a coroutine (or async
+# generator) so that the calling screen is known for telemetry: the request
+# itself runs on another thread.
+
+def _call(func):
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        return _run(telemetry.bind(func), *args, **kwargs)
+    return call
+
+
+async def _iterate(func, *args, **kwargs):
+    # each page is fetched only when the caller asks for it, as in the sync API
+    iterator = await _run(func, *args, **kwargs)
+    while (page := await _run(next, iterator, _DONE)) is not _DONE:
+        yield page
+
+
+def _pages(func):
+    @functools.wraps(func)
+    def pages(*args, **kwargs):
+        return _iterate(telemetry.bind(func), *args, **kwargs)
+    return pages
+
+
+login = _call(login)
+get_me = _call(get_me)
+iter_books = _pages(iter_books)
+get_books = _call(get_books)
+get_categories = _call(get_categories)
+search_books = _call(search_books)
+get_book = _call(get_book)
+get_similar_books = _call(get_similar_books)
+get_book_by_isbn = _call(get_book_by_isbn)
+create_book = _call(create_book)
+update_book = _call(update_book)
+delete_book = _call(delete_book)
+create_user = _call(create_user)
+get_users = _call(get_users)
+lookup_user = _call(lookup_user)
+update_user = _call(update_user)
+delete_user = _call(delete_user)
+iter_loans = _pages(iter_loans)
+get_loans = _call(get_loans)
+create_loan = _call(create_loan)
+return_loan = _call(return_loan)
+bulk_create_loans = _call(bulk_create_loans)
+bulk_return_loans = _call(bulk_return_loans)
+return_loan_by_book = _call(return_loan_by_book)
+get_active_loans = _call(get_active_loans)
+get_dashboard_stats = _call(get_dashboard_stats)
+iter_my_loans = _pages(iter_my_loans)
+get_my_loans = _call(get_my_loans)
+get_my_summary = _call(get_my_summary)
+get_my_recommendations = _call(get_my_recommendations)
+
+
+async def first_page(pages):
+    """The first page of an ``iter_*`` async generator (``[]`` if there is none), without fetching more."""
+    async for page in pages:
+        return page
+    return []
+
+
+async def gather(**calls):
+    """Await the keyword coroutines concurrently.
+
+    Returns ``{name: result}``, where a call that failed has the exception as
+    its result, so one failing section does not lose the others. Takes about
+    as long as the slowest call.
+    """
+    results = await asyncio.gather(*calls.values(), return_exceptions=True)
+    return dict(zip(calls, results))
+
+
+def configure(**options):
+    """:func:`api_client.configure`, also resizing the thread pool to a new pool size."""
+    _configure(**options)
+    close()
+
+
+def close():
+    """:func:`api_client.close`, and stop the thread pool; the next call starts a new one."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+    _close()
+
+
+def _background_loop():
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='api-client-loop', daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_in_tk(widget, coro, on_done, on_error=None):
+    """Run ``coro`` without blocking Tk's mainloop, then call ``on_done(result)`` on the Tk thread.
+
+    If ``coro`` raises, ``on_error(exception)`` is called instead (when given).
+    Neither is called if ``widget`` has been destroyed by then, e.g. because
+    the user left the screen. Returns a :class:`concurrent.futures.Future`
+    that can be cancelled.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _background_loop())
+
+    # Tk may only be touched from its own thread, so poll from there
+    def poll():
+        if not widget.winfo_exists():
+            future.cancel()
+        elif not future.done():
+            widget.after(POLL_MS, poll)
+        elif future.cancelled():
+            pass
+        elif future.exception() is not None:
+            if on_error is not None:
+                on_error(future.exception())
+        else:
+            on_done(future.result())
+
+    widget.after(POLL_MS, poll)
+    return future
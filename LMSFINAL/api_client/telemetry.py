@@ -0,0 +1,250 @@
+"""Request telemetry: what each screen asks the server for, and how long it takes.
+
+Every HTTP request made by :func:`api_client._request` is recorded under
+the API function that made it (``get_books``, ``iter_loans``, ...) and the
+screen it was made for: latency, response bytes, status codes, and how
+many requests and API calls there were. Paged calls count one call and a
+request per page. Latencies go into log-linear histograms (as in
+HdrHistogram: 8 buckets per power of two, so percentiles are within 12.5%)
+in a fixed, small amount of memory however many requests there are.
+
+Screens name themselves with :func:`screen`, as a decorator or ``with``
+block. A request made outside any named screen is recorded under the
+module of the frontend code that made it.
+
+:func:`snapshot` returns the numbers. :func:`dump` appends them to a JSONL
+file; set ``LMS_API_TELEMETRY=<path>`` (or call :func:`dump_on_exit`) to
+get one dump when the program exits.
+"""
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import types
+from typing import Optional
+
+# Sub-buckets per power of two, as a number of bits
+SUB_BUCKET_BITS = 3
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_endpoint = contextvars.ContextVar('api_endpoint', default=None)
+_screen = contextvars.ContextVar('api_screen', default=None)
+
+_stats = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Counts of microsecond values in log-linear buckets."""
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        if value < 1 << SUB_BUCKET_BITS:
+            return value
+        shift = value.bit_length() - 1 - SUB_BUCKET_BITS
+        return ((shift + 1) << SUB_BUCKET_BITS) + ((value >> shift) & ((1 << SUB_BUCKET_BITS) - 1))
+
+    @staticmethod
+    def highest(bucket: int) -> int:
+        """Largest value that falls in ``bucket``."""
+        if bucket < 1 << SUB_BUCKET_BITS:
+            return bucket
+        shift = (bucket >> SUB_BUCKET_BITS) - 1
+        return (((bucket & ((1 << SUB_BUCKET_BITS) - 1)) | (1 << SUB_BUCKET_BITS)) + 1 << shift) - 1
+
+    def record(self, value: int):
+        bucket = self.bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> int:
+        rank = max(1, -(-self.total * p // 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.highest(bucket), self.max)
+        return 0
+
+
+class _Stats:
+    def __init__(self):
+        self.calls = 0
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.bytes = 0
+        self.latency = Histogram()
+
+
+def _caller_module() -> str:
+    # The first frame outside this package is the frontend code that called
+    frame = sys._getframe(1)
+    while frame is not None and os.path.dirname(os.path.abspath(frame.f_code.co_filename)) == _PACKAGE_DIR:
+        frame = frame.f_back
+    if frame is None:
+        return 'unknown'
+    return os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+
+
+def current_screen() -> str:
+    """The screen requests are recorded under right now."""
+    return _screen.get() or _caller_module()
+
+
+def _entry(endpoint, screen):
+    key = (endpoint, screen)
+    stats = _stats.get(key)
+    if stats is None:
+        stats = _stats[key] = _Stats()
+    return stats
+
+
+@contextlib.contextmanager
+def _labels(endpoint, screen):
+    tokens = _endpoint.set(endpoint), _screen.set(screen)
+    try:
+        yield
+    finally:
+        _endpoint.reset(tokens[0])
+        _screen.reset(tokens[1])
+
+
+@contextlib.contextmanager
+def screen(name: str):
+    """Record the requests made inside as coming from screen ``name``.
+
+    Works as a decorator or a ``with`` block; the innermost screen wins.
+    """
+    token = _screen.set(name)
+    try:
+        yield
+    finally:
+        _screen.reset(token)
+
+
+def _pages(iterator, endpoint, screen_name):
+    # Pages are fetched after the API function has returned
+    while True:
+        with _labels(endpoint, screen_name):
+            try:
+                page = next(iterator)
+            except StopIteration:
+                return
+        yield page
+
+
+def endpoint(func):
+    """Count calls of an API function and label the requests it makes with its name.
+
+    A call made inside another API function (``get_books`` paging through
+    ``iter_books``) is counted as part of the outer one.
+    """
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        if _endpoint.get() is not None:
+            return func(*args, **kwargs)
+        name, screen_name = func.__name__, current_screen()
+        with _lock:
+            _entry(name, screen_name).calls += 1
+        with _labels(name, screen_name):
+            result = func(*args, **kwargs)
+        if isinstance(result, types.GeneratorType):
+            return _pages(result, name, screen_name)
+        return result
+    return call
+
+
+def bind(func):
+    """``func`` set to record under the current screen wherever it is called (e.g. on a worker thread)."""
+    screen_name = current_screen()
+
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        with screen(screen_name):
+            return func(*args, **kwargs)
+    return call
+
+
+def record(seconds: float, status: Optional[int], size: int):
+    """Record one HTTP request; ``status`` is None when no response arrived."""
+    endpoint_name = _endpoint.get()
+    screen_name = current_screen()
+    with _lock:
+        # a bare _request() counts as a call of its own
+        stats = _entry(endpoint_name or '_request', screen_name)
+        if endpoint_name is None:
+            stats.calls += 1
+        stats.requests += 1
+        key = str(status) if status is not None else 'error'
+        stats.statuses[key] = stats.statuses.get(key, 0) + 1
+        if status is None or status >= 400:
+            stats.errors += 1
+        stats.bytes += size
+        stats.latency.record(max(0, round(seconds * 1_000_000)))
+
+
+def snapshot() -> list:
+    """Per (endpoint, screen) totals, most total request time first.
+
+    Each row has ``endpoint``, ``screen``, ``calls``, ``requests``,
+    ``errors``, ``statuses`` (``{"200": n, ...}``), ``bytes`` and latency
+    ``p50_ms``, ``p95_ms``, ``p99_ms``, ``max_ms`` and ``total_ms``.
+    """
+    rows = []
+    with _lock:
+        for (endpoint_name, screen_name), stats in _stats.items():
+            latency = stats.latency
+            rows.append({
+                'endpoint': endpoint_name,
+                'screen': screen_name,
+                'calls': stats.calls,
+                'requests': stats.requests,
+                'errors': stats.errors,
+                'statuses': dict(stats.statuses),
+                'bytes': stats.bytes,
+                'p50_ms': latency.percentile(50) / 1000,
+                'p95_ms': latency.percentile(95) / 1000,
+                'p99_ms': latency.percentile(99) / 1000,
+                'max_ms': latency.max / 1000,
+                'total_ms': latency.sum / 1000,
+            })
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
+
+
+def reset():
+    """Forget everything recorded so far."""
+    with _lock:
+        _stats.clear()
+
+
+def dump(path: str):
+    """Append the current :func:`snapshot` to ``path``, one JSON object per line."""
+    now = time.time()
+    with open(path, 'a', encoding='utf-8') as f:
+        for row in snapshot():
+            f.write(json.dumps(dict(row, time=now)) + '\n')
+
+
+def dump_on_exit(path: str):
+    """:func:`dump` to ``path`` when the program exits."""
+    atexit.register(dump, path)
+
+
+if os.environ.get('LMS_API_TELEMETRY'):
+    dump_on_exit(os.environ['LMS_API_TELEMETRY'])
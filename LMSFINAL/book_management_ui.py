@@ -3,14 +3,23 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 
 # This UI now uses the Django REST backend as the single source of truth.
-from api_client import get_books, create_book, update_book, delete_book
+from api_client import iter_books, create_book, update_book, delete_book, telemetry
 
 # Variable to hold the reference to the ttk.Treeview widget
 book_management_table = None
+# Label under the table title that says when matches were left out
+book_table_limit_label = None
+
+# Most rows the table loads at once; narrow the search to see the rest
+BOOK_TABLE_LIMIT = 500
+
+# Milliseconds to wait after the last keystroke before searching
+SEARCH_DEBOUNCE_MS = 300
 
 
 
 # Add Book Function (uses API)
+@telemetry.screen('Book Management')
 def add_book_to_db(data):
     payload = {
         'title': data['Title'],
@@ -32,6 +41,7 @@ def add_book_to_db(data):
 
 
 # Delete Book Function (uses API)
+@telemetry.screen('Book Management')
 def delete_book_from_db(book_id, title):
     try:
         delete_book(book_id)
@@ -65,6 +75,7 @@ def edit_book_modal(parent, book_data):
     create_label_entry(win, 'Category', book_data.get('category', ''))
     create_label_entry(win, 'Quantity', str(book_data.get('quantity', 1)))
 
+    @telemetry.screen('Book Management')
     def save():
         payload = {
             'title': entries['Title'].get(),
@@ -91,6 +102,7 @@ _current_sort_reverse = False
 _search_term = ""
 _category_filter = "All Categories"
 
+@telemetry.screen('Book Management')
 def refresh_book_table(search_term="", category_filter="All Categories"):
     global book_management_table, _search_term, _category_filter
     _search_term = search_term
@@ -98,27 +110,29 @@ def refresh_book_table(search_term="", category_filter="All Categories"):
     
     if not book_management_table:
         return
+
+    # Search, category filter and sorting are all done by the server
+    search = search_term if search_term != "Search by title, author, or ISBN..." else ""
+    category = category_filter if category_filter != "All Categories" else ""
+    ordering = None
+    if _current_sort_column:
+        ordering = f"-{_current_sort_column}" if _current_sort_reverse else _current_sort_column
+
     try:
-        books = get_books()
+        # One page of matching rows is all the table shows; the extra row
+        # only tells whether any were left out
+        books = next(iter_books(search, category, ordering, page_size=BOOK_TABLE_LIMIT + 1), [])
     except Exception as e:
         messagebox.showerror('Error', f'Failed to load books: {e}')
         return
 
-    # Apply search filter
-    if search_term and search_term != "Search by title, author, or ISBN...":
-        search_lower = search_term.lower()
-        books = [b for b in books if 
-                 search_lower in b.get('title', '').lower() or
-                 search_lower in b.get('author', '').lower() or
-                 search_lower in b.get('isbn', '').lower()]
-    
-    # Apply category filter
-    if category_filter and category_filter != "All Categories":
-        books = [b for b in books if b.get('category', '') == category_filter]
-    
-    # Apply current sort if any
-    if _current_sort_column:
-        books = sorted(books, key=lambda x: x.get(_current_sort_column, ''), reverse=_current_sort_reverse)
+    truncated = len(books) > BOOK_TABLE_LIMIT
+    books = books[:BOOK_TABLE_LIMIT]
+    if book_table_limit_label:
+        book_table_limit_label.config(
+            text=f"Showing the first {BOOK_TABLE_LIMIT} matches, refine your search to see the rest"
+            if truncated else ""
+        )
 
     book_management_table.delete(*book_management_table.get_children())
     for book in books:
@@ -362,7 +376,7 @@ def open_add_book_modal(parent):
 # ----------------- MAIN BOOK MANAGEMENT UI FUNCTION -----------------
 
 def create_book_management_ui(parent_frame):
-    global book_management_table  # Declare global access
+    global book_management_table, book_table_limit_label  # Declare global access
 
     frame = tk.Frame(parent_frame, bg="#f5f7fa")
     frame.place(relwidth=1, relheight=1)
@@ -397,11 +411,19 @@ def create_book_management_ui(parent_frame):
     search_entry.bind("<FocusIn>", on_search_focus_in)
     search_entry.bind("<FocusOut>", on_search_focus_out)
     
-    # Bind real-time search
+    # Bind real-time search, debounced so a burst of keystrokes costs one request
+    pending_search = None
+
+    def run_search():
+        nonlocal pending_search
+        pending_search = None
+        refresh_book_table(search_entry.get(), category.get())
+
     def on_search_change(event):
-        search_text = search_entry.get()
-        cat_value = category.get()
-        refresh_book_table(search_text, cat_value)
+        nonlocal pending_search
+        if pending_search is not None:
+            search_entry.after_cancel(pending_search)
+        pending_search = search_entry.after(SEARCH_DEBOUNCE_MS, run_search)
     
     search_entry.bind("<KeyRelease>", on_search_change)
 
@@ -444,7 +466,10 @@ def create_book_management_ui(parent_frame):
         font=("Segoe UI", 16, "bold"),
         bg="white",
         fg="#2c3e50"
-    ).pack(anchor="w", padx=15, pady=10)
+    ).pack(anchor="w", padx=15, pady=(10, 0))
+
+    book_table_limit_label = tk.Label(card, text="", font=("Segoe UI", 10), bg="white", fg="#e67e22")
+    book_table_limit_label.pack(anchor="w", padx=15)
 
     # Table columns
     columns = ("Title", "Author", "ISBN", "Category", "Qty", "Available", "Actions")
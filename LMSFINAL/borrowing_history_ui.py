@@ -3,7 +3,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import datetime
 
-from api_client import get_loans
+from api_client import get_my_loans, get_my_summary, telemetry
 
 
 # Helper function for stat card creation
@@ -54,6 +54,7 @@ def _create_status_label(parent, status):
 
 # ----------------- MAIN UI BUILDER FUNCTION -----------------
 
+@telemetry.screen('Borrowing History')
 def create_borrowing_history_ui(parent_frame, current_student_id=None):
     """Loads the Borrowing History content into the provided frame."""
 
@@ -95,40 +96,20 @@ def create_borrowing_history_ui(parent_frame, current_student_id=None):
     stats_row = tk.Frame(main_wrapper, bg="#f5f7fa")
     stats_row.pack(fill="x", pady=10)
 
-    # Load history from API loans if available
-    from api_client import get_loans
+    # Load the logged-in student's history and counters from the API
+    # (both endpoints are scoped to the current user on the server)
     try:
-        loans = get_loans()
+        loans = get_my_loans()
     except Exception:
         loans = []
+    try:
+        summary = get_my_summary()
+    except Exception:
+        summary = {}
 
-    if current_student_id:
-        loans = [l for l in loans if l.get('user') == current_student_id]
-
-    total_reads = len([l for l in loans if l.get('status') == 'returned'])
-    
-    # Calculate this year's reads
-    current_year = datetime.datetime.now().year
-    this_year_reads = 0
-    for l in loans:
-        if l.get('status') == 'returned' and l.get('return_date'):
-            try:
-                return_dt = datetime.datetime.fromisoformat(l['return_date'])
-                if return_dt.year == current_year:
-                    this_year_reads += 1
-            except:
-                pass
-    
-    late_returns = 0
-    for l in loans:
-        if l.get('status') == 'returned' and l.get('return_date') and l.get('due_date'):
-            try:
-                return_dt = datetime.datetime.fromisoformat(l['return_date'])
-                due_dt = datetime.datetime.fromisoformat(l['due_date'])
-                if return_dt > due_dt:
-                    late_returns += 1
-            except:
-                pass
+    total_reads = summary.get('returned', 0)
+    this_year_reads = summary.get('reads_this_year', 0)
+    late_returns = summary.get('late_returns', 0)
 
     _create_history_stat_card(stats_row, "Total Books Read", total_reads, "All time", "📘", "#5d5fef")
     _create_history_stat_card(stats_row, "This Year", this_year_reads, "Books completed this year",
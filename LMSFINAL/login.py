@@ -3,7 +3,7 @@ from tkinter import messagebox
 import adminDashboardUI
 import register
 import student_portal_app
-from api_client import login as api_login, get_me, set_token
+from api_client import login as api_login, get_me, set_token, telemetry
 
 
 def open_login_window():
@@ -87,6 +87,7 @@ def open_login_window():
     ).pack(side="left")
 
     # Login logic (MODIFIED FOR STUDENT PORTAL LAUNCH)
+    @telemetry.screen('Login')
     def login_user():
         username = username_entry.get().strip()
         password = password_entry.get().strip()
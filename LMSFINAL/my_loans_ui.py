@@ -4,30 +4,15 @@ from tkinter import ttk
 import datetime
 from datetime import timedelta
 
-from api_client import get_loans
+from api_client import get_my_loans, get_my_summary, telemetry
 
 
-def calculate_loan_stats_from_loans(loans):
-    overdue_count = 0
-    active_count = 0
-    total_fines = 0.0
-    for l in loans:
-        if l.get('status') == 'borrowed':
-            active_count += 1
-            if l.get('due_date'):
-                try:
-                    due = datetime.datetime.fromisoformat(l['due_date'])
-                    if due.date() < datetime.datetime.now().date():
-                        overdue_count += 1
-                except Exception:
-                    pass
-        total_fines += float(l.get('fine', 0) or 0)
-
+def loan_stats_from_summary(summary):
     return {
-        'active': active_count,
-        'overdue': overdue_count,
+        'active': summary.get('borrowed', 0),
+        'overdue': summary.get('overdue', 0),
         'renewals_left': 3,
-        'total_fines': total_fines
+        'total_fines': float(summary.get('total_fines', 0) or 0)
     }
 
 
@@ -58,6 +43,7 @@ def _create_loan_stat_card(parent, title, value, detail, icon, bg_color):
 
 # ----------------- MAIN UI BUILDER FUNCTION -----------------
 
+@telemetry.screen('My Loans')
 def create_my_loans_ui(parent_frame, current_student_id=None):
     """Loads the My Loans content into the provided frame for the current student."""
     from tkinter import messagebox
@@ -100,17 +86,18 @@ def create_my_loans_ui(parent_frame, current_student_id=None):
     stats_row = tk.Frame(main_wrapper, bg="#f5f7fa")
     stats_row.pack(fill="x", pady=10)
 
-    # Load actual stats from API for the current student
-    loans = []
+    # Load the logged-in student's open loans and counters from the API
+    # (both endpoints are scoped to the current user on the server)
     try:
-        loans = get_loans()
+        loans = get_my_loans(status='borrowed')
     except Exception:
         loans = []
+    try:
+        summary = get_my_summary()
+    except Exception:
+        summary = {}
 
-    if current_student_id:
-        loans = [l for l in loans if l.get('user') == current_student_id]
-
-    stats = calculate_loan_stats_from_loans(loans)
+    stats = loan_stats_from_summary(summary)
 
     _create_loan_stat_card(stats_row, "Active Loans", stats.get('active', 0), "Books currently borrowed", "📘", "#5d5fef")
     _create_loan_stat_card(stats_row, "Overdue", stats.get('overdue', 0), "Need attention", "⏰", "#e74c3c")
@@ -146,6 +133,7 @@ def create_my_loans_ui(parent_frame, current_student_id=None):
     # Show overdue items from API (using the already filtered loans from above)
     overdue_books = [b for b in loans if b.get('status') == 'borrowed' and b.get('due_date') and datetime.datetime.fromisoformat(b['due_date']).date() < datetime.datetime.now().date()]
 
+    @telemetry.screen('My Loans')
     def handle_return(loan_id):
         if messagebox.askyesno("Confirm Return", "Are you sure you want to return this book?"):
             try:
@@ -2,27 +2,28 @@
 
 import tkinter as tk
 from tkinter import messagebox
-from api_client import create_user, set_token
+from api_client import create_user, get_categories, set_token, telemetry
 
 
+@telemetry.screen('Register')
 def open_register_window():
     reg = tk.Tk()
     reg.title("Library System | Register")
     # Increased sizes for visibility
-    reg.geometry("480x580")
+    reg.geometry("480x720")
     reg.configure(bg="#eef1f6")
     reg.resizable(False, False)
 
     # Center window
     reg.update_idletasks()
-    width, height = 480, 580
+    width, height = 480, 720
     x = (reg.winfo_screenwidth() // 2) - (width // 2)
     y = (reg.winfo_screenheight() // 2) - (height // 2)
     reg.geometry(f"{width}x{height}+{x}+{y}")
 
     # --- Card Frame ---
     card = tk.Frame(reg, bg="white", bd=0, highlightthickness=0)
-    card.place(relx=0.5, rely=0.5, anchor="center", width=380, height=530)
+    card.place(relx=0.5, rely=0.5, anchor="center", width=380, height=670)
 
     # Title and Description... (unchanged)
     tk.Label(
@@ -58,7 +59,24 @@ def open_register_window():
     username_entry = create_input("Username")
     password_entry = create_input("Password", show="*")
 
+    # Optional: categories to get book suggestions from before the first loan
+    tk.Label(
+        card, text="Favorite Categories (optional)", font=("Segoe UI", 10), bg="white"
+    ).pack(anchor="w", padx=30)
+    categories_list = tk.Listbox(
+        card, selectmode="multiple", font=("Segoe UI", 10), width=40, height=5,
+        bd=1, relief="solid", exportselection=False
+    )
+    categories_list.pack(pady=(3, 8))
+    try:
+        categories = get_categories()
+    except Exception:
+        categories = []
+    for category in categories:
+        categories_list.insert("end", category)
+
     # Register Logic
+    @telemetry.screen('Register')
     def register_user():
         first = first_name_entry.get().strip()
         middle = middle_name_entry.get().strip()
@@ -79,6 +97,9 @@ def open_register_window():
             'email': email,
             'password': password,
         }
+        preferred = [categories_list.get(i) for i in categories_list.curselection()]
+        if preferred:
+            payload['preferred_categories'] = preferred
         try:
             create_user(payload)
             messagebox.showinfo("Success", "Account created successfully!")
@@ -1,7 +1,16 @@
 # student_book_catalog_ui.py
 import tkinter as tk
 from tkinter import ttk, messagebox
-from api_client import get_books
+from api_client import iter_books, search_books, telemetry
+
+# Books listed when the search box is empty (newest first)
+CATALOG_PAGE_SIZE = 200
+
+# Best matches shown for a search
+SEARCH_RESULT_LIMIT = 50
+
+# Milliseconds to wait after the last keystroke before searching
+SEARCH_DEBOUNCE_MS = 300
 
 
 def create_book_catalog_ui(parent_frame, current_student_name, borrow_logic_cmd):
@@ -98,6 +107,7 @@ def create_book_catalog_ui(parent_frame, current_student_name, borrow_logic_cmd)
 
     # --- Data Population and Action Binding ---
 
+    @telemetry.screen('Book Catalog')
     def handle_borrow_click(book_id, book_title):
         # Call the external logic handler provided by the main app
         try:
@@ -110,26 +120,23 @@ def create_book_catalog_ui(parent_frame, current_student_name, borrow_logic_cmd)
         except Exception as e:
             messagebox.showerror('Error', f'Failed to borrow: {e}')
 
+    @telemetry.screen('Book Catalog')
     def refresh_catalog(search_term=""):
         # Clear existing widgets
         for widget in scrollable_frame.winfo_children():
             widget.destroy()
         
         try:
-            books = get_books()
+            if search_term.strip() and search_term != "Search by title or author...":
+                # Ranked server-side search, best matches first
+                books = search_books(search_term, limit=SEARCH_RESULT_LIMIT)
+            else:
+                books = next(iter_books(page_size=CATALOG_PAGE_SIZE), [])
         except Exception as e:
             tk.Label(scrollable_frame, text=f"Error loading books: {e}", bg="white", fg="#e74c3c",
                     font=("Segoe UI", 11)).pack(pady=20)
             return
 
-        # Filter books based on search term
-        if search_term and search_term != "Search by title or author...":
-            search_lower = search_term.lower()
-            books = [b for b in books if 
-                     search_lower in b.get('title', '').lower() or 
-                     search_lower in b.get('author', '').lower() or
-                     search_lower in b.get('category', '').lower()]
-
         if not books:
             tk.Label(scrollable_frame, text="No books found.", bg="white", fg="#7f8c8d",
                     font=("Segoe UI", 12)).pack(pady=20)
@@ -215,10 +222,19 @@ def create_book_catalog_ui(parent_frame, current_student_name, borrow_logic_cmd)
             # Separator
             ttk.Separator(scrollable_frame, orient='horizontal').pack(fill='x', padx=10, pady=2)
     
-    # Bind search functionality
+    # Bind search functionality, debounced so a burst of keystrokes costs one request
+    pending_search = None
+
+    def run_search():
+        nonlocal pending_search
+        pending_search = None
+        refresh_catalog(search_entry.get())
+
     def on_search_change(event):
-        search_term = search_entry.get()
-        refresh_catalog(search_term)
+        nonlocal pending_search
+        if pending_search is not None:
+            search_entry.after_cancel(pending_search)
+        pending_search = search_entry.after(SEARCH_DEBOUNCE_MS, run_search)
     
     search_entry.bind("<KeyRelease>", on_search_change)
 
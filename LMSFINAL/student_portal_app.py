@@ -6,31 +6,22 @@ from datetime import timedelta
 from student_book_catalog_ui import create_book_catalog_ui
 from my_loans_ui import create_my_loans_ui
 from borrowing_history_ui import create_borrowing_history_ui
-from api_client import get_loans, get_books
-
-
-def get_stats_for_student(student_id, loans):
-    student_loans = [l for l in loans if l.get('user') == student_id]
-    borrowed_count = len([l for l in student_loans if l.get('status') == 'borrowed'])
-    returned_count = len([l for l in student_loans if l.get('status') == 'returned'])
-    
-    overdue = 0
-    total_fines = 0.0
-    for l in student_loans:
-        total_fines += float(l.get('fine', 0) or 0)
-        if l.get('status') == 'borrowed' and l.get('due_date'):
-            try:
-                due = datetime.datetime.fromisoformat(l['due_date'])
-                if due.date() < datetime.datetime.now().date():
-                    overdue += 1
-            except Exception:
-                pass
-    
+from api_client import aio, telemetry
+
+
+def _result(results, name, default):
+    """One result of ``aio.gather``; ``default`` if that request failed or was not made."""
+    value = results.get(name, default)
+    return default if isinstance(value, Exception) else value
+
+
+def get_stats_for_student(summary):
+    """Format the /users/me/summary/ counters for the dashboard cards."""
     return {
-        'borrowed': borrowed_count,
-        'fines': f"${total_fines:.2f}",
-        'reads': returned_count,
-        'overdue': overdue
+        'borrowed': summary.get('borrowed', 0),
+        'fines': f"${float(summary.get('total_fines', 0) or 0):.2f}",
+        'reads': summary.get('returned', 0),
+        'overdue': summary.get('overdue', 0)
     }
 
 
@@ -210,6 +201,7 @@ class StudentPortalApp(tk.Tk):
         # The content frames are created and positioned in show_frame.
         pass
 
+    @telemetry.screen('Student Dashboard')
     def _load_dashboard_content(self, frame):
         for widget in frame.winfo_children():
             widget.destroy()
@@ -241,6 +233,18 @@ class StudentPortalApp(tk.Tk):
         tk.Label(scrollable_frame, text="Here's your library overview", font=("Segoe UI", 12), bg="#f5f7fa", fg="#7f8c8d").pack(
             anchor="w", padx=30, pady=(0, 20))
 
+        # The summary, open loans and recommendations are independent, so
+        # they are fetched in parallel while the window stays responsive
+        if self.current_student_id:
+            aio.run_in_tk(scrollable_frame, aio.gather(
+                summary=aio.get_my_summary(),
+                loans=aio.get_my_loans(status='borrowed'),
+                recommendations=aio.get_my_recommendations(k=5),
+            ), lambda results: self._show_dashboard_data(scrollable_frame, results))
+        else:
+            self._show_dashboard_data(scrollable_frame, {})
+
+    def _show_dashboard_data(self, scrollable_frame, results):
         # ---------------- STATS ROW ----------------
         stats_row = tk.Frame(scrollable_frame, bg="#f5f7fa", padx=20)
         stats_row.pack(fill="x", pady=10)
@@ -263,13 +267,8 @@ class StudentPortalApp(tk.Tk):
 
             return card
 
-        # Load loans for current student and compute stats
-        try:
-            loans = get_loans()
-        except Exception:
-            loans = []
-
-        stats = get_stats_for_student(self.current_student_id, loans) if self.current_student_id else {'borrowed': 0, 'fines': "$0.00", 'reads': 0, 'overdue': 0}
+        # Counters for the current student, aggregated by the server
+        stats = get_stats_for_student(_result(results, 'summary', {}))
 
         create_stat_card(stats_row, "Books Borrowed", stats["borrowed"], "Currently checked out", "📘", "#5d5fef")
         create_stat_card(stats_row, "Pending Fines", stats["fines"], "All clear!", "⏰", "#2ecc71")
@@ -297,13 +296,8 @@ class StudentPortalApp(tk.Tk):
         borrowed_list = tk.Frame(borrowed_card, bg="white", padx=15, pady=10)
         borrowed_list.pack(fill="x")
 
-        # Display actual borrowed loans for the student
-        try:
-            loans = get_loans()
-        except Exception:
-            loans = []
-
-        student_loans = [l for l in loans if l.get('user') == self.current_student_id]
+        # Display the student's open loans (only their own are fetched)
+        student_loans = _result(results, 'loans', [])
 
         for l in student_loans:
             item_frame = tk.Frame(borrowed_list, bg="white", padx=10, pady=10)
@@ -338,6 +332,47 @@ class StudentPortalApp(tk.Tk):
 
         ttk.Separator(borrowed_card, orient='horizontal').pack(fill='x', padx=15, pady=5)
 
+        # --- Recommended for You Section ---
+        # Cached on the server until the next checkout/return, cheap on every open
+        recommendations = _result(results, 'recommendations', [])
+
+        if recommendations:
+            recommended_card = tk.Frame(main_wrapper, bg="white", bd=1, relief="solid")
+            recommended_card.pack(fill="x", pady=(0, 30))
+
+            recommended_header = tk.Frame(recommended_card, bg="white", padx=15, pady=10)
+            recommended_header.pack(fill="x")
+            tk.Label(recommended_header, text="Recommended for You", font=("Segoe UI", 14, "bold"), bg="white",
+                     fg="#2c3e50").pack(side="left")
+
+            tk.Label(recommended_card, text="Based on the books you have borrowed", font=("Segoe UI", 10),
+                     bg="white", fg="#7f8c8d", padx=15).pack(anchor="w", pady=(0, 5))
+
+            recommended_list = tk.Frame(recommended_card, bg="white", padx=15, pady=10)
+            recommended_list.pack(fill="x")
+
+            for book in recommendations:
+                item_frame = tk.Frame(recommended_list, bg="white", padx=10, pady=5)
+                item_frame.pack(fill="x")
+
+                tk.Label(item_frame, text="⭐", fg="#f39c12", bg="white", font=("Segoe UI", 14)).pack(side="left", padx=5)
+
+                text_frame = tk.Frame(item_frame, bg="white")
+                text_frame.pack(side="left", fill="x", expand=True)
+                tk.Label(text_frame, text=book.get('title', ''), bg="white", fg="#2c3e50",
+                         font=("Segoe UI", 11, "bold")).pack(anchor="w")
+                tk.Label(text_frame, text=book.get('author', ''), bg="white", fg="#7f8c8d",
+                         font=("Segoe UI", 9)).pack(anchor="w")
+
+                if book.get('available', 0) > 0:
+                    tk.Button(
+                        item_frame, text="Borrow", bg="#5d5fef", fg="white", bd=0, font=("Segoe UI", 10, "bold"),
+                        padx=10, command=lambda b=book: self.student_borrow_book(b['id'], self.current_student_name)
+                    ).pack(side="right", padx=10)
+                else:
+                    tk.Label(item_frame, text="Checked out", bg="white", fg="#e74c3c",
+                             font=("Segoe UI", 9, "bold")).pack(side="right", padx=10)
+
         # --- Browse Catalog Section (Replaces Recommended for You) ---
         browse_card = tk.Frame(main_wrapper, bg="white", bd=1, relief="solid")
         browse_card.pack(fill="x", pady=(10, 0))
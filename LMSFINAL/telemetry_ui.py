@@ -0,0 +1,99 @@
+# telemetry_ui.py
+import tkinter as tk
+from tkinter import ttk
+
+from api_client import telemetry
+
+# How often the open overlay re-reads the numbers
+REFRESH_MS = 1000
+
+COLUMNS = (
+    ("screen", "Screen", 150, "w"),
+    ("endpoint", "Endpoint", 170, "w"),
+    ("calls", "Calls", 60, "e"),
+    ("requests", "Requests", 70, "e"),
+    ("errors", "Errors", 60, "e"),
+    ("p50_ms", "p50 ms", 70, "e"),
+    ("p95_ms", "p95 ms", 70, "e"),
+    ("max_ms", "Max ms", 70, "e"),
+    ("total_ms", "Total ms", 80, "e"),
+    ("bytes", "KB", 70, "e"),
+    ("statuses", "Statuses", 150, "w"),
+)
+
+# The open overlay of each window, so the shortcut toggles it
+_overlays = {}
+
+
+def _cell(row, key):
+    value = row[key]
+    if key == "bytes":
+        return f"{value / 1024:.1f}"
+    if key == "statuses":
+        return ", ".join(f"{status}×{count}" for status, count in sorted(value.items()))
+    if key.endswith("_ms"):
+        return f"{value:.1f}"
+    return value
+
+
+def toggle_telemetry_overlay(root):
+    """Open (or close, if open) a live table of the API requests made so far, per screen and endpoint."""
+    overlay = _overlays.pop(str(root), None)
+    if overlay is not None and overlay.winfo_exists():
+        overlay.destroy()
+        return
+
+    overlay = tk.Toplevel(root)
+    overlay.title("API Requests")
+    overlay.geometry("1100x360")
+    overlay.config(bg="#f5f7fa")
+    overlay.attributes("-topmost", True)
+    _overlays[str(root)] = overlay
+
+    summary_label = tk.Label(overlay, bg="#f5f7fa", fg="#2c3e50", font=("Segoe UI", 10, "bold"), anchor="w")
+    summary_label.pack(fill="x", padx=10, pady=(10, 5))
+
+    table_frame = tk.Frame(overlay, bg="#f5f7fa")
+    table_frame.pack(fill="both", expand=True, padx=10)
+    table = ttk.Treeview(table_frame, columns=[c[0] for c in COLUMNS], show="headings")
+    for key, heading, width, anchor in COLUMNS:
+        table.heading(key, text=heading)
+        table.column(key, width=width, anchor=anchor)
+    scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=table.yview)
+    table.configure(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side="right", fill="y")
+    table.pack(side="left", fill="both", expand=True)
+
+    def refresh():
+        if not overlay.winfo_exists():
+            return
+        rows = telemetry.snapshot()
+        table.delete(*table.get_children())
+        # Most total time first: the screen or endpoint worth fixing is on top
+        for row in rows:
+            table.insert("", "end", values=[_cell(row, c[0]) for c in COLUMNS])
+        summary_label.config(text=(
+            f"{sum(r['calls'] for r in rows)} calls, {sum(r['requests'] for r in rows)} requests, "
+            f"{sum(r['errors'] for r in rows)} errors, {sum(r['total_ms'] for r in rows) / 1000:.2f} s waiting"
+        ))
+        overlay.after(REFRESH_MS, refresh)
+
+    def reset():
+        telemetry.reset()
+        table.delete(*table.get_children())
+        summary_label.config(text="")
+
+    def close():
+        _overlays.pop(str(root), None)
+        overlay.destroy()
+
+    buttons = tk.Frame(overlay, bg="#f5f7fa")
+    buttons.pack(fill="x", padx=10, pady=10)
+    tk.Button(buttons, text="Close", command=close, bg="#7f8c8d", fg="white", bd=0, padx=12, pady=4,
+              cursor="hand2").pack(side="right")
+    tk.Button(buttons, text="Reset", command=reset, bg="#5d5fef", fg="white", bd=0, padx=12, pady=4,
+              cursor="hand2").pack(side="right", padx=(0, 8))
+    tk.Label(buttons, text="F12 to toggle", bg="#f5f7fa", fg="#7f8c8d", font=("Segoe UI", 9)).pack(side="left")
+
+    overlay.protocol("WM_DELETE_WINDOW", close)
+    refresh()
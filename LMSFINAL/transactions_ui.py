@@ -2,6 +2,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from api_client import telemetry
+
 # Global reference to the Transaction List Container
 transactions_list_frame = None
 
@@ -24,6 +26,7 @@ def modern_button(parent, text, color, cmd):
     )
 
 
+@telemetry.screen('Transactions')
 def display_recent_transactions(borrow_records, get_books_func, target_frame):
     """Refreshes the recent transaction list based on current mock data."""
     # Clear previous items
@@ -31,10 +34,11 @@ def display_recent_transactions(borrow_records, get_books_func, target_frame):
         widget.destroy()
 
     # New implementation: load recent loans from API if provided; fall back to borrow_records param
-    from api_client import get_loans
+    from api_client import iter_loans
 
     try:
-        loans = get_loans()
+        # Only the most recent page is displayed, so stop after it
+        loans = next(iter_loans(page_size=5), [])
     except Exception:
         loans = borrow_records or []
 
@@ -44,7 +48,7 @@ def display_recent_transactions(borrow_records, get_books_func, target_frame):
         return
 
     # Display the last few loans
-    for record in loans[-5:]:
+    for record in loans[:5]:
         is_return = record.get('status') == 'returned'
         book_title = record.get('book_title') or 'Unknown'
 
@@ -79,12 +83,36 @@ def display_recent_transactions(borrow_records, get_books_func, target_frame):
         tk.Label(item_frame, text=date_str, bg="white", fg="#7f8c8d", font=("Segoe UI", 9)).pack(side="right")
 
 
-def create_transactions_ui(parent_frame, get_books_func, get_borrow_records_func, borrow_cmd, return_cmd):
+def parse_batch_lines(text, default_student=None):
+    """Parse batch checkout input, one "book, student" pair per line.
+
+    Lines without a student use ``default_student``; blank lines are skipped.
+    Returns (items, bad_line_numbers).
+    """
+    items, bad_lines = [], []
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        book, _, student = (part.strip() for part in line.partition(','))
+        student = student or default_student
+        if not book or not student:
+            bad_lines.append(number)
+            continue
+        items.append((book, student))
+    return items, bad_lines
+
+
+def create_transactions_ui(parent_frame, get_books_func, get_borrow_records_func, borrow_cmd, return_cmd,
+                           bulk_borrow_cmd=None):
     """
     Builds the complete Lending & Returns UI.
 
     :param borrow_cmd: The callback function (handle_borrow_logic) for Check Out.
     :param return_cmd: The callback function (handle_return_logic) for Return.
+    :param bulk_borrow_cmd: Optional callback (handle_bulk_borrow_logic) taking a list of
+        (book, student) pairs; adds the Batch Check Out tab. Returns the pairs that were not
+        checked out.
     """
     global transactions_list_frame
 
@@ -161,6 +189,9 @@ def create_transactions_ui(parent_frame, get_books_func, get_borrow_records_func
 
     notebook.add(check_out_frame, text="Check Out")
     notebook.add(return_frame, text="Return")
+    if bulk_borrow_cmd is not None:
+        batch_frame = tk.Frame(notebook, bg="white", padx=10, pady=10)
+        notebook.add(batch_frame, text="Batch Check Out")
 
     # Placeholder logic helper
     def setup_placeholder(entry, default_text):
@@ -200,6 +231,7 @@ def create_transactions_ui(parent_frame, get_books_func, get_borrow_records_func
     setup_placeholder(student_id_entry, "Enter Student/User ID")
 
     # Check Out Command Wrapper
+    @telemetry.screen('Transactions')
     def process_check_out():
         b_id = book_id_entry.get().strip()
         s_id = student_id_entry.get().strip()
@@ -258,6 +290,7 @@ def create_transactions_ui(parent_frame, get_books_func, get_borrow_records_func
     setup_placeholder(return_student_id_entry, "Enter Student/User ID")
 
     # Return Command Wrapper
+    @telemetry.screen('Transactions')
     def process_return():
         # Data validation and pass-through to external logic
         b_id = return_book_id_entry.get().strip()
@@ -290,6 +323,53 @@ def create_transactions_ui(parent_frame, get_books_func, get_borrow_records_func
         "#2ecc71",
         process_return
     ).pack(side="right", pady=10, padx=10)
+
+    # === BATCH CHECK OUT TAB ===
+    if bulk_borrow_cmd is not None:
+        batch_grid = tk.Frame(batch_frame, bg="white")
+        batch_grid.pack(fill="x")
+        batch_grid.columnconfigure(0, weight=2)
+        batch_grid.columnconfigure(1, weight=1)
+
+        tk.Label(batch_grid, text="One \"ISBN or Book ID, Student\" per line", bg="white", fg="#7f8c8d",
+                 font=("Segoe UI", 10)).grid(row=0, column=0, sticky="w", padx=10)
+        tk.Label(batch_grid, text="Default Student / User ID", bg="white", fg="#7f8c8d",
+                 font=("Segoe UI", 10)).grid(row=0, column=1, sticky="w", padx=10)
+
+        batch_text = tk.Text(batch_grid, font=("Segoe UI", 10), bd=1, relief="solid", height=3, width=40)
+        batch_text.grid(row=1, column=0, rowspan=2, sticky="ew", padx=10)
+
+        batch_student_entry = tk.Entry(batch_grid, font=("Segoe UI", 11), bd=1, relief="solid", width=20)
+        batch_student_entry.grid(row=1, column=1, sticky="new", padx=10, ipady=4)
+        batch_student_entry.insert(0, "Enter Student/User ID")
+        setup_placeholder(batch_student_entry, "Enter Student/User ID")
+
+        @telemetry.screen('Transactions')
+        def process_batch_check_out():
+            default_student = batch_student_entry.get().strip()
+            if default_student == "Enter Student/User ID":
+                default_student = ""
+            items, bad_lines = parse_batch_lines(batch_text.get("1.0", tk.END), default_student)
+            if bad_lines:
+                messagebox.showerror("Error", "Missing book or student on line(s): "
+                                     + ", ".join(str(n) for n in bad_lines))
+                return
+            if not items:
+                messagebox.showerror("Error", "Please enter at least one book.")
+                return
+            # Keep only what failed, so it can be corrected and resubmitted
+            # without checking out the others again
+            failed = bulk_borrow_cmd(items)
+            batch_text.delete("1.0", tk.END)
+            batch_text.insert("1.0", "\n".join(f"{book}, {student}" for book, student in failed))
+
+        modern_button(
+            batch_grid,
+            "Check Out All",
+            "#2c3e50",
+            process_batch_check_out
+        ).grid(row=2, column=1, sticky="e", padx=10, pady=(6, 0))
+
     # ---------------- RECENT TRANSACTIONS ----------------
 
     recent_trans_container = tk.Frame(trans_scrollable, bg="#f5f7fa")
@@ -2,6 +2,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from api_client import telemetry
+
 # --- NO IMPORTS FROM adminDashboardUI.py HERE TO AVOID CIRCULAR DEPENDENCY ---
 
 
@@ -91,6 +93,7 @@ def open_add_user_modal(parent_app_root, save_cmd):
     btn_frame.columnconfigure(0, weight=1)  # Spacer column
 
     # Wrapper to collect data and call the external save function (save_cmd)
+    @telemetry.screen('User Management')
     def call_save_command():
         # Collect data needed by the external logic handler
         data = {
@@ -135,6 +138,7 @@ def open_add_user_modal(parent_app_root, save_cmd):
 
 
 # ----------------- MAIN USER MANAGEMENT UI FUNCTION -----------------
+@telemetry.screen('User Management')
 def create_user_management_ui(parent_frame, get_students_func, get_borrowed_func, add_user_cmd):
     """Builds the complete User Management UI."""
     global user_management_table
@@ -261,6 +265,7 @@ def create_user_management_ui(parent_frame, get_students_func, get_borrowed_func
     # --- Data Insertion and Dynamic Widgets ---
 
     # Function to populate/refresh the table
+    @telemetry.screen('User Management')
     def refresh_user_table(search_term=""):
         # Clear existing user rows (keep header)
         for widget in scrollable_list.winfo_children()[1:]:  # Skip header row
@@ -301,6 +306,7 @@ def create_user_management_ui(parent_frame, get_students_func, get_borrowed_func
             
             # Delete button
             def make_delete_handler(uid, uname):
+                @telemetry.screen('User Management')
                 def handler():
                     if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete user '{uname}'?\n\nThis action cannot be undone."):
                         try:
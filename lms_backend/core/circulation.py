@@ -0,0 +1,165 @@
+"""
+Batch checkout and return for the circulation desk.
+
+Both operations run in one transaction and change availability with one
+conditional UPDATE per book (checkout) or one CASE/WHEN UPDATE for all books
+(return) instead of one statement and transaction per item. Items that cannot
+be processed (unknown book or user, no copy left, loan already returned) are
+reported individually and do not affect the rest of the batch.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Book, Loan
+from .popularity import borrow_updates
+from .serializers_loan import LOAN_PERIOD, resolve_books, resolve_users
+
+# Upper bound on items per request, keeps the transaction (and the write lock) short
+MAX_BATCH_SIZE = 500
+
+
+class _Contended(Exception):
+    """A grouped update matched fewer rows than expected; redo it item by item."""
+
+
+def _take_copies(book_id, wanted, now):
+    """Decrement availability of one book by up to ``wanted`` (and count the
+    loans in its popularity); returns how many were taken."""
+    taken = Book.objects.filter(pk=book_id, available__gte=wanted).update(
+        available=F('available') - wanted, updated_at=now, **borrow_updates(now, wanted)
+    )
+    if taken:
+        return wanted
+    # Not enough for everyone: hand out the remaining copies one at a time
+    granted = 0
+    while granted < wanted and Book.objects.filter(pk=book_id, available__gt=0).update(
+        available=F('available') - 1, updated_at=now, **borrow_updates(now)
+    ):
+        granted += 1
+    return granted
+
+
+def _key(value):
+    return '' if value is None else str(value).strip()
+
+
+def bulk_checkout(items, requested_by):
+    """Check out many (book, user) pairs at once.
+
+    :param items: dicts with ``book`` (id or ISBN) and, for staff, ``user``
+        (id, username or email); non-staff always borrow for themselves.
+    :returns: one dict per item, in order, with ``ok`` and either the new
+        ``loan`` or an ``error`` message.
+    """
+    results = [{'index': index, 'ok': False} for index in range(len(items))]
+    # Blank keys are failed lines, never a lookup of a blank ISBN or email
+    book_keys = [_key(item.get('book')) for item in items]
+    user_keys = [_key(item.get('user')) for item in items]
+    books = resolve_books(key for key in book_keys if key)
+    users = {}
+    if requested_by.is_staff:
+        users = resolve_users(key for key in user_keys if key)
+
+    # Requests per book, in submission order, so earlier items win a short book
+    pending = defaultdict(list)
+    for index, item in enumerate(items):
+        if not book_keys[index]:
+            results[index]['error'] = 'book is required'
+            continue
+        book = books.get(book_keys[index])
+        if book is None:
+            results[index]['error'] = f"No book with id or ISBN \"{item.get('book', '')}\""
+            continue
+        user = requested_by
+        if requested_by.is_staff and item.get('user') is not None:
+            if not user_keys[index]:
+                results[index]['error'] = 'user is blank'
+                continue
+            user = users.get(user_keys[index])
+            if user is None:
+                results[index]['error'] = f"No user with id, username or email \"{item['user']}\""
+                continue
+        pending[book.pk].append((index, book, user))
+
+    now = timezone.now()
+    loans = []
+    with transaction.atomic():
+        for book_id, requests in pending.items():
+            granted = _take_copies(book_id, len(requests), now)
+            for index, book, user in requests[granted:]:
+                results[index]['error'] = 'Book is not available'
+            for index, book, user in requests[:granted]:
+                loans.append((index, Loan(user=user, book=book, borrow_date=now, due_date=now + LOAN_PERIOD)))
+        Loan.objects.bulk_create([loan for _, loan in loans])
+
+    for index, loan in loans:
+        results[index].update(ok=True, loan=loan)
+    return results
+
+
+def bulk_return(loan_ids):
+    """Return many loans at once.
+
+    :returns: one dict per id, in order, with ``ok`` and either the returned
+        ``loan`` or an ``error`` message.
+    """
+    loans = Loan.objects.select_related('book', 'user').in_bulk(loan_ids)
+    results = []
+    candidates = []
+    seen = set()
+    for index, loan_id in enumerate(loan_ids):
+        loan = loans.get(loan_id)
+        if loan is None:
+            results.append({'index': index, 'ok': False, 'error': f"No loan with id {loan_id}"})
+        elif loan.status == 'returned' or loan.pk in seen:
+            results.append({'index': index, 'ok': False, 'error': 'Loan already returned'})
+        else:
+            results.append({'index': index, 'ok': True, 'loan': loan})
+            candidates.append(loan)
+            seen.add(loan.pk)
+
+    now = timezone.now()
+    with transaction.atomic():
+        returned = candidates
+        try:
+            with transaction.atomic():
+                flipped = Loan.objects.filter(pk__in=[l.pk for l in candidates], status='borrowed').update(
+                    status='returned', return_date=now, updated_at=now
+                )
+                if flipped != len(candidates):
+                    raise _Contended
+        except _Contended:
+            # Someone returned one of these in the meantime; only the
+            # statement that flips a loan may give its copy back
+            returned = [
+                loan for loan in candidates
+                if Loan.objects.filter(pk=loan.pk, status='borrowed').update(
+                    status='returned', return_date=now, updated_at=now
+                )
+            ]
+
+        copies = Counter(loan.book_id for loan in returned)
+        if copies:
+            Book.objects.filter(pk__in=copies).update(
+                available=F('available') + Case(
+                    *[When(pk=book_id, then=Value(n)) for book_id, n in copies.items()],
+                    default=Value(0), output_field=IntegerField(),
+                ),
+                updated_at=now,
+            )
+
+    returned_ids = {loan.pk for loan in returned}
+    for result in results:
+        loan = result.get('loan')
+        if loan is None:
+            continue
+        if loan.pk in returned_ids:
+            loan.status = 'returned'
+            loan.return_date = now
+        else:
+            result.update(ok=False, error='Loan already returned')
+            del result['loan']
+    return results
@@ -0,0 +1,104 @@
+import argparse
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.recommendations import (
+    ALSModel, build_content_index, build_neighbour_file, loan_arrays, weighted_loan_arrays,
+)
+from core.recommendations.cooccurrence import SIMILARITIES
+from core.recommendations.store import book_texts
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit the item-item recommendation model over a pool of processes and write it to "
+        "RECOMMENDATIONS_MODEL_FILE, which the web processes memory-map instead of fitting it themselves; "
+        "with --als, fit the ALS model too and write its factors to RECOMMENDATIONS_ALS_FILE, and with "
+        "--content-index, write a nearest-neighbour index of the catalog text to RECOMMENDATIONS_CONTENT_INDEX_FILE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.RECOMMENDATIONS_MODEL_FILE,
+                            help='file to write (default: settings.RECOMMENDATIONS_MODEL_FILE)')
+        parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+        parser.add_argument('--k', type=int, default=settings.RECOMMENDATIONS_NEIGHBOURS,
+                            help='neighbours kept per book')
+        parser.add_argument('--similarity', choices=SIMILARITIES, default='cosine')
+        parser.add_argument('--max-user-items', type=int, default=500,
+                            help="only each reader's most recent distinct books are used")
+        parser.add_argument('--min-count', type=int, default=1,
+                            help='ignore pairs borrowed together by fewer readers')
+        parser.add_argument('--block-work', type=int, default=10_000_000,
+                            help='pairs expanded at once per worker; bounds the memory of each')
+        parser.add_argument('--als', action=argparse.BooleanOptionalAction,
+                            default=bool(settings.RECOMMENDATIONS_ALS_MIN_HISTORY),
+                            help='also fit the ALS model (default: on if RECOMMENDATIONS_ALS_MIN_HISTORY is set)')
+        parser.add_argument('--als-output', default=settings.RECOMMENDATIONS_ALS_FILE,
+                            help='ALS factors file to write (default: settings.RECOMMENDATIONS_ALS_FILE)')
+        parser.add_argument('--content-index', action='store_true',
+                            help='also index the catalog text for approximate similar-book search')
+        parser.add_argument('--content-index-output', default=settings.RECOMMENDATIONS_CONTENT_INDEX_FILE,
+                            help='content index file to write (default: settings.RECOMMENDATIONS_CONTENT_INDEX_FILE)')
+        parser.add_argument('--content-dim', type=int, default=64, help='length of the book text vectors')
+        parser.add_argument('--content-probes', type=int, default=8,
+                            help='index clusters scanned per search: more is slower and closer to exact')
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError("no output file: pass --output or set LMS_RECOMMENDATIONS_MODEL_FILE")
+        if options['als'] and not options['als_output']:
+            raise CommandError("no ALS output file: pass --als-output or set LMS_RECOMMENDATIONS_ALS_FILE")
+        if options['content_index'] and not options['content_index_output']:
+            raise CommandError(
+                "no content index file: pass --content-index-output or set LMS_RECOMMENDATIONS_CONTENT_INDEX_FILE"
+            )
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        start = time.perf_counter()
+        user_ids, book_ids = loan_arrays()
+        # The workers are forked from this process and must not share its connection
+        connection.close()
+        self.stdout.write(f"loaded {len(book_ids):,} loans in {time.perf_counter() - start:.1f}s")
+
+        def progress(done, total):
+            self.stdout.write(f"  {done:,}/{total:,} books", ending='\r')
+            self.stdout.flush()
+
+        start = time.perf_counter()
+        n_books, size = build_neighbour_file(
+            options['output'], user_ids, book_ids, workers=options['workers'],
+            progress=progress if options['verbosity'] > 1 else None,
+            k=options['k'], similarity=options['similarity'], max_user_items=options['max_user_items'],
+            min_count=options['min_count'], block_work=options['block_work'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"wrote {n_books:,} books ({size / 2**20:.1f} MiB) to {options['output']} "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
+
+        if options['als']:
+            start = time.perf_counter()
+            user_ids, book_ids, weights = weighted_loan_arrays()
+            connection.close()
+            model = ALSModel(workers=options['workers'] or os.cpu_count() or 1).fit(user_ids, book_ids, weights)
+            size = model.save(options['als_output'])
+            self.stdout.write(self.style.SUCCESS(
+                f"wrote ALS factors of {len(model.book_ids):,} books ({size / 2**20:.1f} MiB) to "
+                f"{options['als_output']} in {time.perf_counter() - start:.1f}s"
+            ))
+
+        if options['content_index']:
+            start = time.perf_counter()
+            n_books, size = build_content_index(
+                options['content_index_output'], book_texts(), dim=options['content_dim'],
+                n_probe=options['content_probes'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"indexed the text of {n_books:,} books ({size / 2**20:.1f} MiB) to "
+                f"{options['content_index_output']} in {time.perf_counter() - start:.1f}s"
+            ))
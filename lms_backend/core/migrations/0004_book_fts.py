@@ -0,0 +1,68 @@
+from django.db import migrations
+
+
+# External-content FTS5 index over core_book: the text lives only in
+# core_book, the FTS table stores just the inverted index. The triggers keep
+# it in sync; the update trigger only fires when an indexed column changes,
+# so availability updates on checkout/return never touch the index. The
+# 2 and 3 character prefix indexes make "tol*" style queries cheap to expand.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE core_book_fts USING fts5(
+        title, author, category, description,
+        content='core_book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER core_book_fts_ai AFTER INSERT ON core_book BEGIN
+        INSERT INTO core_book_fts(rowid, title, author, category, description)
+        VALUES (new.id, new.title, new.author, new.category, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER core_book_fts_ad AFTER DELETE ON core_book BEGIN
+        INSERT INTO core_book_fts(core_book_fts, rowid, title, author, category, description)
+        VALUES ('delete', old.id, old.title, old.author, old.category, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER core_book_fts_au AFTER UPDATE OF title, author, category, description ON core_book BEGIN
+        INSERT INTO core_book_fts(core_book_fts, rowid, title, author, category, description)
+        VALUES ('delete', old.id, old.title, old.author, old.category, old.description);
+        INSERT INTO core_book_fts(rowid, title, author, category, description)
+        VALUES (new.id, new.title, new.author, new.category, new.description);
+    END
+    """,
+    # Index the books that already exist
+    "INSERT INTO core_book_fts(core_book_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS core_book_fts_au",
+    "DROP TRIGGER IF EXISTS core_book_fts_ad",
+    "DROP TRIGGER IF EXISTS core_book_fts_ai",
+    "DROP TABLE IF EXISTS core_book_fts",
+]
+
+
+def _run(statements):
+    def operation(apps, schema_editor):
+        # FTS5 is SQLite only; other backends use the icontains fallback in core.search
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_book_title_author_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import migrations
+
+# The user model belongs to django.contrib.auth, so its email column cannot get
+# an index through Meta.indexes here; create it directly instead. Usernames are
+# already unique (and so indexed).
+INDEX_NAME = 'core_user_email_idx'
+
+
+def create_index(apps, schema_editor):
+    table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {schema_editor.quote_name(table)} (email)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0004_book_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:05
+
+from datetime import datetime, timezone as dt_timezone
+from importlib import import_module
+
+import numpy as np
+from django.db import migrations, models
+
+book_fts = import_module('core.migrations.0004_book_fts')
+
+# As in core.popularity when this migration was written
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+WINDOWS = {
+    'day': 24 * 3600,
+    'week': 7 * 24 * 3600,
+    'month': 30 * 24 * 3600,
+}
+
+
+def restore_fts_triggers(apps, schema_editor):
+    # Adding columns with a default makes SQLite copy core_book into a new
+    # table, and the triggers that keep core_book_fts in sync (0004) are
+    # dropped with the old one
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in book_fts.CREATE_SQL:
+        if 'CREATE TRIGGER' in sql:
+            schema_editor.execute(sql.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS', 1))
+
+
+def count_past_loans(apps, schema_editor):
+    # core.popularity.recompute, frozen: borrow count and log-sum-exp trend
+    # score per book and window
+    Book = apps.get_model('core', 'Book')
+    Loan = apps.get_model('core', 'Loan')
+    book_ids, seconds = [], []
+    for book_id, borrow_date in Loan.objects.order_by().values_list('book_id', 'borrow_date').iterator(chunk_size=50_000):
+        book_ids.append(book_id)
+        seconds.append((borrow_date - EPOCH).total_seconds())
+    if not book_ids:
+        return
+    book_ids = np.array(book_ids, dtype=np.int64)
+    seconds = np.array(seconds, dtype=np.float64)
+
+    order = np.argsort(book_ids, kind='stable')
+    book_ids, seconds = book_ids[order], seconds[order]
+    books, starts, counts = np.unique(book_ids, return_index=True, return_counts=True)
+    values = {'borrow_count': counts}
+    for window, length in WINDOWS.items():
+        terms = seconds / length
+        peak = np.maximum.reduceat(terms, starts)
+        values[f'trend_{window}'] = peak + np.log(np.add.reduceat(np.exp(terms - np.repeat(peak, counts)), starts))
+
+    rows = [
+        Book(pk=book_id, **{field: column[i].item() for field, column in values.items()})
+        for i, book_id in enumerate(books.tolist())
+    ]
+    Book.objects.bulk_update(rows, list(values), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_user_email_index'),
+    ]
+
+    operations = [
+        # Only when migrating back: removing the columns rebuilds core_book again
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name='book',
+            name='borrow_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='trend_day',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='trend_month',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='trend_week',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['borrow_count'], name='book_borrow_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['trend_day'], name='book_trend_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['trend_week'], name='book_trend_week_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['trend_month'], name='book_trend_month_idx'),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+        migrations.RunPython(count_past_loans, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:27
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def date_past_changes(apps, schema_editor):
+    # A loan last changed when it was returned, or else when it was made
+    Loan = apps.get_model('core', 'Loan')
+    Loan.objects.update(updated_at=Coalesce('return_date', 'borrow_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_loan_user_borrow_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        # before the index exists, so the backfill does not rewrite it row by row
+        migrations.RunPython(date_past_changes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['updated_at'], name='book_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['updated_at'], name='loan_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_loan_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_isbn_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_category_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_title_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_author_idx',
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['isbn', 'id'], name='book_isbn_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category', 'id'], name='book_category_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author', 'id'], name='book_author_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['quantity', 'id'], name='book_quantity_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['available', 'id'], name='book_available_id_idx'),
+        ),
+    ]
@@ -14,9 +14,37 @@ class Book(models.Model):
     description = models.TextField(blank=True)
     cover_url = models.CharField(max_length=512, blank=True)
 
+    # Loans ever made, and time-decayed borrow scores per trending window
+    # (log of the undecayed sum, NULL until first borrowed; see core.popularity)
+    borrow_count = models.PositiveIntegerField(default=0, editable=False)
+    trend_day = models.FloatField(null=True, editable=False)
+    trend_week = models.FloatField(null=True, editable=False)
+    trend_month = models.FloatField(null=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # lookups by ISBN or category, and every ?ordering= of the book list:
+            # the cursor pages on (field, id), so each walks one of these in order
+            models.Index(fields=['isbn', 'id'], name='book_isbn_id_idx'),
+            models.Index(fields=['category', 'id'], name='book_category_id_idx'),
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+            models.Index(fields=['author', 'id'], name='book_author_id_idx'),
+            models.Index(fields=['quantity', 'id'], name='book_quantity_id_idx'),
+            models.Index(fields=['available', 'id'], name='book_available_id_idx'),
+            # latest change to the catalog, for the list ETag (core.conditional)
+            models.Index(fields=['updated_at'], name='book_updated_idx'),
+            # the popular and trending shelves read these in descending order
+            models.Index(fields=['borrow_count'], name='book_borrow_count_idx'),
+            models.Index(fields=['trend_day'], name='book_trend_day_idx'),
+            models.Index(fields=['trend_week'], name='book_trend_week_idx'),
+            models.Index(fields=['trend_month'], name='book_trend_month_idx'),
+            # per-category trending lists for readers without loans yet
+            models.Index(fields=['category', 'trend_month'], name='book_category_trend_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} by {self.author}"
 
@@ -34,6 +62,25 @@ class Loan(models.Model):
     return_date = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='borrowed')
     fine = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    # Also bumped when the book or reader shown alongside the loan changes,
+    # so that it alone tells whether a serialized loan is stale
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # a student's loans, optionally by status (my loans, history)
+            models.Index(fields=['user', 'status'], name='loan_user_status_idx'),
+            # the active loan of a book (returns, availability checks)
+            models.Index(fields=['book', 'status'], name='loan_book_status_idx'),
+            # open loans by due date (overdue lists and counters)
+            models.Index(fields=['status', 'due_date'], name='loan_status_due_idx'),
+            # ?status= listings in the API's -id order, without a sort
+            models.Index(fields=['status', 'id'], name='loan_status_id_idx'),
+            # every reader's loans in borrow order (next-book model rebuilds)
+            models.Index(fields=['user', 'borrow_date'], name='loan_user_borrow_idx'),
+            # latest change to any loan, for the list ETag (core.conditional)
+            models.Index(fields=['updated_at'], name='loan_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Ensure due_date defaults to 14 days from borrow_date when creating
@@ -43,3 +90,18 @@ class Loan(models.Model):
 
     def __str__(self):
         return f"Loan {self.id}: {self.book} to {self.user} ({self.status})"
+
+
+class PreferredCategory(models.Model):
+    """A book category a reader picked at registration; recommends books
+    until they have borrowed some."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='preferred_categories')
+    category = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='preferred_category_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.category}"
@@ -0,0 +1,122 @@
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination on ``-id``, or on a client ordering plus ``id``.
+
+    Each page is fetched with ``WHERE id < <last id seen> ORDER BY id DESC
+    LIMIT n`` so the cost of a page does not grow with how deep the client
+    has scrolled, unlike OFFSET based pagination.
+
+    With ``?ordering=<field>`` the id is appended as a tie-breaker and the
+    cursor holds both values of the last row seen, so a column with many
+    repeated values (quantity, category ...) still pages through every row
+    exactly once; DRF's own cursor keeps only the first field and falls back
+    to a capped offset inside a run of ties. Each such ordering is backed by
+    a ``(field, id)`` index (see ``Book.Meta.indexes``).
+    """
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if any(key.lstrip('-') in ('id', 'pk') for key in ordering):
+            return ordering
+        # the tie-breaker runs the same way as the first key, so that one
+        # index on (field, id) serves both directions
+        return ordering + ('-id' if ordering[0].startswith('-') else 'id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*[_reversed(key) for key in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self._after(self._decode_position(current_position), reverse))
+
+        # positions are unique, so the offset is only ever non-zero in a
+        # cursor built by hand; honour it as DRF does
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        # The values of every ordering key, as a JSON list (cursors are ASCII)
+        values = []
+        for key in ordering:
+            name = key.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(value if isinstance(value, (int, float, str)) else str(value))
+        return json.dumps(values)
+
+    def _decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _after(self, values, reverse):
+        """Rows past ``values`` in the (possibly reversed) ordering.
+
+        Built as ``k1 >= v1 AND (k1 > v1 OR (k1 = v1 AND (k2 > v2 ...)))``: the
+        leading range lets the database seek the index on the first key
+        instead of testing every row against the OR.
+        """
+        keys = [(key.lstrip('-'), key.startswith('-') != reverse) for key in self.ordering]
+        condition = None
+        for (name, descending), value in reversed(list(zip(keys, values))):
+            past = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            condition = past if condition is None else past | (Q(**{name: value}) & condition)
+        name, descending = keys[0]
+        return Q(**{f"{name}__{'lte' if descending else 'gte'}": values[0]}) & condition
+
+
+def _reversed(key):
+    return key[1:] if key.startswith('-') else '-' + key
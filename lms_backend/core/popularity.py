@@ -0,0 +1,154 @@
+"""
+Borrow counters behind the trending and all-time popular shelves.
+
+Every book keeps its total number of loans (``borrow_count``) and, for each
+trending window, a time-decayed score in which a loan counts
+``exp(-age / window)``: a loan made now counts 1, one made a window ago
+about 0.37.
+
+Decaying every book's score as time passes would rewrite the catalog. The
+columns (``trend_day``, ``trend_week``, ``trend_month``) hold instead the log
+of the undecayed sum, ``log(sum(exp(t_i / window)))`` with ``t_i`` the loan
+times in seconds since ``EPOCH``:
+
+* a new loan adds its term with one log-add-exp in the checkout UPDATE, O(1);
+* decay scales every book's score by the same factor, so ordering by the
+  stored column is ordering by the decayed score, and the shelf is read from
+  the column's index;
+* the decayed score itself, ``exp(stored - now / window)``, is only computed
+  for the rows served.
+
+A book that was never borrowed has NULL there.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+
+from .models import Book
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+WINDOWS = {
+    'day': 24 * 3600,
+    'week': 7 * 24 * 3600,
+    'month': 30 * 24 * 3600,
+}
+
+# Books whose decayed score fell below this (one loan about three windows
+# ago) are off the trending shelf
+TRENDING_MIN_SCORE = 0.05
+
+# Terms further apart than this add less than exp(-40) to the larger one
+_NEGLIGIBLE = 40.0
+
+
+def trend_field(window):
+    return f'trend_{window}'
+
+
+def _clock(when, window):
+    return (when - EPOCH).total_seconds() / WINDOWS[window]
+
+
+def borrow_updates(now, count=1):
+    """``QuerySet.update()`` keyword arguments counting ``count`` loans made at ``now``."""
+    updates = {'borrow_count': F('borrow_count') + count}
+    for window in WINDOWS:
+        field = trend_field(window)
+        term = _clock(now, window) + math.log(count)
+        # log(e^a + e^b) = max(a, b) + log(1 + e^-|a - b|); the exponential is
+        # skipped when it would underflow (some databases raise on that)
+        updates[field] = Case(
+            When(**{f'{field}__isnull': True}, then=Value(term)),
+            When(**{f'{field}__lt': term - _NEGLIGIBLE}, then=Value(term)),
+            When(**{f'{field}__gt': term + _NEGLIGIBLE}, then=F(field)),
+            default=Greatest(F(field), Value(term)) + Ln(Value(1.0) + Exp(-Abs(F(field) - Value(term)))),
+            output_field=FloatField(),
+        )
+    return updates
+
+
+def decayed(stored, window, now):
+    """Decayed borrow score of a book from its stored ``trend_<window>`` value."""
+    if stored is None:
+        return 0.0
+    return math.exp(stored - _clock(now, window))
+
+
+def trending_floor(window, now, min_score):
+    """Stored value below which a book's decayed score is under ``min_score``."""
+    return _clock(now, window) + math.log(min_score)
+
+
+def popular_books():
+    """Books by loans ever made, most first; walks ``book_borrow_count_idx``."""
+    return Book.objects.filter(borrow_count__gt=0).order_by('-borrow_count', '-id')
+
+
+def trending_books(window, now):
+    """Books by decayed borrow score over ``window``, highest first; walks
+    the window's index and stops at ``TRENDING_MIN_SCORE``."""
+    field = trend_field(window)
+    floor = trending_floor(window, now, TRENDING_MIN_SCORE)
+    return Book.objects.filter(**{f'{field}__gte': floor}).order_by(f'-{field}', '-id')
+
+
+def category_trending(categories, k, now, window='month'):
+    """The ``k`` best trending books of each category, interleaved by rank.
+
+    Each category is one read of ``book_category_trend_idx`` that stops after
+    ``k`` rows, so the whole list costs O(k) per category.
+
+    :returns: ``[(book_id, decayed score), ...]``: the first book of every
+        category, then the second of every category, and so on.
+    """
+    field = trend_field(window)
+    rankings = [
+        list(trending_books(window, now).filter(category=category).values_list('id', field)[:k])
+        for category in dict.fromkeys(categories)
+    ]
+    return [
+        (ranking[rank][0], decayed(ranking[rank][1], window, now))
+        for rank in range(k) for ranking in rankings if rank < len(ranking)
+    ]
+
+
+def recompute(book_model, loan_model, batch_size=2000):
+    """Rebuild every book's counters from the loan table.
+
+    Takes the models as arguments so that migrations can pass their
+    historical versions.
+    """
+    book_ids, seconds = [], []
+    loans = loan_model.objects.order_by().values_list('book_id', 'borrow_date').iterator(chunk_size=50_000)
+    for book_id, borrow_date in loans:
+        book_ids.append(book_id)
+        seconds.append((borrow_date - EPOCH).total_seconds())
+    book_ids = np.array(book_ids, dtype=np.int64)
+    seconds = np.array(seconds, dtype=np.float64)
+
+    # Every book's counters may change, so every book counts as updated
+    book_model.objects.update(
+        borrow_count=0, updated_at=datetime.now(dt_timezone.utc), **{trend_field(window): None for window in WINDOWS}
+    )
+    if not len(book_ids):
+        return
+
+    order = np.argsort(book_ids, kind='stable')
+    book_ids, seconds = book_ids[order], seconds[order]
+    books, starts, counts = np.unique(book_ids, return_index=True, return_counts=True)
+    values = {'borrow_count': counts}
+    for window, length in WINDOWS.items():
+        terms = seconds / length
+        # log-sum-exp per book, shifted by the book's largest term
+        peak = np.maximum.reduceat(terms, starts)
+        values[trend_field(window)] = peak + np.log(np.add.reduceat(np.exp(terms - np.repeat(peak, counts)), starts))
+
+    rows = [
+        book_model(pk=book_id, **{field: column[i].item() for field, column in values.items()})
+        for i, book_id in enumerate(books.tolist())
+    ]
+    book_model.objects.bulk_update(rows, list(values), batch_size=batch_size)
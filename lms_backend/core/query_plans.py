@@ -0,0 +1,138 @@
+"""
+Query-plan checks for the circulation and catalog hot paths.
+
+Each check is a queryset the API builds for one of its main filters, lookups
+or orderings, with a pattern matching the ``EXPLAIN QUERY PLAN`` lines that
+count as a regression. They run against a small seeded database in
+``core.tests.test_query_plans`` and against millions of loans in
+``scripts/check_query_plans.py``. SQLite only.
+"""
+import re
+
+# "SCAN core_loan" (or "SCAN core_loan USING INDEX ...") means every row or
+# index entry of the table is visited; "SEARCH ..." is an index lookup. An
+# FTS5 MATCH shows as "SCAN core_book_fts VIRTUAL TABLE INDEX ..." but is a
+# lookup in the full-text index.
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?((?:core|auth)_\w+)\b(?! VIRTUAL TABLE)')
+
+# An ordered listing with a LIMIT may walk an index in order and stop early;
+# only a walk of the table itself, or sorting it, is a regression there.
+TABLE_SCAN = re.compile(r'\bSCAN (?:TABLE )?((?:core|auth)_\w+)\b(?! USING| VIRTUAL TABLE)')
+UNINDEXED_ORDER = re.compile(TABLE_SCAN.pattern + r'|USE TEMP B-TREE FOR ORDER BY')
+
+
+def _list_view(viewset, path, params):
+    """The view GET ``path`` runs for the given query string, set up to build its queryset."""
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    view = viewset()
+    view.request = Request(APIRequestFactory().get(path, params))
+    view.format_kwarg = None
+    return view
+
+
+def _loan_list(params):
+    """The queryset GET /api/loans/ builds for the given query string."""
+    from .views import LoanViewSet
+
+    return _list_view(LoanViewSet, '/api/loans/', params).get_queryset()
+
+
+def _book_page(params, after=None):
+    """The page query GET /api/books/ runs for the given query string.
+
+    ``after`` is a book whose row the cursor points at; without it this is
+    the first page.
+    """
+    from .views import BookViewSet
+
+    view = _list_view(BookViewSet, '/api/books/', params)
+    queryset = view.filter_queryset(view.get_queryset())
+    paginator = view.paginator
+    paginator.ordering = paginator.get_ordering(view.request, queryset, view)
+    queryset = queryset.order_by(*paginator.ordering)
+    if after is not None:
+        position = paginator._get_position_from_instance(after, paginator.ordering)
+        queryset = queryset.filter(paginator._after(paginator._decode_position(position), False))
+    return queryset[:paginator.page_size + 1]
+
+
+def build_checks(sample):
+    """Return (name, queryset, pattern) triples covering the hot queries.
+
+    ``sample`` is (user id, book id, ISBN, category) of a loan in the
+    database. ``pattern`` matches the plan lines that count as a failure.
+    """
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from .models import Book, Loan
+    from .popularity import popular_books, trending_books
+    from .views import BookViewSet
+
+    User = get_user_model()
+    user_id, book_id, isbn, category = sample
+    book = Book.objects.get(pk=book_id)
+    checks = [
+        ('loans by user', _loan_list({'user': user_id})[:100], FULL_SCAN),
+        ('loans by user and status', _loan_list({'user': user_id, 'status': 'borrowed'})[:100], FULL_SCAN),
+        ('loans by status', _loan_list({'status': 'borrowed'})[:100], FULL_SCAN),
+        ('active loan of a book', Loan.objects.filter(book_id=book_id, status='borrowed'), FULL_SCAN),
+        ('overdue loans', Loan.objects.filter(status='borrowed', due_date__lt=timezone.now()), FULL_SCAN),
+        ('book by isbn', Book.objects.filter(isbn=isbn), FULL_SCAN),
+        ('user by username', User.objects.filter(username='reader0'), FULL_SCAN),
+        ('user by email', User.objects.filter(email='reader0@university.edu'), FULL_SCAN),
+        ('book list in a category', _book_page({'category': category}), FULL_SCAN),
+        ('book list in a category, next page', _book_page({'category': category}, after=book), FULL_SCAN),
+        ('book list in a category by title', _book_page({'category': category, 'ordering': 'title'}), FULL_SCAN),
+        ('book list search', _book_page({'search': book.title.split()[0]}), FULL_SCAN),
+        ('book list search by ISBN', _book_page({'search': isbn[:8]}), FULL_SCAN),
+        ('popular books', popular_books()[:20], TABLE_SCAN),
+        ('trending books (week)', trending_books('week', timezone.now())[:20], TABLE_SCAN),
+        ('trending books in a category', trending_books('month', timezone.now()).filter(category=category)[:50],
+         TABLE_SCAN),
+        ('book categories', Book.objects.exclude(category='').order_by('category')
+         .values_list('category', flat=True).distinct(), TABLE_SCAN),
+        ('latest change to a book (ETag)', Book.objects.order_by('-updated_at').values('updated_at')[:1], TABLE_SCAN),
+        ('latest change to a loan (ETag)', Loan.objects.order_by('-updated_at').values('updated_at')[:1], TABLE_SCAN),
+        ('loans in borrow order per reader', Loan.objects.order_by('user_id', 'borrow_date', 'id')
+         .values_list('user_id', 'book_id'), TABLE_SCAN),
+    ]
+    # every ?ordering= of the book list, first and later pages, must walk an index
+    for field in BookViewSet.ordering_fields:
+        for ordering in (field, '-' + field):
+            checks.append((f'book list by {ordering}', _book_page({'ordering': ordering}), UNINDEXED_ORDER))
+            checks.append((f'book list by {ordering}, next page', _book_page({'ordering': ordering}, after=book),
+                           UNINDEXED_ORDER))
+    return checks
+
+
+def check_search_index():
+    """Return the failed book search index checks, as messages.
+
+    Creates, edits and deletes a book of its own; run it in a scratch
+    database or a transaction that is rolled back.
+    """
+    from django.db import connection
+    from .models import Book
+    from .search import search_book_ids
+
+    failures = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'core_book'")
+        triggers = {row[0] for row in cursor.fetchall()}
+    missing = {'core_book_fts_ai', 'core_book_fts_ad', 'core_book_fts_au'} - triggers
+    if missing:
+        failures.append(f"search index triggers missing: {', '.join(sorted(missing))}")
+
+    book = Book.objects.create(title='Zyxwvut Quarterly', author='Check', isbn='check-fts-0000')
+    if search_book_ids('zyxwvut') != [book.id]:
+        failures.append("a new book is not found by search")
+    book.title = 'Qwertyuiop Quarterly'
+    book.save()
+    if search_book_ids('qwertyuiop') != [book.id] or search_book_ids('zyxwvut'):
+        failures.append("an edited book is found by its old title, or not by its new one")
+    book.delete()
+    if search_book_ids('qwertyuiop'):
+        failures.append("a deleted book is still found by search")
+    return failures
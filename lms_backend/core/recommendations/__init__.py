@@ -0,0 +1,33 @@
+"""
+Book recommendations.
+
+``cooccurrence`` holds the item-item model (pure NumPy, fitted from arrays of
+loans), ``content`` the TF-IDF model over the catalog text; ``store`` builds
+them from the database and serves them from memory. ``neighbour_file`` builds
+the item-item lists offline into a file the web processes memory-map, and
+``ann`` is an approximate nearest-neighbour index over dense book vectors,
+which ``content_index`` builds from the catalog text to serve content
+similarity for large catalogs.
+``als`` factorises the loan matrix (implicit ALS) and folds readers in from
+their history at query time, and ``sequence`` learns which book readers
+borrow next.
+"""
+from .als import ALSModel
+from .ann import IVFIndex
+from .content import ContentModel
+from .content_index import ContentIndex, build_content_index
+from .cooccurrence import CooccurrenceModel
+from .neighbour_file import NeighbourFile, build_neighbour_file
+from .sequence import TransitionModel
+from .store import (
+    als_model, content_model, forget_user_candidates, item_model, loan_arrays, next_books, record_loans,
+    remove_book_content, sequence_model, similar_books, similar_by_content, update_book_content, user_candidates,
+    weighted_loan_arrays,
+)
+
+__all__ = [
+    'ALSModel', 'ContentIndex', 'ContentModel', 'CooccurrenceModel', 'IVFIndex', 'NeighbourFile', 'TransitionModel',
+    'als_model', 'build_content_index', 'build_neighbour_file', 'content_model', 'forget_user_candidates', 'item_model', 'loan_arrays', 'next_books',
+    'record_loans', 'remove_book_content', 'sequence_model', 'similar_books', 'similar_by_content',
+    'update_book_content', 'user_candidates', 'weighted_loan_arrays',
+]
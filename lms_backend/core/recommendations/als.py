@@ -0,0 +1,304 @@
+"""
+Implicit-feedback matrix factorisation (alternating least squares).
+
+Item-item lists only look at a reader's books one at a time; factor models
+describe every reader and book by a short vector, learned from the whole
+loan history, so a long and varied history is summarised rather than voted
+over. This is Hu, Koren & Volinsky's implicit ALS: a reader prefers a book
+(``p = 1``) if they ever borrowed it, with confidence ``c = 1 + alpha * r``,
+where ``r`` adds up their loans of the book, each weighted by how long it was
+kept (:func:`loan_weight`). Reader factors ``X`` and book factors ``Y``
+minimise ``sum c (p - x.y)^2 + reg (|X|^2 + |Y|^2)`` over *all* pairs by
+alternately solving every reader's, then every book's, least squares with
+the other side fixed::
+
+    x_u = (Y^T Y + Y^T (C_u - I) Y + reg I)^-1 Y^T C_u p_u
+
+``Y^T Y`` is shared by all readers; the rest only involves the books the
+reader borrowed. Rows are solved a batch at a time: sorted by degree and
+padded to the largest degree of their batch, their Gram matrices are one
+batched ``matmul`` and their systems one batched ``numpy.linalg.solve``. The
+batches of a half-iteration are independent; with ``workers > 1`` they are
+spread over a process pool that maps the loan tables and the factor matrices
+from files, each worker writing its rows in place.
+
+Only the book factors are kept after fitting. A reader's vector is folded in
+from their history at query time (the same solve, ``Y`` fixed), so new
+readers and new loans are served without a refit. :meth:`ALSModel.save`
+writes the book factors to a file that :meth:`ALSModel.load` memory-maps,
+so ``manage.py build_recommendations --als`` fits the model once for every
+web process.
+"""
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+
+from .arrayfile import map_arrays, write_arrays
+from .sparse import csr, sum_duplicates
+
+MAGIC = b'LMSALS\0\0'
+
+# Days of the loan period: a loan kept that long counts twice as much as one
+# returned straight away
+LOAN_DAYS = 14
+
+
+def loan_weight(days_kept):
+    """Weight of loans kept ``days_kept`` days: 1, plus up to 1 for keeping the book through the loan period."""
+    return 1.0 + np.clip(np.asarray(days_kept, dtype=np.float64), 0, LOAN_DAYS) / LOAN_DAYS
+
+
+def _batches(degrees, factors, budget):
+    """Rows ordered by degree, cut into batches of about ``budget`` padded entries.
+
+    A batch costs its size times its largest degree (the padded history) or
+    ``factors`` (its ``factors x factors`` systems), whichever is larger.
+    """
+    order = np.argsort(degrees, kind='stable')
+    batches, start = [], 0
+    for stop, degree in enumerate(degrees[order].tolist(), 1):
+        if stop - 1 > start and (stop - start) * max(degree, factors) > budget:
+            batches.append(order[start:stop - 1])
+            start = stop - 1
+    if start < len(order):
+        batches.append(order[start:])
+    return batches
+
+
+def _solve_batch(table, other, gram, regularization, rows):
+    """Factors of ``rows`` given the ``other`` side's: one batched least squares.
+
+    :param table: CSR ``(indptr, indices, confidence)`` of the solved side,
+        ``confidence`` holding ``c - 1``.
+    :param gram: ``other^T other``.
+    """
+    indptr, indices, confidence = table
+    starts = indptr[rows]
+    degrees = indptr[rows + 1] - starts
+    width = max(int(degrees.max()), 1)
+    valid = np.arange(width) < degrees[:, None]
+    positions = np.where(valid, starts[:, None] + np.arange(width), 0)
+    if len(indices):
+        cols = np.where(valid, indices[positions], 0)
+        extra = np.where(valid, confidence[positions], 0).astype(np.float32)
+    else:
+        cols, extra = np.zeros(valid.shape, dtype=np.int64), np.zeros(valid.shape, dtype=np.float32)
+    vectors = np.asarray(other[cols.ravel()], dtype=np.float32).reshape(len(rows), width, -1)
+    n_factors = vectors.shape[2]
+    # A_u = Y^T Y + reg I + Y_u^T (C_u - I) Y_u and b_u = Y_u^T c_u, padding contributing zeros
+    systems = np.matmul(vectors.transpose(0, 2, 1) * extra[:, None, :], vectors)
+    systems += gram + regularization * np.eye(n_factors, dtype=np.float32)
+    targets = np.einsum('bwf,bw->bf', vectors, (1 + extra) * valid)
+    return np.linalg.solve(systems, targets[:, :, None])[:, :, 0]
+
+
+_worker = {}
+
+_TABLES = ('u_indptr', 'u_items', 'u_confidence', 'i_indptr', 'i_users', 'i_confidence')
+
+
+def _start_worker(table_dir):
+    # Every worker maps the same files: tables read-only, factors writable and shared
+    arrays = {name: np.load(os.path.join(table_dir, f'{name}.npy'), mmap_mode='r') for name in _TABLES}
+    _worker['tables'] = {
+        'users': (arrays['u_indptr'], arrays['u_items'], arrays['u_confidence']),
+        'items': (arrays['i_indptr'], arrays['i_users'], arrays['i_confidence']),
+    }
+    _worker['factors'] = {
+        side: np.load(os.path.join(table_dir, f'{side}.npy'), mmap_mode='r+') for side in ('users', 'items')
+    }
+
+
+def _solve_shard(task):
+    side, other_side, gram, regularization, rows = task
+    factors = _worker['factors']
+    factors[side][rows] = _solve_batch(_worker['tables'][side], factors[other_side], gram, regularization, rows)
+    return len(rows)
+
+
+class ALSModel:
+    """Implicit ALS: book factors, with readers folded in from their history.
+
+    :param factors: length of the reader and book vectors.
+    :param regularization: ``reg``, the L2 penalty on the factors.
+    :param alpha: confidence per unit of loan weight, ``c = 1 + alpha * r``.
+    :param iterations: alternating passes (readers, then books) when fitting.
+    :param workers: processes solving the batches of a pass; 1 solves in process.
+    :param batch_work: padded history entries solved at once, bounds memory.
+    :param seed: seeds the initial factors.
+    """
+
+    def __init__(self, factors=32, regularization=0.1, alpha=20.0, iterations=10, workers=1, batch_work=200_000,
+                 seed=0):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.workers = workers
+        self.batch_work = batch_work
+        self.seed = seed
+        self.book_ids = np.empty(0, dtype=np.int64)
+        self.item_factors = np.empty((0, factors), dtype=np.float32)
+        self.gram = np.zeros((factors, factors), dtype=np.float32)
+        # The file the factors were loaded from, if any
+        self.path = None
+        self._mtime = None
+
+    def tables(self, user_ids, book_ids, weights=None):
+        """CSR ``(indptr, indices, c - 1)`` tables of the loans, per reader and per book.
+
+        Readers are numbered by rank of id; sets ``self.book_ids``.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        if user_ids.shape != book_ids.shape:
+            raise ValueError("user_ids and book_ids must have the same length")
+        weights = np.ones(len(user_ids)) if weights is None else np.asarray(weights, dtype=np.float64)
+        user_index, users = np.unique(user_ids, return_inverse=True)
+        self.book_ids, items = np.unique(book_ids, return_inverse=True)
+        n_items = len(self.book_ids)
+        keys, totals = sum_duplicates(users.astype(np.int64) * n_items + items, weights)
+        users, items = keys // n_items, keys % n_items
+        confidence = (self.alpha * totals).astype(np.float32)
+        return csr(users, items, len(user_index), confidence), csr(items, users, n_items, confidence)
+
+    def fit(self, user_ids, book_ids, weights=None):
+        """Learn the factors from parallel arrays of loans.
+
+        :param weights: per-loan weight (see :func:`loan_weight`), 1 by default.
+        :returns: ``self``
+        """
+        user_table, item_table = self.tables(user_ids, book_ids, weights)
+        rng = np.random.default_rng(self.seed)
+        shapes = {'users': len(user_table[0]) - 1, 'items': len(item_table[0]) - 1}
+        tables = {'users': user_table, 'items': item_table}
+        batches = {
+            side: _batches(np.diff(table[0]), self.factors, self.batch_work) for side, table in tables.items()
+        }
+
+        with tempfile.TemporaryDirectory(prefix='lms-als-') as table_dir:
+            if self.workers > 1:
+                for name, array in zip(_TABLES, user_table + item_table):
+                    np.save(os.path.join(table_dir, f'{name}.npy'), array)
+                factors = {
+                    side: np.lib.format.open_memmap(
+                        os.path.join(table_dir, f'{side}.npy'), mode='w+', dtype=np.float32, shape=(n, self.factors),
+                    )
+                    for side, n in shapes.items()
+                }
+                pool = multiprocessing.Pool(self.workers, _start_worker, (table_dir,))
+            else:
+                factors = {side: np.empty((n, self.factors), dtype=np.float32) for side, n in shapes.items()}
+                pool = None
+            factors['items'][:] = rng.normal(0, 0.01, (shapes['items'], self.factors))
+            try:
+                for _ in range(self.iterations):
+                    for side, other_side in (('users', 'items'), ('items', 'users')):
+                        other = factors[other_side]
+                        gram = np.asarray(other.T @ other, dtype=np.float32)
+                        if pool is None:
+                            for rows in batches[side]:
+                                factors[side][rows] = _solve_batch(
+                                    tables[side], other, gram, self.regularization, rows,
+                                )
+                        else:
+                            tasks = [(side, other_side, gram, self.regularization, rows) for rows in batches[side]]
+                            for _ in pool.imap_unordered(_solve_shard, tasks):
+                                pass
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+            self.item_factors = np.array(factors['items'])
+            del factors
+        self.gram = self.item_factors.T @ self.item_factors
+        return self
+
+    def _find(self, book_ids):
+        """Rows of ``book_ids`` in the model and which of them were found."""
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        if not len(self.book_ids):
+            return np.zeros(len(book_ids), dtype=np.int64), np.zeros(len(book_ids), dtype=bool)
+        rows = np.minimum(np.searchsorted(self.book_ids, book_ids), len(self.book_ids) - 1)
+        return rows, self.book_ids[rows] == book_ids
+
+    def user_vector(self, history, weights=None):
+        """Fold a reader in from their history (book ids, repeats allowed).
+
+        :param weights: per-loan weight, as given to :meth:`fit`.
+        :returns: ``(factors, rows of the history books in the model)``
+        """
+        rows, found = self._find(history)
+        weights = np.ones(len(rows)) if weights is None else np.asarray(weights, dtype=np.float64)
+        rows, totals = sum_duplicates(rows[found], weights[found])
+        extra = (self.alpha * totals).astype(np.float32)
+        vectors = np.asarray(self.item_factors[rows], dtype=np.float32)
+        system = self.gram + self.regularization * np.eye(self.factors, dtype=np.float32)
+        system += (vectors.T * extra) @ vectors
+        return np.linalg.solve(system, vectors.T @ (1 + extra)), rows
+
+    def recommend(self, history, k=10, weights=None):
+        """Books with the highest predicted preference after ``history``, best first; history books excluded.
+
+        :param weights: per-loan weight of ``history``, as given to :meth:`fit`;
+            without them every loan counts 1, which a model fitted with
+            weights scores on a different scale.
+        """
+        if not len(self.book_ids):
+            return []
+        vector, rows = self.user_vector(history, weights)
+        if not len(rows):
+            return []
+        scores = self.item_factors @ vector
+        scores[rows] = -np.inf
+        k = min(k, len(scores) - len(rows))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return list(zip(self.book_ids[top].tolist(), scores[top].tolist()))
+
+    def similar(self, book_id, k=10):
+        """``[(book_id, score), ...]`` of the books whose factors are closest (cosine) to ``book_id``'s."""
+        rows, found = self._find([book_id])
+        if not found[0]:
+            return []
+        norms = np.maximum(np.linalg.norm(self.item_factors, axis=1), 1e-12)
+        scores = (self.item_factors @ self.item_factors[rows[0]]) / (norms * norms[rows[0]])
+        scores[rows[0]] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return list(zip(self.book_ids[top].tolist(), scores[top].tolist()))
+
+    def save(self, path):
+        """Write the book factors to ``path``; returns the file size."""
+        return write_arrays(
+            path, MAGIC, {'book_ids': self.book_ids, 'item_factors': self.item_factors, 'gram': self.gram},
+            factors=self.factors, regularization=self.regularization, alpha=self.alpha,
+            iterations=self.iterations, batch_work=self.batch_work, seed=self.seed,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Open a model saved by :meth:`save`; the factors are memory-mapped."""
+        # Taken first: a model saved meanwhile is loaded once more
+        mtime = os.stat(path).st_mtime_ns
+        meta, arrays = map_arrays(path, MAGIC)
+        model = cls(**meta)
+        model.book_ids, model.item_factors, model.gram = arrays['book_ids'], arrays['item_factors'], arrays['gram']
+        model.path, model._mtime = path, mtime
+        return model
+
+    def is_replaced(self):
+        """Whether a newer model has been saved to the file this one was loaded from."""
+        if self.path is None:
+            return False
+        try:
+            return os.stat(self.path).st_mtime_ns != self._mtime
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,195 @@
+"""
+Approximate nearest-neighbour search over dense book vectors.
+
+Exact top-k by dot product compares a query with every vector: fine for one
+library's catalog, too slow once it also holds millions of inter-library
+records. :class:`IVFIndex` is an inverted-file index: k-means groups the
+vectors into ``n_lists`` clusters (the coarse quantizer) and a query is only
+compared with the vectors of the ``n_probe`` clusters whose centroids score
+highest against it. Vectors are stored grouped by cluster, so a probed
+cluster is one contiguous slice.
+
+``n_probe`` trades recall for latency on every query (probing all the lists
+is an exact search). ``n_lists`` is fixed when the index is built: more,
+smaller lists make each probe cheaper but need more probes for the same
+recall; about ``sqrt(n)`` is a good start.
+
+Indexes are saved as one file (:mod:`core.recommendations.arrayfile`) and
+loaded as memory maps, so they can sit next to the database and be shared
+by every server process.
+"""
+import numpy as np
+
+from .arrayfile import map_arrays, write_arrays
+from .sparse import ranges
+
+METRICS = ('cosine', 'dot')
+MAGIC = b'LMSIVF\0\0'
+
+# Vectors scored against the centroids at once while clustering
+ASSIGN_CHUNK = 16_384
+
+
+def _top_k(scores, k):
+    """Positions of the ``k`` highest ``scores``, best first."""
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind='stable')]
+    return np.argsort(-scores, kind='stable')
+
+
+class IVFIndex:
+    """Inverted-file index for top-k search by cosine or dot product.
+
+    :param n_lists: clusters; ``round(sqrt(n))`` of the fitted vectors by default.
+    :param n_probe: clusters scanned per query unless :meth:`search` is told otherwise.
+    :param metric: ``'cosine'`` (vectors and queries are L2-normalised) or
+        ``'dot'`` (raw inner product, e.g. for matrix factorisation factors).
+    :param n_iter: k-means iterations.
+    :param train_per_list: vectors sampled per cluster to train k-means.
+    :param dtype: storage of the vectors, ``'float32'`` or ``'float16'`` (half
+        the memory; scores are still computed in float32).
+    :param seed: seeds the k-means sample and initial centroids.
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, metric='cosine', n_iter=10, train_per_list=64, dtype='float32',
+                 seed=0):
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}")
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.metric = metric
+        self.n_iter = n_iter
+        self.train_per_list = train_per_list
+        self.dtype = dtype
+        self.seed = seed
+        self.ids = np.empty(0, dtype=np.int64)
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.list_indptr = np.zeros(1, dtype=np.int64)
+        self.vectors = np.empty((0, 0), dtype=dtype)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _prepare(self, vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.metric == 'cosine':
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    @staticmethod
+    def _assign(vectors, centroids):
+        """Nearest centroid (Euclidean) of every vector."""
+        half_norms = 0.5 * (centroids ** 2).sum(axis=1)
+        labels = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), ASSIGN_CHUNK):
+            chunk = vectors[start:start + ASSIGN_CHUNK]
+            labels[start:start + len(chunk)] = np.argmax(chunk @ centroids.T - half_norms, axis=1)
+        return labels
+
+    def _kmeans(self, sample, n_lists, rng):
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(self.n_iter):
+            labels = self._assign(sample, centroids)
+            # Per-cluster sums from a running sum over the sample sorted by cluster
+            order = np.argsort(labels, kind='stable')
+            bounds = np.searchsorted(labels[order], np.arange(n_lists + 1))
+            running = np.zeros((len(sample) + 1, sample.shape[1]), dtype=np.float64)
+            np.cumsum(sample[order], axis=0, out=running[1:])
+            counts = np.diff(bounds)
+            sums = running[bounds[1:]] - running[bounds[:-1]]
+            centroids = (sums / np.maximum(counts, 1)[:, None]).astype(np.float32)
+            empty = np.flatnonzero(counts == 0)
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        if self.metric == 'cosine':
+            centroids = self._prepare(centroids)
+        return centroids
+
+    def fit(self, ids, vectors):
+        """Cluster ``vectors`` (one row per id in ``ids``) and index them.
+
+        :returns: ``self``
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = self._prepare(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+        n = len(ids)
+        n_lists = min(self.n_lists or max(round(n ** 0.5), 1), n)
+        if not n_lists:
+            self.centroids = np.empty((0, vectors.shape[1]), dtype=np.float32)
+            self.vectors = vectors.astype(self.dtype)
+            return self
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[np.sort(rng.choice(n, min(n, n_lists * self.train_per_list), replace=False))]
+        self.centroids = self._kmeans(sample, n_lists, rng)
+        del sample
+
+        labels = self._assign(vectors, self.centroids)
+        order = np.argsort(labels, kind='stable')
+        self.list_indptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=self.list_indptr[1:])
+        self.ids = ids[order]
+        self.vectors = vectors[order].astype(self.dtype)
+        return self
+
+    def search(self, queries, k=10, n_probe=None):
+        """Approximate top-``k`` of every query vector.
+
+        :param queries: one vector or a ``(m, dim)`` array.
+        :param n_probe: clusters to scan, default ``self.n_probe``.
+        :returns: ``(ids, scores)``, two ``(m, k)`` arrays, best first; rows
+            with fewer than ``k`` results end with id ``-1``.
+        """
+        queries = self._prepare(queries)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.zeros((len(queries), k), dtype=np.float32)
+        n_lists = len(self.centroids)
+        if not n_lists:
+            return ids, scores
+        n_probe = min(n_probe or self.n_probe, n_lists)
+        probes = queries @ self.centroids.T
+        if n_probe < n_lists:
+            probes = np.argpartition(-probes, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = np.broadcast_to(np.arange(n_lists), probes.shape)
+        sizes = np.diff(self.list_indptr)
+        for i, query in enumerate(queries):
+            rows = ranges(self.list_indptr[probes[i]], sizes[probes[i]])
+            found = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+            top = _top_k(found, k)
+            ids[i, :len(top)] = self.ids[rows[top]]
+            scores[i, :len(top)] = found[top]
+        return ids, scores
+
+    def search_exact(self, queries, k=10):
+        """Exact top-``k`` by scanning every vector; same result format as :meth:`search`."""
+        queries = self._prepare(queries)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.zeros((len(queries), k), dtype=np.float32)
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        for i, query in enumerate(queries):
+            found = vectors @ query
+            top = _top_k(found, k)
+            ids[i, :len(top)] = self.ids[top]
+            scores[i, :len(top)] = found[top]
+        return ids, scores
+
+    def save(self, path):
+        """Write the index to ``path``; returns the file size."""
+        return write_arrays(
+            path, MAGIC,
+            {'ids': self.ids, 'centroids': self.centroids, 'list_indptr': self.list_indptr, 'vectors': self.vectors},
+            n_probe=self.n_probe, metric=self.metric, n_iter=self.n_iter, train_per_list=self.train_per_list,
+            dtype=self.dtype, seed=self.seed,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Open an index saved by :meth:`save`; its arrays are memory-mapped."""
+        meta, arrays = map_arrays(path, MAGIC)
+        index = cls(**meta)
+        index.ids, index.centroids = arrays['ids'], arrays['centroids']
+        index.list_indptr, index.vectors = arrays['list_indptr'], arrays['vectors']
+        index.n_lists = len(index.centroids)
+        return index
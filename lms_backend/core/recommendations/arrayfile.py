@@ -0,0 +1,138 @@
+"""
+Files of named NumPy arrays that are memory-mapped in place.
+
+Layout: an 8-byte magic, the length of a JSON header (uint32, little endian),
+the header itself (``meta`` plus the dtype, shape and offset of every array),
+then the arrays, each starting on a 64-byte boundary. Unlike ``.npz`` nothing
+is zipped, so :func:`map_arrays` returns ``numpy.memmap`` views without
+reading the data: pages are loaded on first access and shared through the
+page cache by every process that maps the same file.
+
+Files are never written over while mapped: :func:`write_arrays` writes each
+version to a new file, ``{path}.{version}``, and then swaps a pointer file at
+``path`` to name it. A process keeps the version it mapped until it opens
+``path`` again, the previous version is kept for processes still switching
+over, and older ones are deleted (on Windows, where a mapped file cannot be
+deleted, by a later write once nothing maps them any more).
+"""
+import json
+import os
+import re
+import struct
+import time
+
+import numpy as np
+
+ALIGN = 64
+_LENGTH = struct.Struct('<I')
+POINTER = b'LMSPTR\0\0'
+
+# Tries and pause when another process holds the pointer file open (Windows)
+REPLACE_TRIES = 50
+REPLACE_PAUSE = 0.02
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def write_arrays(path, magic, arrays, **meta):
+    """Write ``{name: array}`` and the JSON-serialisable ``meta`` to ``path``; returns the file size."""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    sections, offset = {}, 0
+    for name, array in arrays.items():
+        sections[name] = [array.dtype.newbyteorder('<').str, list(array.shape), offset]
+        offset = _aligned(offset + array.nbytes)
+    # The data starts after the header, whose length depends on the offsets
+    start = 0
+    while True:
+        placed = {name: [dtype, shape, offset + start] for name, (dtype, shape, offset) in sections.items()}
+        header = json.dumps({'meta': meta, 'arrays': placed}).encode()
+        needed = _aligned(len(magic) + _LENGTH.size + len(header))
+        if needed <= start:
+            break
+        start = needed
+    sections = placed
+
+    keep = {data_path(path)} if os.path.exists(path) else set()
+    version = f'{path}.{time.time_ns()}'
+    with open(version, 'xb') as f:
+        f.write(magic + _LENGTH.pack(len(header)) + header)
+        for name, array in arrays.items():
+            dtype, _, offset = sections[name]
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(array.astype(dtype, copy=False).data)
+        size = f.tell()
+        f.flush()
+        os.fsync(f.fileno())
+    _point(path, version)
+    keep.add(os.path.abspath(version))
+    for old in _versions(path):
+        if old not in keep:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return size
+
+
+def _point(path, version):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(POINTER + os.path.basename(version).encode())
+        f.flush()
+        os.fsync(f.fileno())
+    for attempt in range(REPLACE_TRIES):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            # A reader has the pointer open for a moment
+            if attempt == REPLACE_TRIES - 1:
+                raise
+            time.sleep(REPLACE_PAUSE)
+
+
+def _versions(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    pattern = re.compile(re.escape(name) + r'\.\d+')
+    try:
+        return [os.path.join(directory, entry) for entry in os.listdir(directory) if pattern.fullmatch(entry)]
+    except FileNotFoundError:
+        return []
+
+
+def data_path(path):
+    """The file holding the version of ``path`` written last (``path`` itself if it is not a pointer)."""
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+    if not head.startswith(POINTER):
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(path)), head[len(POINTER):].decode())
+
+
+def remove_arrays(path):
+    """Delete ``path`` and every version of it."""
+    for name in [path, *_versions(path)]:
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+def map_arrays(path, magic):
+    """``(meta, {name: read-only memmap})`` of a file from :func:`write_arrays`."""
+    path = data_path(path)
+    with open(path, 'rb') as f:
+        head = f.read(len(magic) + _LENGTH.size)
+        if head[:len(magic)] != magic:
+            raise ValueError(f"{path} is not a {magic.rstrip(bytes(1)).decode()} file")
+        header = json.loads(f.read(_LENGTH.unpack(head[len(magic):])[0]))
+        size = os.fstat(f.fileno()).st_size
+    data = np.memmap(path, dtype=np.uint8, mode='r', shape=(size,)) if size else np.empty(0, dtype=np.uint8)
+    arrays = {}
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        dtype = np.dtype(dtype)
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        arrays[name] = data[offset:offset + nbytes].view(dtype).reshape(shape)
+    return header['meta'], arrays
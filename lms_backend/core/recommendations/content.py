@@ -0,0 +1,419 @@
+"""
+Content-based book similarity from TF-IDF over the catalog text.
+
+Every book becomes a sparse TF-IDF vector over the words of its title and
+description, its author's name words and its category (title, author and
+category tokens weigh more than description words). Vectors are L2
+normalised, so the dot product of two books is their cosine similarity.
+
+The top-k neighbours of every book are computed from the inverted index a
+block of books at a time: each (book, term) entry of the block is expanded
+to the postings of that term and the products are summed per (book, book)
+key, which is the sparse product ``X_block @ X.T`` without ever building
+the dense similarity matrix.
+
+Terms found in more than ``max_postings`` books would make that expansion
+quadratic in the catalog size, so they are not expanded. Common words carry
+little weight (low IDF) and are left out of the products altogether (they
+still count in the norms). A common category cannot be dropped like that, it
+is the strongest signal after the author: two books become candidates through
+a rarer shared term and then get their category product added, which costs
+one comparison per candidate pair.
+
+Unlike the loan-based models this one knows a book as soon as it is in the
+catalog, and :meth:`ContentModel.update` re-indexes a single added or edited
+book without a rebuild.
+"""
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from .sparse import blocks, coo_dot, csr, ranges, sum_duplicates, top_k_per_row
+
+_TOKEN = re.compile(r'[^\W_]{2,}', re.UNICODE)
+
+STOP_WORDS = frozenset(
+    'about after all also an and any are as at be book books by for from has have her his how in '
+    'into is it its new not of on or our out over she that the their them they this to up was '
+    'what when which who will with you your'.split()
+)
+
+# Repeat count of a field's tokens before TF weighting
+FIELD_WEIGHTS = {'title': 3, 'author': 2, 'category': 2, 'description': 1}
+
+CATEGORY_PREFIX = 'category:'
+
+CHUNK_SIZE = 10_000
+
+
+def tokens(title='', author='', category='', description=''):
+    """Weighted term counts of one book. Author and category terms are
+    prefixed so that an author called "Rivers" does not match the word."""
+    counts = Counter()
+    for word in _TOKEN.findall((title or '').lower()):
+        if word not in STOP_WORDS:
+            counts[word] += FIELD_WEIGHTS['title']
+    for word in _TOKEN.findall((description or '').lower()):
+        if word not in STOP_WORDS:
+            counts[word] += FIELD_WEIGHTS['description']
+    for word in _TOKEN.findall((author or '').lower()):
+        counts['author:' + word] += FIELD_WEIGHTS['author']
+    if category:
+        counts[CATEGORY_PREFIX + category.strip().lower()] += FIELD_WEIGHTS['category']
+    return counts
+
+
+class ContentModel:
+    """Top-k similar books by TF-IDF cosine similarity.
+
+    :param k: neighbours kept per book.
+    :param max_postings: terms found in more books than this are not expanded
+        (see the module docstring).
+    :param block_work: rough number of products expanded per block, bounds memory.
+    """
+
+    def __init__(self, k=50, max_postings=1000, block_work=5_000_000):
+        self.k = k
+        self.max_postings = max_postings
+        self.block_work = block_work
+        self.vocabulary = {}
+        self.idf = np.empty(0, dtype=np.float32)
+        self.df = np.empty(0, dtype=np.int64)
+        self._is_category = np.empty(0, dtype=bool)
+        self.n_books = 0
+        self.book_ids = np.empty(0, dtype=np.int64)
+        # neighbour *book ids* (not rows), so books added later can appear in them
+        self.neighbors = np.empty((0, k), dtype=np.int64)
+        self.scores = np.empty((0, k), dtype=np.float32)
+        # Fitted vectors by book (row -> terms, weights) and by expanded term
+        # (term -> rows, weights), plus each book's common category (term, weight)
+        self._documents = (np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        self._postings = (np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        self._categories = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        self._reset_overlay()
+
+    def _reset_overlay(self):
+        # Books added or edited since fit(): their current vectors and, for
+        # books not in the fitted arrays, their neighbour lists
+        self._stale = np.zeros(len(self.book_ids), dtype=bool)
+        self._extra_vectors = {}
+        self._extra_neighbors = {}
+
+    # -- vectors ------------------------------------------------------------
+
+    def _expanded(self, term_ids):
+        """Which terms are expanded through the inverted index."""
+        return self.df[term_ids] <= self.max_postings
+
+    def _weights(self, term_ids, counts):
+        """Normalised TF-IDF weights; sublinear TF, smoothed IDF."""
+        weights = (1.0 + np.log(counts)) * self.idf[term_ids]
+        norm = np.linalg.norm(weights.astype(np.float64)) or 1.0
+        return (weights / norm).astype(np.float32)
+
+    def vectorize(self, title='', author='', category='', description=''):
+        """``(term_ids, weights)`` of one book against the fitted vocabulary,
+        without common words; unseen terms are added with the IDF of a term
+        found in one book."""
+        counts = tokens(title, author, category, description)
+        term_ids = []
+        for term in counts:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                term_id = self.vocabulary[term] = len(self.vocabulary)
+                self.idf = np.append(self.idf, np.float32(math.log((1 + self.n_books) / 2) + 1))
+                self.df = np.append(self.df, 1)
+                self._is_category = np.append(self._is_category, term.startswith(CATEGORY_PREFIX))
+            term_ids.append(term_id)
+        term_ids = np.array(term_ids, dtype=np.int64)
+        weights = self._weights(term_ids, np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        order = np.argsort(term_ids)
+        term_ids, weights = term_ids[order], weights[order]
+        used = self._expanded(term_ids) | self._is_category[term_ids]
+        return term_ids[used], weights[used]
+
+    # -- building -----------------------------------------------------------
+
+    def _count_terms(self, books):
+        """COO arrays (row, term, weighted count) for ``(id, title, author, category, description)`` rows."""
+        book_ids, rows, terms, counts = [], [], [], []
+        chunk_rows, chunk_terms, chunk_counts = [], [], []
+        for row, (book_id, title, author, category, description) in enumerate(books):
+            book_ids.append(book_id)
+            for term, count in tokens(title, author, category, description).items():
+                term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                chunk_rows.append(row)
+                chunk_terms.append(term_id)
+                chunk_counts.append(count)
+            # Python lists of ints cost ~30 bytes per entry, flush them to NumPy often
+            if row % CHUNK_SIZE == CHUNK_SIZE - 1:
+                rows.append(np.array(chunk_rows, dtype=np.int64))
+                terms.append(np.array(chunk_terms, dtype=np.int64))
+                counts.append(np.array(chunk_counts, dtype=np.float32))
+                chunk_rows, chunk_terms, chunk_counts = [], [], []
+        rows.append(np.array(chunk_rows, dtype=np.int64))
+        terms.append(np.array(chunk_terms, dtype=np.int64))
+        counts.append(np.array(chunk_counts, dtype=np.float32))
+        return np.array(book_ids, dtype=np.int64), np.concatenate(rows), np.concatenate(terms), np.concatenate(counts)
+
+    def fit(self, books):
+        """Index the catalog.
+
+        :param books: iterable of ``(id, title, author, category, description)``.
+        :returns: ``self``
+        """
+        self.vocabulary = {}
+        book_ids, rows, terms, counts = self._count_terms(books)
+        order = np.argsort(book_ids, kind='stable')
+        self.book_ids = book_ids[order]
+        rows = np.argsort(order)[rows]  # rows follow the sorted book ids
+        n_books, n_terms = len(book_ids), len(self.vocabulary)
+        self.n_books = n_books
+
+        self.df = np.bincount(terms, minlength=n_terms)
+        self.idf = (np.log((1 + n_books) / (1 + self.df)) + 1).astype(np.float32)
+        self._is_category = np.fromiter(
+            (term.startswith(CATEGORY_PREFIX) for term in self.vocabulary), dtype=bool, count=n_terms,
+        )
+        weights = (1.0 + np.log(counts)) * self.idf[terms]
+        norms = np.sqrt(np.bincount(rows, weights=weights.astype(np.float64) ** 2, minlength=n_books))
+        weights = (weights / norms[rows]).astype(np.float32)
+
+        expanded = self._expanded(terms)
+        category = ~expanded & self._is_category[terms]
+        self._postings = csr(terms[expanded], rows[expanded], n_terms, weights[expanded])
+        used = expanded | category
+        self._documents = csr(rows[used], terms[used], n_books, weights[used])
+        category_terms = np.full(n_books, -1, dtype=np.int64)
+        category_weights = np.zeros(n_books, dtype=np.float32)
+        category_terms[rows[category]] = terms[category]
+        category_weights[rows[category]] = weights[category]
+        self._categories = (category_terms, category_weights)
+        del rows, terms, weights, counts, expanded, category, used
+
+        k = min(self.k, max(n_books - 1, 0))
+        self.neighbors = np.full((n_books, self.k), -1, dtype=np.int64)
+        self.scores = np.zeros((n_books, self.k), dtype=np.float32)
+        self._reset_overlay()
+        if not k:
+            return self
+
+        d_indptr, d_terms, d_weights = self._documents
+        t_indptr, t_rows, t_weights = self._postings
+        postings = np.diff(t_indptr)  # 0 for common categories
+        row_of = np.repeat(np.arange(n_books, dtype=np.int64), np.diff(d_indptr))
+        work = np.bincount(row_of, weights=postings[d_terms], minlength=n_books).astype(np.int64)
+        del row_of
+        for start, stop in blocks(work, self.block_work):
+            lo, hi = d_indptr[start], d_indptr[stop]
+            block_rows = np.repeat(np.arange(stop - start, dtype=np.int64), np.diff(d_indptr[start:stop + 1]))
+            lengths = postings[d_terms[lo:hi]]
+            expanded = ranges(t_indptr[d_terms[lo:hi]], lengths)
+            keys, dots = sum_duplicates(
+                np.repeat(block_rows, lengths) * n_books + t_rows[expanded],
+                np.repeat(d_weights[lo:hi], lengths) * t_weights[expanded],
+            )
+            r, c = np.divmod(keys, n_books)
+            keep = c != r + start
+            r, c = r[keep], c[keep]
+            dots = dots[keep] + self._category_dots(category_terms[r + start], category_weights[r + start], c)
+            r, rank, c, dots = top_k_per_row(r, c, np.minimum(dots, 1.0), stop - start, k)
+            self.neighbors[r + start, rank] = self.book_ids[c]
+            self.scores[r + start, rank] = dots
+        return self
+
+    def _category_dots(self, terms, weights, rows):
+        """Products of common-category entries ``(terms, weights)`` with those of fitted ``rows``."""
+        category_terms, category_weights = self._categories
+        same = (category_terms[rows] == terms) & (terms >= 0)
+        return np.where(same, weights * category_weights[rows], 0).astype(np.float32)
+
+    def embed(self, dim=64, n_iter=3, seed=0):
+        """Dense ``(book_ids, vectors)`` of the current books, for nearest-neighbour
+        search (:class:`~core.recommendations.ann.IVFIndex`).
+
+        Latent semantic analysis: the TF-IDF matrix is reduced to its top
+        ``dim`` singular directions (randomized SVD with ``n_iter`` power
+        iterations), so books sharing related terms, not only the same ones,
+        get close vectors.
+        """
+        d_indptr, d_terms, d_weights = self._documents
+        current = ~self._stale
+        ids = np.concatenate([
+            self.book_ids[current], np.fromiter(self._extra_vectors, dtype=np.int64, count=len(self._extra_vectors)),
+        ])
+        # (row, term, weight) entries of the current vectors, rows numbered as in ids
+        row_of = np.cumsum(current) - 1
+        fitted_rows = np.repeat(np.arange(len(self.book_ids)), np.diff(d_indptr))
+        keep = current[fitted_rows]
+        rows = [row_of[fitted_rows[keep]]]
+        terms, weights = [d_terms[keep]], [d_weights[keep]]
+        for row, (term_ids, term_weights) in enumerate(self._extra_vectors.values(), start=int(current.sum())):
+            rows.append(np.full(len(term_ids), row, dtype=np.int64))
+            terms.append(term_ids)
+            weights.append(term_weights)
+        rows, terms = np.concatenate(rows), np.concatenate(terms)
+        weights = np.concatenate(weights).astype(np.float64)
+        n_rows, n_terms = len(ids), len(self.idf)
+        rank = min(dim, n_rows, n_terms)
+        if not rank:
+            return ids, np.zeros((n_rows, dim), dtype=np.float32)
+
+        def product(dense):
+            return coo_dot(rows, terms, weights, dense, n_rows)
+
+        def transposed(dense):
+            return coo_dot(terms, rows, weights, dense, n_terms)
+
+        rng = np.random.default_rng(seed)
+        basis = np.linalg.qr(product(rng.standard_normal((n_terms, min(rank + 10, n_terms)))))[0]
+        for _ in range(n_iter):
+            basis = np.linalg.qr(product(np.linalg.qr(transposed(basis))[0]))[0]
+        directions = np.linalg.svd(transposed(basis).T, full_matrices=False)[2][:rank]
+        vectors = np.zeros((n_rows, dim), dtype=np.float32)
+        vectors[:, :rank] = product(directions.T)
+        return ids, vectors
+
+    # -- incremental updates ------------------------------------------------
+
+    def _row(self, book_id):
+        row = int(np.searchsorted(self.book_ids, book_id))
+        if row < len(self.book_ids) and self.book_ids[row] == book_id:
+            return row
+        return None
+
+    def _vector(self, book_id):
+        """Current ``(term_ids, weights)`` of a book, None if it is not indexed."""
+        if book_id in self._extra_vectors:
+            return self._extra_vectors[book_id]
+        row = self._row(book_id)
+        if row is None or self._stale[row]:
+            return None
+        d_indptr, d_terms, d_weights = self._documents
+        return d_terms[d_indptr[row]:d_indptr[row + 1]], d_weights[d_indptr[row]:d_indptr[row + 1]]
+
+    def _dots(self, book_id, term_ids, weights):
+        """Similarity of a vector to every other current book: ``(book_ids, scores)``."""
+        t_indptr, t_rows, t_weights = self._postings
+        fitted = term_ids < len(t_indptr) - 1
+        starts = t_indptr[term_ids[fitted]]
+        lengths = t_indptr[term_ids[fitted] + 1] - starts  # 0 for common categories
+        expanded = ranges(starts, lengths)
+        rows, dots = sum_duplicates(t_rows[expanded], np.repeat(weights[fitted], lengths) * t_weights[expanded])
+        category = fitted & ~self._expanded(term_ids)
+        if category.any():
+            dots = dots + self._category_dots(term_ids[category][0], weights[category][0], rows)
+        # fitted vectors of edited or removed books are outdated
+        current = ~self._stale[rows]
+        ids, scores = [self.book_ids[rows[current]]], [dots[current]]
+        for other_id, (other_terms, other_weights) in self._extra_vectors.items():
+            shared, mine, theirs = np.intersect1d(term_ids, other_terms, assume_unique=True, return_indices=True)
+            # same candidate rule as fit(): at least one shared expanded term
+            if self._expanded(shared).any():
+                ids.append(np.array([other_id]))
+                scores.append(np.array([np.dot(weights[mine], other_weights[theirs])]))
+        ids, scores = np.concatenate(ids), np.concatenate(scores).astype(np.float32)
+        keep = (ids != book_id) & (scores > 0)
+        return ids[keep], np.minimum(scores[keep], 1.0)
+
+    def _list(self, book_id):
+        row = self._row(book_id)
+        if row is not None:
+            return self.neighbors[row], self.scores[row]
+        return self._extra_neighbors.get(book_id, (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)))
+
+    def _set_list(self, book_id, ids, scores):
+        order = np.argsort(-scores, kind='stable')[:self.k]
+        ids, scores = ids[order], scores[order]
+        row = self._row(book_id)
+        if row is None:
+            self._extra_neighbors[book_id] = (ids, scores)
+            return
+        self.neighbors[row] = -1
+        self.scores[row] = 0
+        self.neighbors[row, :len(ids)] = ids
+        self.scores[row, :len(ids)] = scores
+
+    def _drop(self, book_id):
+        """Take a book out of every neighbour list, before its vector changes.
+
+        Similarity is symmetric, so only the books that share a term with its
+        current vector can have it in their lists; no need to scan them all.
+        """
+        vector = self._vector(book_id)
+        if vector is None:
+            return
+        for other_id in self._dots(book_id, *vector)[0].tolist():
+            ids, scores = self._list(other_id)
+            if book_id in ids:
+                self._set_list(other_id, ids[ids != book_id], scores[ids != book_id])
+
+    def update(self, book_id, title='', author='', category='', description=''):
+        """Re-index one added or edited book.
+
+        Recomputes its own neighbour list and puts it into the lists of the
+        books it now belongs to; other lists are left alone (a list that
+        loses the book keeps one slot free until the next :meth:`fit`).
+        """
+        self._drop(book_id)
+        term_ids, weights = self.vectorize(title, author, category, description)
+        row = self._row(book_id)
+        if row is not None:
+            self._stale[row] = True
+        self._extra_vectors[book_id] = (term_ids, weights)
+
+        ids, scores = self._dots(book_id, term_ids, weights)
+        self._set_list(book_id, ids, scores)
+
+        # Enter the lists whose weakest entry (0 for a free slot) it beats
+        weakest = np.zeros(len(ids), dtype=np.float32)
+        if len(self.book_ids):
+            rows = np.minimum(np.searchsorted(self.book_ids, ids), len(self.book_ids) - 1)
+            fitted = self.book_ids[rows] == ids
+            weakest[fitted] = self.scores[rows[fitted]].min(axis=1)
+        else:
+            fitted = np.zeros(len(ids), dtype=bool)
+        for i in np.flatnonzero(~fitted):
+            other_scores = self._list(int(ids[i]))[1]
+            if len(other_scores) >= self.k:
+                weakest[i] = other_scores.min()
+        better = scores > weakest
+        for other_id, score in zip(ids[better].tolist(), scores[better].tolist()):
+            other_ids, other_scores = self._list(other_id)
+            valid = other_ids >= 0
+            self._set_list(
+                other_id,
+                np.append(other_ids[valid], book_id),
+                np.append(other_scores[valid], np.float32(score)),
+            )
+
+    def remove(self, book_id):
+        """Forget a deleted book."""
+        self._drop(book_id)
+        row = self._row(book_id)
+        if row is not None:
+            self._stale[row] = True
+            self.neighbors[row] = -1
+            self.scores[row] = 0
+        self._extra_vectors.pop(book_id, None)
+        self._extra_neighbors.pop(book_id, None)
+
+    # -- serving ------------------------------------------------------------
+
+    def similar(self, book_id, k=10):
+        """``[(book_id, score), ...]`` of the books with the most similar text."""
+        ids, scores = self._list(book_id)
+        valid = ids[:k] >= 0
+        return list(zip(ids[:k][valid].tolist(), scores[:k][valid].tolist()))
+
+    def recommend(self, history, k=10):
+        """Books whose text is closest to the books in ``history``, best first."""
+        totals = Counter()
+        for book_id in history:
+            for other_id, score in self.similar(book_id, self.k):
+                totals[other_id] += score
+        for book_id in history:
+            totals.pop(book_id, None)
+        return totals.most_common(k)
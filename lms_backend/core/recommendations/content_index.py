@@ -0,0 +1,91 @@
+"""
+Content similarity served from an approximate nearest-neighbour index.
+
+:class:`ContentModel` finds every book's neighbours when it is fitted, by
+sparse products over the whole catalog, in every web process. For catalogs
+of millions of records ``manage.py build_recommendations --content-index``
+instead reduces the TF-IDF vectors to dense ones (:meth:`ContentModel.embed`)
+and saves them in an :class:`IVFIndex` file; web processes map that file and
+answer each request with one index search, probing ``n_probe`` clusters.
+
+Like :class:`NeighbourFile` the index is read-only: books added or edited
+after the build are picked up by the next one, deleted books are left out
+of the results straight away.
+"""
+import os
+
+import numpy as np
+
+from .ann import IVFIndex
+from .content import ContentModel
+
+
+def build_content_index(path, books, dim=64, n_lists=None, n_probe=8):
+    """Embed the catalog and write its index to ``path``.
+
+    :param books: iterable of ``(id, title, author, category, description)``.
+    :returns: ``(n_books, bytes written)``
+    """
+    # Only the vectors are needed, not the neighbour lists (k=0 skips them)
+    ids, vectors = ContentModel(k=0).fit(books).embed(dim)
+    index = IVFIndex(n_lists=n_lists, n_probe=n_probe).fit(ids, vectors)
+    return len(ids), index.save(path)
+
+
+class ContentIndex:
+    """Read-only content model backed by a file from :func:`build_content_index`.
+
+    Serves :meth:`similar` and :meth:`recommend` like :class:`ContentModel`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Taken first: a build that moves the pointer meanwhile is loaded once more
+        self._mtime = os.stat(path).st_mtime_ns
+        self.index = IVFIndex.load(path)
+        # Rows of the index by book id
+        self._order = np.argsort(self.index.ids, kind='stable')
+        self._sorted_ids = self.index.ids[self._order]
+        self._removed = set()
+
+    def is_replaced(self):
+        """Whether a newer build has been written to ``path`` since this one was opened."""
+        try:
+            return os.stat(self.path).st_mtime_ns != self._mtime
+        except FileNotFoundError:
+            return False
+
+    def _rows(self, book_ids):
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return book_ids[:0]
+        found = np.minimum(np.searchsorted(self._sorted_ids, book_ids), len(self._sorted_ids) - 1)
+        return self._order[found[self._sorted_ids[found] == book_ids]]
+
+    def _search(self, query, k, exclude):
+        ids, scores = self.index.search(query, k + len(exclude))
+        ids, scores = ids[0], scores[0]
+        keep = (ids >= 0) & ~np.isin(ids, list(exclude)) & (scores > 0)
+        return list(zip(ids[keep][:k].tolist(), np.minimum(scores[keep][:k], 1.0).tolist()))
+
+    def similar(self, book_id, k=10):
+        """``[(book_id, score), ...]`` of the books with the most similar text."""
+        rows = self._rows([book_id])
+        if not len(rows) or book_id in self._removed:
+            return []
+        return self._search(self.index.vectors[rows[0]], k, self._removed | {book_id})
+
+    def recommend(self, history, k=10):
+        """Books whose text is closest to the books in ``history`` (their mean vector), best first."""
+        rows = self._rows(history)
+        if not len(rows):
+            return []
+        query = np.asarray(self.index.vectors[rows], dtype=np.float32).sum(axis=0)
+        return self._search(query, k, self._removed | set(history))
+
+    def update(self, book_id, title='', author='', category='', description=''):
+        """New text waits for the next build."""
+
+    def remove(self, book_id):
+        """Leave a deleted book out of the results."""
+        self._removed.add(book_id)
@@ -0,0 +1,441 @@
+"""
+Item-item collaborative filtering from loan co-occurrence.
+
+Two books are similar when the same readers borrowed both. The loans are
+turned into a binary user x book matrix held as CSR arrays (``indptr`` /
+``indices``, as in scipy.sparse), once per user and once per book, and the
+co-occurrence counts ``C = X^T X`` are computed a block of books at a time:
+every (book, reader) pair in the block is expanded to all books of that
+reader and the resulting (book, book) keys are sorted and counted. Counts are then
+normalised (cosine or Jaccard) and only the top ``k`` neighbours of each book
+are kept, so the model is two ``(n_books, k)`` arrays.
+
+The model only sees integer arrays, so it can be fitted from the database
+(see :mod:`core.recommendations.store`) or from any other loan log. Blocks
+are independent: :meth:`CooccurrenceModel.fit_rows` fits one range of books,
+which :mod:`core.recommendations.neighbour_file` spreads over processes.
+
+With ``keep_counts=True`` the model also keeps the full count table (a
+symmetric CSR, 8 bytes per co-borrowed pair and direction), the readers of
+every book and every reader's history, so that :meth:`CooccurrenceModel.add_loan`
+can account for a new loan in O(reader's history) instead of a refit. The
+lists whose scores changed are only marked, and recomputed from the count
+table the next time they are read.
+"""
+import threading
+
+import numpy as np
+
+from .sparse import blocks, csr, ranges, sum_duplicates, top_k_per_row
+
+SIMILARITIES = ('cosine', 'jaccard')
+
+
+def pair_work(tables):
+    """Pairs each item expands to when counted: the sum of the degrees of its readers."""
+    u_indptr, _, i_indptr, i_users = tables
+    total = np.zeros(len(i_users) + 1, dtype=np.int64)
+    np.cumsum(np.diff(u_indptr)[i_users], out=total[1:])
+    return total[i_indptr[1:]] - total[i_indptr[:-1]]
+
+
+class CooccurrenceModel:
+    """Top-k similar books by co-borrowing.
+
+    :param k: neighbours kept per book.
+    :param similarity: ``'cosine'`` (``c_ij / sqrt(n_i * n_j)``) or
+        ``'jaccard'`` (``c_ij / (n_i + n_j - c_ij)``), where ``c_ij`` is the
+        number of readers who borrowed both books and ``n_i`` the readers of
+        book ``i``.
+    :param max_user_items: only the most recent distinct books of each reader
+        are used. A reader contributes ``n^2`` pairs, so this bounds the cost
+        of a few very heavy accounts (class sets, staff test users).
+    :param min_count: pairs borrowed together by fewer readers are ignored.
+    :param block_work: rough number of pairs expanded per block, bounds memory.
+    :param keep_counts: keep what :meth:`add_loan` needs (see the module docstring).
+    :param compact_after: pending count changes folded into the count table at once.
+    """
+
+    def __init__(self, k=50, similarity='cosine', max_user_items=500, min_count=1, block_work=10_000_000,
+                 keep_counts=False, compact_after=500_000):
+        if similarity not in SIMILARITIES:
+            raise ValueError(f"similarity must be one of {SIMILARITIES}")
+        self.k = k
+        self.similarity = similarity
+        self.max_user_items = max_user_items
+        self.min_count = min_count
+        self.block_work = block_work
+        self.keep_counts = keep_counts
+        self.compact_after = compact_after
+        self.book_ids = np.empty(0, dtype=np.int64)
+        self.neighbors = np.empty((0, k), dtype=np.int32)
+        self.scores = np.empty((0, k), dtype=np.float32)
+        self._lock = threading.RLock()
+        self._reset_counts(0)
+
+    def _reset_counts(self, n_items):
+        # book_ids[:_n_sorted] are sorted; books first seen by add_loan() are
+        # appended after them and found through _new_rows
+        self._n_sorted = n_items
+        self._new_rows = {}
+        self._dirty = np.zeros(n_items, dtype=bool)
+        self.readers = np.zeros(n_items, dtype=np.int64)
+        # item -> (co-borrowed item, count), plus changes not folded in yet: {row: {col: delta}}
+        self._pair_table = (np.zeros(n_items + 1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                            np.empty(0, dtype=np.int32))
+        self._delta = {}
+        self._delta_size = 0
+        # reader -> items in chronological order, plus the histories changed since fit()
+        self._user_ids = np.empty(0, dtype=np.int64)
+        self._user_table = (np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32))
+        self._histories = {}
+
+    # -- building -----------------------------------------------------------
+
+    def _pairs(self, user_ids, book_ids):
+        """Distinct (user, item) pairs, most recent last, capped per user."""
+        user_index, users = np.unique(user_ids, return_inverse=True)
+        self.book_ids, items = np.unique(book_ids, return_inverse=True)
+        n_items = len(self.book_ids)
+
+        # Dedupe repeated loans of a book, keeping the position of the last one
+        keys = users.astype(np.int64) * n_items + items
+        unique_keys, first_in_reversed = np.unique(keys[::-1], return_index=True)
+        chronological = np.argsort(len(keys) - 1 - first_in_reversed, kind='stable')
+        users = unique_keys[chronological] // n_items
+        items = unique_keys[chronological] % n_items
+
+        # Per user in chronological order; drop all but the last max_user_items
+        order = np.argsort(users, kind='stable')
+        users, items = users[order], items[order]
+        n_users = int(users[-1]) + 1 if len(users) else 0
+        per_user = np.bincount(users, minlength=n_users)
+        group_end = np.cumsum(per_user)[users]
+        keep = group_end - np.arange(len(users)) <= self.max_user_items
+        return users[keep], items[keep], user_index, n_items
+
+    def tables(self, user_ids, book_ids):
+        """CSR tables of the loans, ``((u_indptr, u_items, i_indptr, i_users), user_index)``.
+
+        Users and items are numbered by their rank in ``user_index`` and in
+        ``self.book_ids``, which this sets. See :meth:`fit` for the arguments.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        if user_ids.shape != book_ids.shape:
+            raise ValueError("user_ids and book_ids must have the same length")
+        users, items, user_index, n_items = self._pairs(user_ids, book_ids)
+        # user -> items and item -> users
+        u_indptr, u_items = csr(users, items, len(user_index))
+        i_indptr, i_users = csr(items, users, n_items)
+        return (u_indptr, u_items, i_indptr, i_users), user_index
+
+    def fit(self, user_ids, book_ids):
+        """Build the neighbour table from parallel arrays of loans.
+
+        :param user_ids: reader of each loan.
+        :param book_ids: book of each loan, same length. Loans are expected in
+            chronological order (e.g. by loan id) for ``max_user_items``.
+        :returns: ``self``
+        """
+        tables, user_index = self.tables(user_ids, book_ids)
+        u_indptr, u_items, i_indptr, _ = tables
+        n_items = len(self.book_ids)
+        self._reset_counts(n_items)
+        self.neighbors = np.full((n_items, self.k), -1, dtype=np.int32)
+        self.scores = np.zeros((n_items, self.k), dtype=np.float32)
+
+        readers = np.diff(i_indptr).astype(np.float32)
+        if self.keep_counts:
+            self._user_ids = user_index
+            self._user_table = (u_indptr, u_items.astype(np.int32))
+            self.readers = np.diff(i_indptr)
+            pair_indptr = np.zeros(n_items + 1, dtype=np.int64)
+            pair_cols, pair_counts = [], []
+        if n_items < 2:
+            return self
+
+        for start, stop, r, c, counts in self._blocks(tables, 0, n_items):
+            if self.keep_counts:
+                pair_indptr[start + 1:stop + 1] = np.bincount(r, minlength=stop - start)
+                pair_cols.append(c.astype(np.int32))
+                pair_counts.append(counts.astype(np.int32))
+            self._keep_top(r, c, counts, start, readers, self.neighbors[start:stop], self.scores[start:stop])
+
+        if self.keep_counts:
+            self._pair_table = (np.cumsum(pair_indptr), np.concatenate(pair_cols), np.concatenate(pair_counts))
+        return self
+
+    def _blocks(self, tables, start, stop):
+        """Co-occurrence counts of items ``[start, stop)``, a block of about
+        ``block_work`` pairs at a time: ``(start, stop, rows, cols, counts)``
+        with ``rows`` relative to the block and the diagonal left out."""
+        u_indptr, u_items, i_indptr, i_users = tables
+        n_items = len(i_indptr) - 1
+        degree = np.diff(u_indptr)
+        work = pair_work(tables)
+        for block_start, block_stop in blocks(work[start:stop], self.block_work):
+            block_start, block_stop = block_start + start, block_stop + start
+            rows = block_stop - block_start
+            block_users = np.asarray(i_users[i_indptr[block_start]:i_indptr[block_stop]])
+            block_rows = np.repeat(np.arange(rows, dtype=np.int64), np.diff(i_indptr[block_start:block_stop + 1]))
+            lengths = degree[block_users]
+
+            # Co-occurrence counts of the block as sorted (row, col) keys;
+            # sorting keeps the cost proportional to the pairs, not to n_items
+            keys, counts = sum_duplicates(
+                np.repeat(block_rows, lengths) * n_items + u_items[ranges(u_indptr[block_users], lengths)]
+            )
+            r, c = np.divmod(keys, n_items)
+            other = c != r + block_start
+            yield block_start, block_stop, r[other], c[other], counts[other]
+
+    def _keep_top(self, r, c, counts, start, readers, neighbors, scores):
+        """Write the top ``k`` of a block's counts into its ``neighbors`` / ``scores`` rows."""
+        keep = counts >= self.min_count
+        r, c, counts = r[keep], c[keep], counts[keep].astype(np.float32)
+        score = self._similarity(counts, readers[r + start], readers[c])
+        r, rank, c, score = top_k_per_row(r, c, score, len(neighbors), self.k)
+        neighbors[r, rank] = c
+        scores[r, rank] = score
+
+    def fit_rows(self, tables, start, stop):
+        """Neighbour lists of items ``[start, stop)`` only, from the CSR
+        ``tables`` (``u_indptr, u_items, i_indptr, i_users``) of all loans.
+
+        Used to fit a shard of the books in another process; the tables may
+        be read-only memory maps. Returns ``(neighbors, scores)`` rows.
+        """
+        readers = np.diff(tables[2]).astype(np.float32)
+        neighbors = np.full((stop - start, self.k), -1, dtype=np.int32)
+        scores = np.zeros((stop - start, self.k), dtype=np.float32)
+        for block_start, block_stop, r, c, counts in self._blocks(tables, start, stop):
+            rows = slice(block_start - start, block_stop - start)
+            self._keep_top(r, c, counts, block_start, readers, neighbors[rows], scores[rows])
+        return neighbors, scores
+
+    def _similarity(self, counts, readers_a, readers_b):
+        """Scores of pairs from their co-borrow counts and reader counts (float32)."""
+        if self.similarity == 'cosine':
+            return counts * (1.0 / np.sqrt(np.maximum(readers_a, 1))) * (1.0 / np.sqrt(np.maximum(readers_b, 1)))
+        return counts / (readers_a + readers_b - counts)
+
+    # -- incremental updates ------------------------------------------------
+
+    def _base_row(self, row):
+        indptr, cols, counts = self._pair_table
+        if row + 1 < len(indptr):
+            return cols[indptr[row]:indptr[row + 1]], counts[indptr[row]:indptr[row + 1]]
+        return cols[:0], counts[:0]
+
+    def _pair_row(self, row):
+        """``(cols, counts)`` of one item from the count table and the pending changes."""
+        cols, counts = self._base_row(row)
+        delta = self._delta.get(row)
+        if delta:
+            # Merge the few changed columns into the sorted row without re-sorting it
+            changed = np.fromiter(delta.keys(), dtype=np.int32, count=len(delta))
+            deltas = np.fromiter(delta.values(), dtype=np.int32, count=len(delta))
+            order = np.argsort(changed)
+            changed, deltas = changed[order], deltas[order]
+            pos = np.searchsorted(cols, changed)
+            hit = pos < len(cols)
+            hit[hit] = cols[pos[hit]] == changed[hit]
+            counts = counts.copy()
+            counts[pos[hit]] += deltas[hit]
+            cols = np.insert(cols, pos[~hit], changed[~hit])
+            counts = np.insert(counts, pos[~hit], deltas[~hit])
+            cols, counts = cols[counts != 0], counts[counts != 0]
+        return cols, counts
+
+    def _partners(self, row):
+        """Items that have (or had, since the last compaction) a count with ``row``."""
+        cols = self._base_row(row)[0]
+        delta = self._delta.get(row)
+        if delta:
+            cols = np.concatenate([cols, np.fromiter(delta.keys(), dtype=np.int32, count=len(delta))])
+        return cols
+
+    def _bump(self, row, others, delta):
+        """Add ``delta`` to the counts of ``row`` with every item of ``others`` (both directions)."""
+        changes = self._delta.setdefault(row, {})
+        for other in others:
+            changes[other] = changes.get(other, 0) + delta
+            back = self._delta.setdefault(other, {})
+            back[row] = back.get(row, 0) + delta
+        self._delta_size += 2 * len(others)
+
+    def _history(self, user_id):
+        history = self._histories.get(user_id)
+        if history is None:
+            pos = int(np.searchsorted(self._user_ids, user_id))
+            history = []
+            if pos < len(self._user_ids) and self._user_ids[pos] == user_id:
+                indptr, items = self._user_table
+                history = items[indptr[pos]:indptr[pos + 1]].tolist()
+            self._histories[user_id] = history
+        return history
+
+    def _add_item(self, book_id):
+        row = len(self.book_ids)
+        self.book_ids = np.append(self.book_ids, book_id)
+        self.neighbors = np.vstack([self.neighbors, np.full((1, self.k), -1, dtype=np.int32)])
+        self.scores = np.vstack([self.scores, np.zeros((1, self.k), dtype=np.float32)])
+        self.readers = np.append(self.readers, 0)
+        self._dirty = np.append(self._dirty, False)
+        self._new_rows[book_id] = row
+        return row
+
+    def add_loan(self, user_id, book_id):
+        """Account for a new loan without a refit (needs ``keep_counts=True``).
+
+        Borrowing a book again only makes it the reader's most recent one.
+        Otherwise its counts with the rest of the reader's history go up
+        (and those of the book falling out of ``max_user_items`` go down).
+        Adding a reader's latest loan again changes nothing, so a loan that a
+        rebuild may already have seen can safely be replayed.
+        """
+        if not self.keep_counts:
+            raise RuntimeError("add_loan() needs a model fitted with keep_counts=True")
+        with self._lock:
+            rows = self._find_rows([book_id])
+            row = int(rows[0]) if len(rows) else self._add_item(book_id)
+            history = self._history(user_id)
+            if row in history:
+                history.remove(row)
+                history.append(row)
+                return
+            changed = [row]
+            self._bump(row, history, 1)
+            history.append(row)
+            if len(history) > self.max_user_items:
+                oldest = history.pop(0)
+                self._bump(oldest, history, -1)
+                changed.append(oldest)
+            self.readers[changed[0]] += 1
+            if len(changed) > 1:
+                self.readers[changed[1]] -= 1
+            # A reader count changed: every score of that book moves, in its
+            # own list and in the lists of all books co-borrowed with it
+            self._dirty[history] = True
+            for item in changed:
+                self._dirty[item] = True
+                self._dirty[self._partners(item)] = True
+            if self._delta_size > self.compact_after:
+                # Most pending changes sit in the rows of popular books; folding
+                # only those in is much cheaper than a full pass, and the rows
+                # left behind hold fewer than 8 changes each
+                self.compact(min_changes=8)
+
+    def _refresh(self, rows):
+        """Recompute the marked lists among ``rows`` from the count table."""
+        with self._lock:
+            for row in rows[self._dirty[rows]].tolist():
+                cols, counts = self._pair_row(row)
+                keep = counts >= self.min_count
+                cols, counts = cols[keep], counts[keep].astype(np.float32)
+                score = self._similarity(
+                    counts, self.readers[row].astype(np.float32), self.readers[cols].astype(np.float32),
+                )
+                top = np.argsort(-score, kind='stable')[:self.k]
+                # Built aside and stored in one step each, never half cleared
+                neighbors = np.full(self.k, -1, dtype=np.int32)
+                scores = np.zeros(self.k, dtype=np.float32)
+                neighbors[:len(top)] = cols[top]
+                scores[:len(top)] = score[top]
+                self.neighbors[row] = neighbors
+                self.scores[row] = scores
+                self._dirty[row] = False
+
+    def compact(self, min_changes=1):
+        """Fold the pending count changes of rows with at least ``min_changes``
+        of them into the count table."""
+        with self._lock:
+            rows = sorted(row for row, delta in self._delta.items() if len(delta) >= min_changes)
+            if not rows:
+                return
+            indptr, cols, counts = self._pair_table
+            n_base = len(indptr) - 1
+            lengths = np.zeros(len(self.book_ids), dtype=np.int64)
+            lengths[:n_base] = np.diff(indptr)
+            new_cols, new_counts, copied = [], [], 0
+            # Unchanged rows are copied as whole slices between the changed ones
+            for row in rows:
+                merged_cols, merged_counts = self._pair_row(row)
+                end = indptr[row] if row < n_base else len(cols)
+                new_cols.append(cols[copied:end])
+                new_counts.append(counts[copied:end])
+                copied = indptr[row + 1] if row < n_base else len(cols)
+                new_cols.append(merged_cols.astype(np.int32))
+                new_counts.append(merged_counts.astype(np.int32))
+                lengths[row] = len(merged_cols)
+            new_cols.append(cols[copied:])
+            new_counts.append(counts[copied:])
+            new_indptr = np.zeros(len(self.book_ids) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=new_indptr[1:])
+            self._pair_table = (new_indptr, np.concatenate(new_cols), np.concatenate(new_counts))
+            for row in rows:
+                del self._delta[row]
+            self._delta_size = sum(len(delta) for delta in self._delta.values())
+
+    # -- serving ------------------------------------------------------------
+
+    def _find_rows(self, book_ids):
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        fitted = self.book_ids[:self._n_sorted]
+        rows = np.searchsorted(fitted, book_ids)
+        rows = np.minimum(rows, max(len(fitted) - 1, 0))
+        found = fitted[rows] == book_ids if len(fitted) else np.zeros(len(book_ids), dtype=bool)
+        if self._new_rows and not found.all():
+            rows = np.array([
+                row if ok else self._new_rows.get(book_id, -1)
+                for row, ok, book_id in zip(rows.tolist(), found.tolist(), book_ids.tolist())
+            ], dtype=np.int64)
+            found = rows >= 0
+        return rows[found]
+
+    def _rows(self, book_ids):
+        """Rows of the known ``book_ids``, with their lists up to date.
+
+        Call with ``_lock`` held: add_loan() may grow every array and
+        _refresh() rewrites rows, so the rows and the lists read from them
+        must come from the same state.
+        """
+        rows = self._find_rows(book_ids)
+        if self._dirty[rows].any():
+            self._refresh(rows)
+        return rows
+
+    def similar(self, book_id, k=10):
+        """``[(book_id, score), ...]`` of the books most similar to ``book_id``."""
+        with self._lock:
+            rows = self._rows([book_id])
+            if not len(rows):
+                return []
+            neighbors = self.neighbors[rows[0], :k]
+            valid = neighbors >= 0
+            return list(zip(
+                self.book_ids[neighbors[valid]].tolist(),
+                self.scores[rows[0], :k][valid].tolist(),
+            ))
+
+    def recommend(self, history, k=10):
+        """Books to suggest after ``history`` (book ids), best first.
+
+        Each history book votes for its neighbours with their similarity;
+        books already in the history are never suggested.
+        """
+        with self._lock:
+            rows = self._rows(history)
+            if not len(rows):
+                return []
+            neighbors = self.neighbors[rows].ravel()
+            scores = self.scores[rows].ravel()
+            book_ids = self.book_ids
+        valid = neighbors >= 0
+        candidates, inverse = np.unique(neighbors[valid], return_inverse=True)
+        totals = np.bincount(inverse, weights=scores[valid], minlength=len(candidates))
+        totals[np.isin(candidates, rows)] = 0
+        top = np.argsort(-totals, kind='stable')[:k]
+        top = top[totals[top] > 0]
+        return list(zip(book_ids[candidates[top]].tolist(), totals[top].tolist()))
@@ -0,0 +1,164 @@
+"""
+Item-item neighbour lists built offline and shared between processes.
+
+``manage.py build_recommendations`` fits the co-occurrence model on a pool
+of worker processes, a shard of books each, and writes the top-k lists to one
+binary file. Web workers open it with ``numpy.memmap`` instead of fitting the
+model themselves, so loading takes milliseconds and every process on the
+host reads the same page-cached copy.
+
+The file (see :mod:`core.recommendations.arrayfile`) holds the sorted book
+ids and the lists in CSR form: ``indptr`` (int64 row offsets), ``neighbors``
+(int32 row numbers, i.e. indexes into ``book_ids``, best first) and
+``scores`` (float16), which is about 6 bytes per kept neighbour.
+
+A new build goes to a new file that ``path`` is then pointed at, so
+processes that still map the old one keep a consistent copy until they
+reload, and the old one is never replaced while mapped (which Windows
+refuses).
+"""
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+
+from .arrayfile import map_arrays, write_arrays
+from .cooccurrence import CooccurrenceModel, pair_work
+from .sparse import blocks, ranges
+
+MAGIC = b'LMSNBRS\0'
+
+
+def write_neighbours(path, book_ids, neighbors, scores, similarity):
+    """Write ``(n_books, k)`` neighbour and score arrays (``-1`` = no neighbour) to ``path``."""
+    n_books, k = neighbors.shape
+    valid = neighbors >= 0
+    indptr = np.zeros(n_books + 1, dtype=np.int64)
+    np.cumsum(valid.sum(axis=1), out=indptr[1:])
+    return write_arrays(
+        path, MAGIC, {
+            'book_ids': np.asarray(book_ids, dtype=np.int64),
+            'indptr': indptr,
+            'neighbors': neighbors[valid].astype(np.int32),
+            'scores': scores[valid].astype(np.float16),
+        }, k=k, similarity=similarity,
+    )
+
+
+class NeighbourFile:
+    """Read-only item-item model backed by a file from :func:`write_neighbours`.
+
+    Serves :meth:`similar` and :meth:`recommend` like :class:`CooccurrenceModel`;
+    it cannot take new loans (``keep_counts`` is False), the next build picks
+    them up.
+    """
+
+    keep_counts = False
+
+    def __init__(self, path):
+        self.path = path
+        # Taken first: a build that moves the pointer meanwhile is loaded once more
+        self._mtime = os.stat(path).st_mtime_ns
+        meta, arrays = map_arrays(path, MAGIC)
+        self.k, self.similarity = meta['k'], meta['similarity']
+        self.book_ids, self.indptr = arrays['book_ids'], arrays['indptr']
+        self.neighbors, self.scores = arrays['neighbors'], arrays['scores']
+
+    def is_replaced(self):
+        """Whether a newer build has been written to ``path`` since this one was opened."""
+        try:
+            return os.stat(self.path).st_mtime_ns != self._mtime
+        except FileNotFoundError:
+            return False
+
+    def _rows(self, book_ids):
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.book_ids, book_ids), max(len(self.book_ids) - 1, 0))
+        if not len(self.book_ids):
+            return rows[:0]
+        return rows[self.book_ids[rows] == book_ids]
+
+    def similar(self, book_id, k=10):
+        """``[(book_id, score), ...]`` of the books most similar to ``book_id``."""
+        rows = self._rows([book_id])
+        if not len(rows):
+            return []
+        start = self.indptr[rows[0]]
+        stop = min(self.indptr[rows[0] + 1], start + k)
+        return list(zip(
+            self.book_ids[self.neighbors[start:stop]].tolist(),
+            self.scores[start:stop].astype(np.float32).tolist(),
+        ))
+
+    def recommend(self, history, k=10):
+        """Books to suggest after ``history`` (book ids), best first; see
+        :meth:`CooccurrenceModel.recommend`."""
+        rows = self._rows(history)
+        if not len(rows):
+            return []
+        entries = ranges(self.indptr[rows], self.indptr[rows + 1] - self.indptr[rows])
+        candidates, inverse = np.unique(self.neighbors[entries], return_inverse=True)
+        totals = np.bincount(inverse, weights=self.scores[entries].astype(np.float32), minlength=len(candidates))
+        totals[np.isin(candidates, rows)] = 0
+        top = np.argsort(-totals, kind='stable')[:k]
+        top = top[totals[top] > 0]
+        return list(zip(self.book_ids[candidates[top]].tolist(), totals[top].tolist()))
+
+
+# -- building ---------------------------------------------------------------
+
+_worker = {}
+
+
+def _start_worker(table_dir, options):
+    # Every worker maps the same table files instead of receiving a copy
+    _worker['tables'] = tuple(
+        np.load(os.path.join(table_dir, f'{name}.npy'), mmap_mode='r')
+        for name in ('u_indptr', 'u_items', 'i_indptr', 'i_users')
+    )
+    _worker['model'] = CooccurrenceModel(**options)
+
+
+def _fit_shard(shard):
+    start, stop = shard
+    return start, *_worker['model'].fit_rows(_worker['tables'], start, stop)
+
+
+def build_neighbour_file(path, user_ids, book_ids, workers=None, shards_per_worker=4, progress=None, **options):
+    """Fit the item-item model over ``workers`` processes and write it to ``path``.
+
+    The books are cut into shards of about equal pair-counting work, several
+    per worker so that a slow shard does not hold up the others; each worker
+    computes the top-k lists of whole shards.
+
+    :param options: :class:`CooccurrenceModel` arguments (``k``, ``similarity``,
+        ``max_user_items``, ``min_count``, ``block_work``).
+    :param progress: called with ``(books_done, n_books)`` as shards finish.
+    :returns: ``(n_books, bytes written)``
+    """
+    workers = workers or os.cpu_count() or 1
+    model = CooccurrenceModel(**options)
+    tables, _ = model.tables(user_ids, book_ids)
+    n_books = len(model.book_ids)
+    neighbors = np.full((n_books, model.k), -1, dtype=np.int32)
+    scores = np.zeros((n_books, model.k), dtype=np.float32)
+    work = pair_work(tables)
+    budget = max(int(work.sum()) // (workers * shards_per_worker), 1)
+    shards = list(blocks(work, budget)) if n_books > 1 else []
+
+    with tempfile.TemporaryDirectory(prefix='lms-recommendations-') as table_dir:
+        for name, array in zip(('u_indptr', 'u_items', 'i_indptr', 'i_users'), tables):
+            np.save(os.path.join(table_dir, f'{name}.npy'), array)
+        del tables
+        # Largest shards first, so the last ones to finish are short
+        shards.sort(key=lambda shard: -work[shard[0]:shard[1]].sum())
+        done = 0
+        with multiprocessing.Pool(workers, _start_worker, (table_dir, options)) as pool:
+            for start, shard_neighbors, shard_scores in pool.imap_unordered(_fit_shard, shards):
+                neighbors[start:start + len(shard_neighbors)] = shard_neighbors
+                scores[start:start + len(shard_scores)] = shard_scores
+                done += len(shard_neighbors)
+                if progress:
+                    progress(done, n_books)
+    return n_books, write_neighbours(path, model.book_ids, neighbors, scores, model.similarity)
@@ -0,0 +1,113 @@
+"""
+"What to read next" from the order in which readers borrow books.
+
+Co-occurrence ignores order, but readers of a series borrow it in sequence.
+Each reader's loans, in borrow order, give one transition
+``book -> next book`` per consecutive pair (borrowing the same book again is
+not a transition). A book's next books are the ones that most often followed
+it, scored by ``P(next | book)``, the share of the book's outgoing
+transitions that went there. The model is a sparse first-order transition
+matrix: for each book, its top ``k`` next books as CSR arrays.
+
+:meth:`TransitionModel.fit` consumes ``(user_id, book_id)`` rows ordered by
+reader and borrow date a chunk at a time (e.g. a queryset ``.iterator()``),
+so neither the loans nor their transitions are ever all in memory. Each
+chunk's transitions are merged into a sorted table of distinct
+``(book, next book)`` counts. When that table grows past ``max_pairs`` its
+rarest pairs are dropped; the counts of pairs seen again afterwards are then
+lower bounds. Pairs seen fewer than ``min_count`` times are pruned at the
+end. Outgoing totals are counted exactly.
+"""
+import itertools
+
+import numpy as np
+
+from .sparse import csr, sum_duplicates, top_k_per_row
+
+# Book ids are packed two to an int64 key
+_SHIFT = 32
+_LOW = (1 << _SHIFT) - 1
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield np.array(chunk, dtype=np.int64).reshape(-1, 2)
+
+
+def _add_counts(keys, counts, new_keys, new_counts):
+    """Add sorted unique ``new_keys`` to the sorted ``keys`` table; O(n + m)."""
+    positions = np.searchsorted(keys, new_keys)
+    found = positions < len(keys)
+    found[found] = keys[positions[found]] == new_keys[found]
+    counts[positions[found]] += new_counts[found]
+    missing = ~found
+    return (np.insert(keys, positions[missing], new_keys[missing]),
+            np.insert(counts, positions[missing], new_counts[missing]))
+
+
+class TransitionModel:
+    """Top-k next books of every book from consecutive borrows.
+
+    :param k: next books kept per book.
+    :param min_count: transitions seen fewer times are dropped.
+    :param max_pairs: distinct transitions counted at once, bounds memory
+        while fitting (12 bytes each).
+    :param chunk_size: loan rows read per step.
+    """
+
+    def __init__(self, k=20, min_count=2, max_pairs=5_000_000, chunk_size=100_000):
+        self.k = k
+        self.min_count = min_count
+        self.max_pairs = max_pairs
+        self.chunk_size = chunk_size
+        self.book_ids = np.empty(0, dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.next_ids = np.empty(0, dtype=np.int64)
+        self.scores = np.empty(0, dtype=np.float32)
+
+    def fit(self, rows):
+        """Count the transitions of ``rows``, ``(user_id, book_id)`` ordered by user then borrow date.
+
+        :returns: ``self``
+        """
+        keys, counts = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        sources, totals = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        last = None
+        for chunk in _chunks(rows, self.chunk_size):
+            if last is not None:
+                chunk = np.vstack([last, chunk])
+            last = chunk[-1:]
+            users, books = chunk[:, 0], chunk[:, 1]
+            if len(books) and books.max() > _LOW >> 1:
+                raise ValueError("book ids must fit in 31 bits")
+            step = (users[1:] == users[:-1]) & (books[1:] != books[:-1])
+            before, after = books[:-1][step], books[1:][step]
+
+            keys, counts = _add_counts(keys, counts, *sum_duplicates((before << _SHIFT) | after))
+            sources, totals = _add_counts(sources, totals, *sum_duplicates(before))
+            if len(keys) > self.max_pairs:
+                keep = np.sort(np.argpartition(-counts, self.max_pairs - 1)[:self.max_pairs])
+                keys, counts = keys[keep], counts[keep]
+
+        keep = counts >= self.min_count
+        keys, counts = keys[keep], counts[keep]
+        before, after = keys >> _SHIFT, keys & _LOW
+        self.book_ids = np.unique(before)
+        rows = np.searchsorted(self.book_ids, before)
+        probability = counts / totals[np.searchsorted(sources, before)]
+        rows, _, after, probability = top_k_per_row(rows, after, probability, len(self.book_ids), self.k)
+        self.indptr, self.next_ids, self.scores = csr(rows, after, len(self.book_ids), probability.astype(np.float32))
+        return self
+
+    def following(self, book_id, k=10):
+        """``[(book_id, probability), ...]`` of the books most often borrowed right after ``book_id``."""
+        row = np.searchsorted(self.book_ids, book_id)
+        if row >= len(self.book_ids) or self.book_ids[row] != book_id:
+            return []
+        start = self.indptr[row]
+        stop = min(self.indptr[row + 1], start + k)
+        return list(zip(self.next_ids[start:stop].tolist(), self.scores[start:stop].tolist()))
@@ -0,0 +1,73 @@
+"""
+Small NumPy helpers for CSR-style sparse arrays shared by the models.
+"""
+import numpy as np
+
+
+def ranges(starts, lengths):
+    """Concatenation of ``arange(s, s + n)`` for every (s, n), without a Python loop."""
+    ends = np.cumsum(lengths)
+    if not len(ends) or ends[-1] == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - (ends - lengths), lengths)
+    return np.arange(ends[-1], dtype=np.int64) + offsets
+
+
+def csr(rows, cols, n_rows, data=None):
+    """CSR ``(indptr, indices[, data])`` of the pairs; column order within a row is preserved."""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    if data is None:
+        return indptr, cols[order]
+    return indptr, cols[order], data[order]
+
+
+def blocks(work, budget):
+    """Split ``range(len(work))`` into consecutive (start, stop) blocks of about ``budget`` work."""
+    start, acc = 0, 0
+    for row, cost in enumerate(work.tolist()):
+        if row > start and acc + cost > budget:
+            yield start, row
+            start, acc = row, 0
+        acc += cost
+    if start < len(work):
+        yield start, len(work)
+
+
+def coo_dot(rows, cols, values, dense, n_rows):
+    """``X @ dense`` for the sparse ``X`` given by its ``(rows, cols, values)`` entries."""
+    columns = np.ascontiguousarray(dense.T)
+    return np.stack([
+        np.bincount(rows, weights=values * column[cols], minlength=n_rows) for column in columns
+    ], axis=1)
+
+
+def sum_duplicates(keys, weights=None):
+    """Sorted unique ``keys`` and the number (or summed ``weights``) of each."""
+    if weights is None:
+        keys = np.sort(keys)
+    else:
+        order = np.argsort(keys)
+        keys, weights = keys[order], weights[order]
+    first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+    if weights is None:
+        totals = np.diff(np.r_[first, len(keys)])
+    else:
+        totals = np.add.reduceat(weights, first) if len(first) else weights[:0]
+    return keys[first], totals
+
+
+def top_k_per_row(rows, cols, scores, n_rows, k):
+    """Keep the ``k`` best (col, score) of every row.
+
+    ``scores`` must be in (0, 1] (cosine-like): ``row - score / 2`` is then a
+    single sort key ordering by row and descending score, much cheaper than
+    ``np.lexsort``. Returns ``(rows, ranks, cols, scores)`` of the kept entries,
+    ``ranks`` being the 0-based position within the row.
+    """
+    order = np.argsort(rows - 0.5 * scores)
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, np.arange(n_rows))[rows]
+    keep = rank < k
+    return rows[keep], rank[keep], cols[keep], scores[keep]
@@ -0,0 +1,324 @@
+"""
+Feeds the recommendation models from the database and keeps them in memory.
+
+Models are built on first use and served from process memory afterwards.
+Once older than ``settings.RECOMMENDATIONS_MAX_AGE`` seconds they are rebuilt
+on a background thread while requests keep using the previous version.
+Between rebuilds, new loans and catalog edits are applied to the live models
+(:meth:`ModelSlot.apply`).
+
+The next-book model (:mod:`core.recommendations.sequence`) is only rebuilt,
+streaming the loans; new loans reach it at the next rebuild.
+
+When ``manage.py build_recommendations`` has written the item-item lists to
+``settings.RECOMMENDATIONS_MODEL_FILE``, that file is mapped instead of fitting
+the model in each process, and mapped again as soon as a new build replaces it.
+The ALS factors it writes to ``settings.RECOMMENDATIONS_ALS_FILE`` and the
+content index it writes to ``settings.RECOMMENDATIONS_CONTENT_INDEX_FILE`` are
+served the same way.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import Book, Loan, PreferredCategory
+from ..popularity import category_trending, decayed, popular_books, trend_field, trending_books
+from .als import ALSModel, loan_weight
+from .content import ContentModel
+from .content_index import ContentIndex
+from .cooccurrence import CooccurrenceModel
+from .neighbour_file import NeighbourFile
+from .sequence import TransitionModel
+
+logger = logging.getLogger(__name__)
+
+FETCH_SIZE = 100_000
+
+# Candidates kept per user, so that k can still be filled from the available ones
+USER_CANDIDATES = 100
+
+
+def loan_arrays():
+    """``(user_ids, book_ids)`` of every loan, in loan id (= borrow) order."""
+    chunks = []
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT user_id, book_id FROM {Loan._meta.db_table} ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+    loans = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
+    return loans[:, 0], loans[:, 1]
+
+
+def _with_days_kept(loans):
+    kept = ExpressionWrapper(
+        Coalesce('return_date', Value(timezone.now(), output_field=DateTimeField())) - F('borrow_date'),
+        output_field=DurationField(),
+    )
+    return loans.annotate(kept=kept)
+
+
+def weighted_loan_arrays(order_by=('id',)):
+    """``(user_ids, book_ids, weights)`` of every loan, weighted by how long it was kept (:func:`loan_weight`)."""
+    loans = _with_days_kept(Loan.objects.order_by(*order_by)).values_list('user_id', 'book_id', 'kept')
+    user_ids, book_ids, days = [], [], []
+    for user_id, book_id, duration in loans.iterator(chunk_size=FETCH_SIZE):
+        user_ids.append(user_id)
+        book_ids.append(book_id)
+        days.append(duration.total_seconds() / 86400)
+    return np.array(user_ids, dtype=np.int64), np.array(book_ids, dtype=np.int64), loan_weight(days)
+
+
+def user_loan_weights(user_id):
+    """``(book_ids, weights)`` of one user's loans, weighted as :func:`weighted_loan_arrays` weights them."""
+    loans = list(_with_days_kept(Loan.objects.filter(user_id=user_id).order_by('id')).values_list('book_id', 'kept'))
+    book_ids = [book_id for book_id, _ in loans]
+    days = [kept.total_seconds() / 86400 for _, kept in loans]
+    return book_ids, loan_weight(days)
+
+
+class ModelSlot:
+    """Holds one model instance; thread-safe lazy build and background refresh."""
+
+    def __init__(self, name, builder):
+        self.name = name
+        self.builder = builder
+        self._model = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._pending = []
+
+    def _build(self):
+        start = time.perf_counter()
+        model = self.builder()
+        logger.info("built %s model in %.1fs", self.name, time.perf_counter() - start)
+        return model
+
+    def set(self, model):
+        self._model = model
+        self._built_at = time.monotonic()
+
+    def _refresh(self):
+        try:
+            model = self._build()
+            with self._lock:
+                # Changes made while it was built may be missing from the rows
+                # it read; they are idempotent, so replay them all
+                for change in self._pending:
+                    change(model)
+                self.set(model)
+        except Exception:
+            logger.exception("rebuilding the %s model failed, keeping the previous one", self.name)
+        finally:
+            self._refreshing = False
+            self._pending = []
+            connection.close()
+
+    def get(self):
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    self.set(self._build())
+                return self._model
+        expired = time.monotonic() - self._built_at > settings.RECOMMENDATIONS_MAX_AGE
+        if (expired or self._replaced(model)) and not self._refreshing:
+            with self._lock:
+                if not self._refreshing:
+                    self._refreshing = True
+                    self._pending = []
+                    threading.Thread(target=self._refresh, name=f'refresh-{self.name}', daemon=True).start()
+        return model
+
+    @staticmethod
+    def _replaced(model):
+        return isinstance(model, (NeighbourFile, ALSModel, ContentIndex)) and model.is_replaced()
+
+    def clear(self):
+        with self._lock:
+            self._model = None
+
+    def apply(self, change):
+        """Run ``change(model)`` on the current model, if one has been built,
+        and on the one being rebuilt."""
+        with self._lock:
+            if self._model is not None:
+                change(self._model)
+            if self._refreshing:
+                self._pending.append(change)
+
+
+def build_item_model():
+    path = settings.RECOMMENDATIONS_MODEL_FILE
+    if path and os.path.exists(path):
+        return NeighbourFile(path)
+    user_ids, book_ids = loan_arrays()
+    return CooccurrenceModel(
+        k=settings.RECOMMENDATIONS_NEIGHBOURS, keep_counts=settings.RECOMMENDATIONS_INCREMENTAL,
+    ).fit(user_ids, book_ids)
+
+
+item_model = ModelSlot('item-item', build_item_model)
+
+
+def similar_books(book_id, k=10):
+    """``[(book_id, score), ...]`` most often borrowed by readers of ``book_id``."""
+    return item_model.get().similar(book_id, k)
+
+
+def record_loans(loans):
+    """Feed new loans to the item-item model (if built and incremental)."""
+    pairs = [(loan.user_id, loan.book_id) for loan in loans]
+
+    def add(model):
+        if model.keep_counts:
+            for user_id, book_id in pairs:
+                model.add_loan(user_id, book_id)
+
+    if pairs:
+        item_model.apply(add)
+
+
+def book_texts():
+    """``(id, title, author, category, description)`` of every book, streamed."""
+    return Book.objects.values_list('id', 'title', 'author', 'category', 'description').iterator(chunk_size=FETCH_SIZE)
+
+
+def build_content_model():
+    path = settings.RECOMMENDATIONS_CONTENT_INDEX_FILE
+    if path and os.path.exists(path):
+        return ContentIndex(path)
+    return ContentModel(k=settings.RECOMMENDATIONS_NEIGHBOURS).fit(book_texts())
+
+
+content_model = ModelSlot('content', build_content_model)
+
+
+def similar_by_content(book_id, k=10):
+    """``[(book_id, score), ...]`` whose title, author, category and description are closest to ``book_id``'s."""
+    return content_model.get().similar(book_id, k)
+
+
+def update_book_content(book):
+    """Re-index an added or edited book in the content model (if built)."""
+    content_model.apply(lambda model: model.update(book.id, book.title, book.author, book.category, book.description))
+
+
+def remove_book_content(book_id):
+    content_model.apply(lambda model: model.remove(book_id))
+
+
+def build_als_model():
+    path = settings.RECOMMENDATIONS_ALS_FILE
+    if path and os.path.exists(path):
+        return ALSModel.load(path)
+    user_ids, book_ids, weights = weighted_loan_arrays()
+    return ALSModel().fit(user_ids, book_ids, weights)
+
+
+als_model = ModelSlot('als', build_als_model)
+
+
+def build_sequence_model():
+    # Streamed in (reader, borrow date) order along loan_user_borrow_idx
+    loans = Loan.objects.order_by('user_id', 'borrow_date', 'id').values_list('user_id', 'book_id')
+    return TransitionModel(chunk_size=FETCH_SIZE).fit(loans.iterator(chunk_size=FETCH_SIZE))
+
+
+sequence_model = ModelSlot('sequence', build_sequence_model)
+
+
+def next_books(book_id, k=10):
+    """``[(book_id, probability), ...]`` most often borrowed right after ``book_id`` by the same reader."""
+    return sequence_model.get().following(book_id, k)
+
+
+def _user_key(user_id):
+    return f'recommendations:user:{user_id}'
+
+
+def cold_start_candidates(user_id, exclude=(), n=USER_CANDIDATES):
+    """``[(book_id, score), ...]`` for a user the models know nothing about.
+
+    The month's most borrowed books of the categories they picked at
+    registration come first, blended by rank; then the month's most borrowed
+    books overall and the all-time popular ones. Each list is read in order
+    from an index (see :mod:`core.popularity`), at most ``n`` rows of it.
+    """
+    now = timezone.now()
+    categories = list(
+        PreferredCategory.objects.filter(user_id=user_id).order_by('id').values_list('category', flat=True)
+    )
+    seen = set(exclude)
+    candidates = []
+    if categories:
+        blended = category_trending(categories, -(-n // len(categories)), now)
+        candidates = [(book_id, score) for book_id, score in blended if book_id not in seen][:n]
+    field = trend_field('month')
+    for shelf in (trending_books('month', now), popular_books()):
+        if len(candidates) >= n:
+            break
+        seen.update(book_id for book_id, _ in candidates)
+        candidates += [
+            (book_id, decayed(stored, 'month', now))
+            for book_id, stored in shelf.values_list('id', field)[:n] if book_id not in seen
+        ][:n - len(candidates)]
+    return candidates
+
+
+def user_candidates(user_id):
+    """``[(book_id, score), ...]`` to suggest to a user, best first, cached.
+
+    Books borrowed by readers of the user's books come first, then books with
+    similar text. With ``settings.RECOMMENDATIONS_ALS_MIN_HISTORY`` set, users
+    with at least that many books get the ALS model's picks ahead of both.
+    Books the user ever borrowed are left out. Users without loans, or whose
+    loans none of these models can use, get :func:`cold_start_candidates`.
+    """
+    key = _user_key(user_id)
+    candidates = cache.get(key)
+    if candidates is None:
+        history = list(dict.fromkeys(
+            Loan.objects.filter(user_id=user_id).order_by('id').values_list('book_id', flat=True)
+        ))
+        candidates, sources = [], []
+        if history:
+            sources = [item_model, content_model]
+            min_history = settings.RECOMMENDATIONS_ALS_MIN_HISTORY
+            if min_history and len(history) >= min_history:
+                sources.insert(0, als_model)
+        for slot in sources:
+            if len(candidates) >= USER_CANDIDATES:
+                break
+            seen = set(history).union(book_id for book_id, _ in candidates)
+            if slot is als_model:
+                # folded in with the confidence weights the factors were fitted with
+                book_ids, weights = user_loan_weights(user_id)
+                picks = slot.get().recommend(book_ids, USER_CANDIDATES, weights)
+            else:
+                picks = slot.get().recommend(history, USER_CANDIDATES)
+            candidates += [
+                (book_id, score) for book_id, score in picks if book_id not in seen
+            ][:USER_CANDIDATES - len(candidates)]
+        if not candidates:
+            # No loans yet, or none of them known to the models
+            candidates = cold_start_candidates(user_id, exclude=history)
+        cache.set(key, candidates, settings.RECOMMENDATIONS_CACHE_TTL)
+    return candidates
+
+
+def forget_user_candidates(user_ids):
+    """Drop cached candidates after loans of these users changed."""
+    cache.delete_many([_user_key(user_id) for user_id in set(user_ids)])
@@ -0,0 +1,36 @@
+"""
+Columnar JSON: list responses with the field names sent once.
+
+A loan list repeats every key (``book_title``, ``book_author``, ...) on
+every row. With ``Accept: application/vnd.lms.columnar+json`` or
+``?format=columnar``, a list of objects that all have the same keys is
+sent as ``{"columns": [...], "rows": [[...], ...]}`` instead, both as the
+whole response and as the ``results`` of a page
+(``{"next": ..., "previous": ..., "results": {"columns": ..., "rows": ...}}``).
+Anything else (a single object, a list of strings, an error) is the same
+as plain JSON. The values are unchanged, so a client turns each row back
+into an object with ``dict(zip(columns, row))``.
+"""
+from rest_framework.renderers import JSONRenderer
+
+
+def to_columns(data):
+    """``data`` in the columnar layout if it is a list of objects with the same keys, else ``data``."""
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return data
+    columns = list(data[0]) if data else []
+    if any(len(row) != len(columns) or any(column not in row for column in columns) for row in data):
+        return data
+    return {'columns': columns, 'rows': [[row[column] for column in columns] for row in data]}
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.lms.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'results' in data:
+            data = dict(data, results=to_columns(data['results']))
+        else:
+            data = to_columns(data)
+        return super().render(data, accepted_media_type, renderer_context)
@@ -5,4 +5,5 @@ from .models import Book
 class BookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
-        fields = ['id', 'title', 'author', 'isbn', 'category', 'quantity', 'available', 'description', 'cover_url']
+        fields = ['id', 'title', 'author', 'isbn', 'category', 'quantity', 'available', 'description', 'cover_url',
+                  'borrow_count']
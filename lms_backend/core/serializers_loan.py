@@ -1,11 +1,117 @@
 from rest_framework import serializers
 from .models import Loan, Book
+from django.contrib.auth import get_user_model
+from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
 
 
+User = get_user_model()
+
+# Default loan period when no due date is given
+LOAN_PERIOD = timedelta(days=14)
+
+
+def resolve_book(identifier):
+    """Find a book by id or ISBN (both indexed); returns None if there is none.
+
+    A blank identifier matches nothing, not a book without an ISBN.
+    """
+    identifier = str(identifier).strip()
+    if not identifier:
+        return None
+    if identifier.isdigit():
+        book = Book.objects.filter(pk=int(identifier)).first()
+        if book is not None:
+            return book
+    # ISBNs may be all digits too, so fall through when no id matched
+    return Book.objects.filter(isbn=identifier).order_by('id').first()
+
+
+def resolve_user(identifier):
+    """Find a user by id, username or email (all indexed); returns None if there is none.
+
+    All digits is an id first, so a username like "1042" is only found when
+    no user has that id. A blank identifier matches nobody.
+    """
+    identifier = str(identifier).strip()
+    if not identifier:
+        return None
+    if identifier.isdigit():
+        user = User.objects.filter(pk=int(identifier)).first()
+        if user is not None:
+            return user
+    user = User.objects.filter(username=identifier).first()
+    if user is None:
+        user = User.objects.filter(email=identifier).order_by('id').first()
+    return user
+
+
+def resolve_books(identifiers):
+    """Batch version of :func:`resolve_book`: one query, returns {identifier: Book}."""
+    keys = {str(i).strip() for i in identifiers} - {''}
+    ids = {int(k) for k in keys if k.isdigit()}
+    found = Book.objects.filter(Q(pk__in=ids) | Q(isbn__in=keys)).order_by('-id')
+    by_id = {book.pk: book for book in found}
+    # lowest id wins for duplicated ISBNs, as in resolve_book
+    by_isbn = {book.isbn: book for book in found}
+    resolved = {}
+    for key in keys:
+        book = by_id.get(int(key)) if key.isdigit() else None
+        if book is None:
+            book = by_isbn.get(key)
+        if book is not None:
+            resolved[key] = book
+    return resolved
+
+
+def resolve_users(identifiers):
+    """Batch version of :func:`resolve_user`: one query, returns {identifier: User}."""
+    keys = {str(i).strip() for i in identifiers} - {''}
+    ids = {int(k) for k in keys if k.isdigit()}
+    found = User.objects.filter(Q(pk__in=ids) | Q(username__in=keys) | Q(email__in=keys)).order_by('-id')
+    by_id = {user.pk: user for user in found}
+    by_username = {user.username: user for user in found}
+    by_email = {user.email: user for user in found}
+    resolved = {}
+    for key in keys:
+        user = by_id.get(int(key)) if key.isdigit() else None
+        if user is None:
+            user = by_username.get(key) or by_email.get(key)
+        if user is not None:
+            resolved[key] = user
+    return resolved
+
+
+class BookIdentifierField(serializers.PrimaryKeyRelatedField):
+    """A book given as its id or its ISBN; always rendered as the id."""
+
+    default_error_messages = {'does_not_exist': 'No book with id or ISBN "{pk_value}".'}
+
+    def to_internal_value(self, data):
+        book = resolve_book(data)
+        if book is None:
+            self.fail('does_not_exist', pk_value=data)
+        return book
+
+
+class UserIdentifierField(serializers.PrimaryKeyRelatedField):
+    """A user given as id, username or email; always rendered as the id."""
+
+    default_error_messages = {'does_not_exist': 'No user with id, username or email "{pk_value}".'}
+
+    def to_internal_value(self, data):
+        user = resolve_user(data)
+        if user is None:
+            self.fail('does_not_exist', pk_value=data)
+        return user
+
+
 class LoanSerializer(serializers.ModelSerializer):
-    user = serializers.ReadOnlyField(source='user.id')
+    # Staff may check out for another user; ignored for everyone else, and
+    # on updates (a loan stays with the reader it was made for)
+    user = UserIdentifierField(queryset=User.objects.all(), required=False)
+    book = BookIdentifierField(queryset=Book.objects.all())
     book_title = serializers.ReadOnlyField(source='book.title')
     book_author = serializers.ReadOnlyField(source='book.author')
     book_category = serializers.ReadOnlyField(source='book.category')
@@ -29,5 +135,9 @@ class LoanSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Set default due_date if not provided
         if 'due_date' not in validated_data or validated_data['due_date'] is None:
-            validated_data['due_date'] = timezone.now() + timedelta(days=14)
+            validated_data['due_date'] = timezone.now() + LOAN_PERIOD
         return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        validated_data.pop('user', None)
+        return super().update(instance, validated_data)
@@ -1,30 +1,57 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 
+from .models import PreferredCategory
+
 
 User = get_user_model()
 
+# Book categories a user can pick for their first recommendations
+MAX_PREFERRED_CATEGORIES = 10
+
+
+def set_preferred_categories(user, categories):
+    PreferredCategory.objects.filter(user=user).delete()
+    PreferredCategory.objects.bulk_create([PreferredCategory(user=user, category=category) for category in categories])
+
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
+    # Recommended from until the user has borrowed something (see core.recommendations.store)
+    preferred_categories = serializers.ListField(
+        child=serializers.CharField(max_length=100), write_only=True, required=False,
+        max_length=MAX_PREFERRED_CATEGORIES,
+    )
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'is_staff', 'password']
+        fields = ['id', 'username', 'email', 'is_staff', 'password', 'preferred_categories']
+
+    def validate_preferred_categories(self, value):
+        return list(dict.fromkeys(value))
 
+    @transaction.atomic
     def create(self, validated_data):
         password = validated_data.pop('password', None)
+        categories = validated_data.pop('preferred_categories', None)
         user = User.objects.create_user(**validated_data)
         if password:
             user.set_password(password)
             user.save()
+        if categories:
+            set_preferred_categories(user, categories)
         return user
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
+        categories = validated_data.pop('preferred_categories', None)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         if password:
             instance.set_password(password)
         instance.save()
+        if categories is not None:
+            set_preferred_categories(instance, categories)
         return instance
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.models import Book, Loan
+from core.recommendations import ALSModel, weighted_loan_arrays
+from core.recommendations.als import _solve_batch, loan_weight
+from core.recommendations.store import user_loan_weights
+
+
+class ALSFoldInTests(SimpleTestCase):
+    """Folding a training reader in from their history gives back their trained factors."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        n_loans = 4000
+        cls.users = rng.integers(0, 150, n_loans)
+        cls.books = (300 * rng.random(n_loans) ** 2).astype(np.int64) + 1
+        cls.weights = loan_weight(rng.uniform(0, 20, n_loans))
+        cls.model = ALSModel(factors=8, iterations=8).fit(cls.users, cls.books, cls.weights)
+        # every reader's factors solved against the fitted book factors, as the
+        # reader half of one more training iteration computes them
+        user_table, _ = ALSModel(factors=8).tables(cls.users, cls.books, cls.weights)
+        cls.trained = _solve_batch(user_table, cls.model.item_factors, cls.model.gram, cls.model.regularization,
+                                   np.arange(len(user_table[0]) - 1))
+
+    def fold_in(self, user, weighted=True):
+        mine = self.users == user
+        weights = self.weights[mine] if weighted else None
+        return self.model.user_vector(self.books[mine], weights)[0]
+
+    def test_weighted_fold_in_reproduces_trained_factors(self):
+        for user in range(0, 150, 15):
+            with self.subTest(user=user):
+                np.testing.assert_allclose(self.fold_in(user), self.trained[user], rtol=1e-3, atol=1e-4)
+
+    def test_unweighted_fold_in_does_not(self):
+        # the reason recommend() takes the weights: without them a reader
+        # lands somewhere else in factor space
+        errors = [np.abs(self.fold_in(user, weighted=False) - self.trained[user]).max() for user in range(0, 150, 15)]
+        self.assertGreater(min(errors), 1e-2)
+
+    def test_recommend_passes_the_weights(self):
+        mine = self.users == 7
+        vector = self.fold_in(7)
+        scores = self.model.item_factors @ vector
+        picks = self.model.recommend(self.books[mine], 5, self.weights[mine])
+        self.assertEqual([score for _, score in picks], sorted(scores[~np.isin(self.model.book_ids, self.books[mine])],
+                                                               reverse=True)[:5])
+
+
+class UserLoanWeightsTests(TestCase):
+    """The store folds a reader in with the weights the ALS model is fitted with."""
+
+    def test_matches_the_training_weights(self):
+        reader, other = (get_user_model().objects.create_user(name, f'{name}@example.com', 'x')
+                         for name in ('alice', 'bob'))
+        books = [Book.objects.create(title=f'Book {i}') for i in range(3)]
+        now = timezone.now()
+        # (book, days ago borrowed, returned halfway since then)
+        history = ((books[0], 2, True), (books[1], 20, True), (books[2], 5, False), (books[0], 9, False))
+        for book, days, returned in history:
+            loan = Loan.objects.create(user=reader, book=book)
+            Loan.objects.filter(pk=loan.pk).update(
+                borrow_date=now - timedelta(days=days), status='returned' if returned else 'borrowed',
+                return_date=now - timedelta(days=days / 2) if returned else None,
+            )
+        Loan.objects.create(user=other, book=books[1])
+
+        user_ids, book_ids, weights = weighted_loan_arrays()
+        mine = user_ids == reader.pk
+        got_books, got_weights = user_loan_weights(reader.pk)
+        self.assertEqual(got_books, book_ids[mine].tolist())
+        np.testing.assert_allclose(got_weights, weights[mine], rtol=1e-4)
+        self.assertGreater(got_weights.max(), got_weights.min())
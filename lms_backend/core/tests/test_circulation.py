@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Book, Loan
+
+
+class BulkCirculationTests(TestCase):
+    """POST /api/loans/bulk/ and /api/loans/bulk-return/ (core.circulation)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user('desk', 'desk@example.com', 'x', is_staff=True)
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'x')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'x')
+        cls.dune = Book.objects.create(title='Dune', isbn='978-0441172719', quantity=3, available=3)
+        cls.emma = Book.objects.create(title='Emma', isbn='978-0141439587', quantity=1, available=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def assertAvailabilityMatchesLoans(self):
+        for book in Book.objects.all():
+            borrowed = Loan.objects.filter(book=book, status='borrowed').count()
+            self.assertEqual(book.available, book.quantity - borrowed, book.title)
+            self.assertGreaterEqual(book.available, 0, book.title)
+
+    def checkout(self, items):
+        response = self.client.post('/api/loans/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertAvailabilityMatchesLoans()
+        return response.data
+
+    def give_back(self, loan_ids):
+        response = self.client.post('/api/loans/bulk-return/', {'loans': loan_ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertAvailabilityMatchesLoans()
+        return response.data
+
+    def test_mixed_valid_and_invalid_items(self):
+        data = self.checkout([
+            {'book': self.dune.pk, 'user': 'alice'},
+            {'book': 'no-such-isbn', 'user': 'alice'},
+            {'book': self.emma.isbn, 'user': 'nobody@example.com'},
+            {'book': ' ', 'user': 'bob'},
+            {'book': self.emma.isbn, 'user': self.bob.pk},
+        ])
+        self.assertEqual((data['succeeded'], data['failed']), (2, 3))
+        self.assertEqual([result['ok'] for result in data['results']], [True, False, False, False, True])
+        self.assertEqual(data['results'][3]['error'], 'book is required')
+        self.assertEqual(data['results'][4]['loan']['user'], self.bob.pk)
+        self.assertEqual(Loan.objects.filter(status='borrowed').count(), 2)
+
+    def test_same_book_beyond_its_stock(self):
+        # three copies of Dune: the first three requests get one, in order
+        data = self.checkout([{'book': self.dune.pk, 'user': user} for user in ('alice', 'bob') * 2])
+        self.assertEqual([result['ok'] for result in data['results']], [True, True, True, False])
+        self.assertEqual(data['results'][3]['error'], 'Book is not available')
+        # none left: the whole request for it fails, the rest of the batch goes through
+        data = self.checkout([{'book': self.dune.pk, 'user': 'alice'}, {'book': self.emma.pk, 'user': 'alice'}])
+        self.assertEqual([result['ok'] for result in data['results']], [False, True])
+
+    def test_shortage_hands_out_the_remaining_copies(self):
+        Book.objects.filter(pk=self.dune.pk).update(available=2)
+        Loan.objects.create(user=self.alice, book=self.dune)
+        data = self.checkout([{'book': self.dune.pk, 'user': 'bob'}] * 3)
+        self.assertEqual(data['succeeded'], 2)
+
+    def test_return_already_returned_loan(self):
+        loans = [result['loan']['id'] for result in self.checkout(
+            [{'book': self.dune.pk, 'user': 'alice'}, {'book': self.emma.pk, 'user': 'bob'}]
+        )['results']]
+        data = self.give_back([loans[0], loans[0], 9999])
+        self.assertEqual([result['ok'] for result in data['results']], [True, False, False])
+        self.assertEqual(data['results'][1]['error'], 'Loan already returned')
+        data = self.give_back(loans)
+        self.assertEqual([result['ok'] for result in data['results']], [False, True])
+        self.assertEqual(Book.objects.get(pk=self.dune.pk).available, 3)
+
+    def test_return_racing_another_return(self):
+        # a loan returned by someone else after the batch read it: the
+        # statement that flips it no longer matches, so the batch falls back
+        # to one update per loan and gives no copy back for it twice
+        loans = [result['loan']['id'] for result in self.checkout(
+            [{'book': self.dune.pk, 'user': 'alice'}, {'book': self.dune.pk, 'user': 'bob'}]
+        )['results']]
+        in_bulk = QuerySet.in_bulk
+
+        def read_then_return_one(queryset, *args, **kwargs):
+            found = in_bulk(queryset, *args, **kwargs)
+            self.client.post(f'/api/loans/{loans[0]}/return/')
+            return found
+
+        with mock.patch.object(QuerySet, 'in_bulk', autospec=True, side_effect=read_then_return_one):
+            data = self.give_back(loans)
+        self.assertEqual([result['ok'] for result in data['results']], [False, True])
+        self.assertEqual(Book.objects.get(pk=self.dune.pk).available, 3)
+
+    def test_student_borrows_for_themselves(self):
+        self.client.force_authenticate(self.alice)
+        data = self.checkout([{'book': self.dune.pk, 'user': 'bob'}])
+        self.assertEqual(data['results'][0]['loan']['user'], self.alice.pk)
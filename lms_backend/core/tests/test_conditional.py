@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Book, Loan
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / If-None-Match on the book and loan endpoints (core.conditional)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user('desk', 'desk@example.com', 'x', is_staff=True)
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'x')
+        cls.book = Book.objects.create(title='Emma', author='Jane Austen', quantity=2, available=2)
+        cls.loan = Loan.objects.create(user=cls.alice, book=cls.book)
+        Book.objects.filter(pk=cls.book.pk).update(available=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def etag(self, path, client=None):
+        response = (client or self.client).get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'])
+        return response['ETag']
+
+    def assertNotModified(self, path, etag):
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_unchanged_resources_answer_304(self):
+        for path in ('/api/books/', f'/api/books/{self.book.pk}/', '/api/loans/', f'/api/loans/{self.loan.pk}/',
+                     '/api/loans/?status=borrowed'):
+            with self.subTest(path):
+                self.assertNotModified(path, self.etag(path))
+
+    def test_stale_etag_gets_the_body(self):
+        response = self.client.get('/api/books/', HTTP_IF_NONE_MATCH='"not-the-etag"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_book_edit_changes_book_and_loan_etags(self):
+        paths = ['/api/books/', f'/api/books/{self.book.pk}/', '/api/loans/', f'/api/loans/{self.loan.pk}/']
+        before = [self.etag(path) for path in paths]
+        response = self.client.patch(f'/api/books/{self.book.pk}/', {'title': 'Persuasion'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        for path, etag in zip(paths, before):
+            with self.subTest(path):
+                self.assertNotEqual(self.etag(path), etag)
+        self.assertEqual(self.client.get(f'/api/loans/{self.loan.pk}/').data['book_title'], 'Persuasion')
+
+    def test_loan_create_and_return_change_loan_list_etag(self):
+        first = self.etag('/api/loans/')
+        response = self.client.post('/api/loans/', {'book': self.book.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        created = self.etag('/api/loans/')
+        self.assertNotEqual(created, first)
+        loan_etag = self.etag(f'/api/loans/{self.loan.pk}/')
+        self.assertEqual(self.client.post(f'/api/loans/{self.loan.pk}/return/').status_code, 200)
+        self.assertNotEqual(self.etag('/api/loans/'), created)
+        self.assertNotEqual(self.etag(f'/api/loans/{self.loan.pk}/'), loan_etag)
+
+    def test_username_edit_changes_loan_etags(self):
+        # loans show their reader's username, so renaming touches them
+        paths = ['/api/loans/', f'/api/loans/{self.loan.pk}/']
+        before = [self.etag(path) for path in paths]
+        response = self.client.patch(f'/api/users/{self.alice.pk}/', {'username': 'alice.b'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        for path, etag in zip(paths, before):
+            with self.subTest(path):
+                self.assertNotEqual(self.etag(path), etag)
+
+    def test_each_user_has_their_own_etag(self):
+        student = APIClient()
+        student.force_authenticate(self.alice)
+        for path in ('/api/books/', '/api/loans/', '/api/users/me/loans/'):
+            with self.subTest(path):
+                etag = self.etag(path, student)
+                self.assertNotEqual(self.etag(path), etag)
+                # nor does one user's ETag answer another's request with 304
+                self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
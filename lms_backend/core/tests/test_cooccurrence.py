@@ -0,0 +1,112 @@
+import sys
+import threading
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from core.recommendations import CooccurrenceModel
+
+
+def mismatches(incremental, rebuilt):
+    """Book ids whose neighbour lists differ between the two models.
+
+    Lists match when they have the same scores; neighbours tied with the
+    last kept score of a full list may legitimately differ.
+    """
+    bad = []
+    for book_id in np.union1d(incremental.book_ids, rebuilt.book_ids).tolist():
+        got, want = incremental.similar(book_id, incremental.k), rebuilt.similar(book_id, rebuilt.k)
+        got_scores, want_scores = [s for _, s in got], [s for _, s in want]
+        if len(got) != len(want) or not np.allclose(got_scores, want_scores, atol=1e-6):
+            bad.append(book_id)
+            continue
+        # below a full list's last score every neighbour must be the same
+        cut = want_scores[-1] + 1e-6 if len(want) == rebuilt.k else -1.0
+        if {b for b, s in got if s > cut} != {b for b, s in want if s > cut}:
+            bad.append(book_id)
+    return bad
+
+
+class IncrementalCooccurrenceTests(SimpleTestCase):
+    """add_loan() after fit() gives the same neighbours as fit() on all loans.
+
+    scripts/check_incremental_recommendations.py checks the same end to end,
+    through the loan endpoints, on a seeded database.
+    """
+    n_loans = 6000
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        cls.users = rng.integers(0, cls.n_loans // 60, cls.n_loans)
+        cls.books = (400 * rng.random(cls.n_loans) ** 3).astype(np.int64) + 1  # a few popular books
+
+    def test_add_loan_matches_a_rebuild(self):
+        split = self.n_loans * 3 // 4
+        for similarity in ('cosine', 'jaccard'):
+            for max_user_items, min_count in ((500, 1), (20, 2)):
+                options = dict(k=20, similarity=similarity, max_user_items=max_user_items, min_count=min_count)
+                with self.subTest(**options):
+                    # compact often, so that the count table is rebuilt along the way too
+                    model = CooccurrenceModel(keep_counts=True, compact_after=500, **options)
+                    model.fit(self.users[:split], self.books[:split])
+                    for user_id, book_id in zip(self.users[split:].tolist(), self.books[split:].tolist()):
+                        model.add_loan(user_id, book_id)
+                    rebuilt = CooccurrenceModel(**options).fit(self.users, self.books)
+                    self.assertEqual(mismatches(model, rebuilt), [])
+
+    def test_new_books_and_readers(self):
+        # loans of books and by readers the fitted model has never seen
+        model = CooccurrenceModel(k=10, keep_counts=True).fit(self.users[:1000], self.books[:1000])
+        users, books = [9001, 9001, 9002, 9002, 9003], [5001, 5002, 5001, 5002, 5001]
+        for user_id, book_id in zip(users, books):
+            model.add_loan(user_id, book_id)
+        rebuilt = CooccurrenceModel(k=10).fit(
+            np.concatenate([self.users[:1000], users]), np.concatenate([self.books[:1000], books]),
+        )
+        self.assertEqual(mismatches(model, rebuilt), [])
+        self.assertEqual([b for b, _ in model.similar(5001)], [5002])
+
+    def test_reads_while_loans_are_added(self):
+        # similar() and recommend() from other threads while add_loan() grows
+        # the arrays and recomputes rows must never see a half-written state
+        split, end = self.n_loans // 2, self.n_loans // 2 + 1000
+        options = dict(k=20, max_user_items=500)
+        model = CooccurrenceModel(keep_counts=True, compact_after=500, **options)
+        model.fit(self.users[:split], self.books[:split])
+        # every fitted book has neighbours, and with no per-reader cap reached
+        # no count goes down, so each keeps at least one
+        fitted = [book_id for book_id in model.book_ids.tolist() if model.similar(book_id)]
+        errors, done = [], threading.Event()
+
+        def read(seed):
+            rng = np.random.default_rng(seed)
+            while not done.is_set():
+                book_id = int(rng.choice(fitted))
+                neighbours = model.similar(book_id, 20)
+                scores = [score for _, score in neighbours]
+                if not neighbours or scores != sorted(scores, reverse=True) or book_id in dict(neighbours):
+                    errors.append((book_id, neighbours))
+                model.recommend(rng.choice(fitted, 3).tolist())
+
+        readers = [threading.Thread(target=read, args=(seed,)) for seed in range(4)]
+        # switch threads as often as possible, so reads land inside the writes
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        for thread in readers:
+            thread.start()
+        try:
+            for user_id, book_id in zip(self.users[split:end].tolist(), self.books[split:end].tolist()):
+                model.add_loan(user_id, book_id)
+                model.add_loan(user_id + 100_000, book_id + 100_000)  # new readers and books: arrays grow
+        finally:
+            done.set()
+            for thread in readers:
+                thread.join()
+            sys.setswitchinterval(interval)
+
+        self.assertEqual(errors, [])
+        users = np.concatenate([self.users[:end], self.users[split:end] + 100_000])
+        books = np.concatenate([self.books[:end], self.books[split:end] + 100_000])
+        self.assertEqual(mismatches(model, CooccurrenceModel(**options).fit(users, books)), [])
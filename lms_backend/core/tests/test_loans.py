@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Book, Loan
+from core.views import LoanViewSet
+
+
+class CheckoutAvailabilityTests(TestCase):
+    """POST /api/loans/ takes a copy with one conditional UPDATE; returns give one back."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'x')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'x')
+        cls.book = Book.objects.create(title='Emma', quantity=2, available=1)
+
+    def borrow(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post('/api/loans/', {'book': self.book.pk}, format='json')
+
+    def available(self):
+        return Book.objects.get(pk=self.book.pk).available
+
+    def test_last_copy_borrowed_twice(self):
+        self.assertEqual(self.borrow(self.alice).status_code, 201)
+        response = self.borrow(self.bob)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.available(), 0)
+        self.assertEqual(Loan.objects.filter(book=self.book).count(), 1)
+
+    def test_last_copy_taken_between_validation_and_update(self):
+        # Bob's request has validated the book (one copy left) when Alice's
+        # checkout takes that copy; the conditional update must refuse Bob's
+        perform_create = LoanViewSet.perform_create
+        responses = []
+
+        def alice_first(view, serializer):
+            if view.request.user == self.bob:
+                responses.append(self.borrow(self.alice))
+            return perform_create(view, serializer)
+
+        with mock.patch.object(LoanViewSet, 'perform_create', autospec=True, side_effect=alice_first):
+            response = self.borrow(self.bob)
+        self.assertEqual(responses[0].status_code, 201)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.available(), 0)
+        self.assertEqual(list(Loan.objects.values_list('user_id', flat=True)), [self.alice.pk])
+
+    def test_return_gives_back_exactly_one_copy(self):
+        loan_id = self.borrow(self.alice).data['id']
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        self.assertEqual(client.post(f'/api/loans/{loan_id}/return/').status_code, 200)
+        self.assertEqual(self.available(), 1)
+        # a double-submitted return changes nothing
+        self.assertEqual(client.post(f'/api/loans/{loan_id}/return/').status_code, 400)
+        self.assertEqual(self.available(), 1)
+        self.assertEqual(Loan.objects.get(pk=loan_id).status, 'returned')
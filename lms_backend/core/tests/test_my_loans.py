@@ -0,0 +1,64 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Book, Loan
+
+
+class MySummaryTests(TestCase):
+    """GET /api/users/me/summary/ counts only the caller's loans, each in its own bucket."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'x')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'x')
+        book = Book.objects.create(title='Emma', quantity=10, available=10)
+        now = timezone.now()
+        start_of_year = timezone.localtime().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        def loan(user, due, returned=None, fine='0'):
+            return Loan(user=user, book=book, due_date=due, return_date=returned,
+                        status='borrowed' if returned is None else 'returned', fine=Decimal(fine))
+
+        Loan.objects.bulk_create([
+            # open: one due later, two overdue (one of them only since yesterday)
+            loan(cls.alice, now + timedelta(days=3)),
+            loan(cls.alice, now - timedelta(days=5)),
+            loan(cls.alice, now - timedelta(days=1)),
+            # returned this year: on time, and late with a fine
+            loan(cls.alice, now + timedelta(days=1), returned=now),
+            loan(cls.alice, now - timedelta(days=2), returned=now, fine='3.50'),
+            # returned late last year
+            loan(cls.alice, start_of_year - timedelta(days=10), returned=start_of_year - timedelta(days=2),
+                 fine='1.25'),
+            # someone else's
+            loan(cls.bob, now - timedelta(days=5)),
+        ])
+
+    def summary(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/users/me/summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counters(self):
+        summary = self.summary(self.alice)
+        self.assertEqual(summary['borrowed'], 3)
+        self.assertEqual(summary['returned'], 3)
+        self.assertEqual(summary['overdue'], 2)
+        self.assertEqual(summary['late_returns'], 2)
+        self.assertEqual(summary['reads_this_year'], 2)
+        self.assertEqual(summary['total_fines'], '4.75')
+
+    def test_total_fines_rendered_like_loan_fines(self):
+        # with fines, with loans but no fines, and without loans
+        without_loans = get_user_model().objects.create_user('carol', 'carol@example.com', 'x')
+        for user, expected in ((self.alice, '4.75'), (self.bob, '0.00'), (without_loans, '0.00')):
+            with self.subTest(user.username):
+                self.assertEqual(self.summary(user)['total_fines'], expected)
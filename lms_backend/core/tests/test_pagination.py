@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Book
+
+
+class BookCursorPaginationTests(TestCase):
+    """Paging /api/books/ by a column full of ties returns every book once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # same quantity, availability, author and category for every book
+        Book.objects.bulk_create(
+            Book(title=f'Book {i % 7}', author='Same Author', isbn=f'978-{i:010d}', category='Fiction',
+                 quantity=3, available=3)
+            for i in range(3000)
+        )
+        cls.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'x')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page_through(self, url, params):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(book['id'] for book in response.data['results'])
+            url, params = response.data['next'], None
+            pages += 1
+            self.assertLessEqual(pages, 10, 'the cursor never reached the end')
+        return ids
+
+    def test_every_book_once_for_each_ordering(self):
+        all_ids = set(Book.objects.values_list('id', flat=True))
+        for ordering in ('quantity', '-quantity', 'available', 'category', '-author', 'title', '-title', '-id'):
+            with self.subTest(ordering=ordering):
+                ids = self.page_through('/api/books/', {'ordering': ordering, 'page_size': 1000})
+                self.assertEqual(len(ids), len(all_ids))
+                self.assertEqual(set(ids), all_ids)
+
+    def test_ties_come_in_id_order(self):
+        ids = self.page_through('/api/books/', {'ordering': '-quantity', 'page_size': 400})
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.client.get('/api/books/', {'ordering': 'title', 'page_size': 250}).data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual([b['id'] for b in back['results']], [b['id'] for b in first['results']])
+
+    def test_garbled_cursor_is_not_found(self):
+        response = self.client.get('/api/books/', {'ordering': 'title', 'cursor': 'cD1ub3Rqc29u'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,81 @@
+import math
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Book, Loan
+from core.popularity import WINDOWS, borrow_updates, decayed, recompute, trend_field, trending_books
+
+
+class BorrowCounterTests(TestCase):
+    """The stored log-sum-exp counters (core.popularity)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = get_user_model().objects.create_user('alice', 'alice@example.com', 'x')
+        cls.now = timezone.now()
+
+    def book(self, title):
+        return Book.objects.create(title=title, quantity=10, available=10)
+
+    def borrow(self, book, days_ago, count=1):
+        """Count ``count`` loans ``days_ago`` as the checkout paths do, and record them."""
+        when = self.now - timedelta(days=days_ago)
+        Book.objects.filter(pk=book.pk).update(**borrow_updates(when, count))
+        loans = Loan.objects.bulk_create(Loan(user=self.reader, book=book, due_date=when) for _ in range(count))
+        Loan.objects.filter(pk__in=[loan.pk for loan in loans]).update(borrow_date=when)
+
+    def counters(self):
+        fields = ['borrow_count'] + [trend_field(window) for window in WINDOWS]
+        return {row[0]: row[1:] for row in Book.objects.order_by('id').values_list('id', *fields)}
+
+    def test_incremental_updates_match_recompute(self):
+        # in and out of order, several loans at once, and terms far enough
+        # apart (days for the day window) to take the underflow branches
+        schedule = {
+            'Emma': [(0, 1), (3, 1), (1, 2)],
+            'Dune': [(200, 1), (0.5, 3), (90, 1)],
+            'Kim': [(10, 4)],
+            'Never borrowed': [],
+        }
+        for title, loans in schedule.items():
+            book = self.book(title)
+            for days_ago, count in loans:
+                self.borrow(book, days_ago, count)
+        incremental = self.counters()
+
+        recompute(Book, Loan)
+        rebuilt = self.counters()
+        self.assertEqual(incremental.keys(), rebuilt.keys())
+        for book_id, values in incremental.items():
+            self.assertEqual(values[0], rebuilt[book_id][0])
+            for got, want in zip(values[1:], rebuilt[book_id][1:]):
+                if want is None:
+                    self.assertIsNone(got)
+                else:
+                    self.assertAlmostEqual(got, want, places=6)
+
+    def test_decayed_score_is_the_sum_of_decayed_loans(self):
+        book = self.book('Emma')
+        for days_ago in (0, 2, 9):
+            self.borrow(book, days_ago)
+        stored = Book.objects.get(pk=book.pk).trend_week
+        expected = sum(math.exp(-days * 24 * 3600 / WINDOWS['week']) for days in (0, 2, 9))
+        self.assertAlmostEqual(decayed(stored, 'week', self.now), expected, places=6)
+
+    def test_trending_order_depends_on_the_window(self):
+        recent, steady, old = self.book('Recent'), self.book('Steady'), self.book('Old')
+        self.borrow(recent, 0.1, 2)
+        self.borrow(steady, 20, 6)
+        self.borrow(old, 240, 50)
+
+        def shelf(window):
+            return list(trending_books(window, self.now).values_list('title', flat=True))
+
+        # a day: only the recent loans count; a month: the six steady loans win,
+        # and fifty loans eight months old have decayed off every shelf
+        self.assertEqual(shelf('day'), ['Recent'])
+        self.assertEqual(shelf('week'), ['Recent', 'Steady'])
+        self.assertEqual(shelf('month'), ['Steady', 'Recent'])
@@ -0,0 +1,58 @@
+import random
+import unittest
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Book, Loan
+from core.query_plans import UNINDEXED_ORDER, build_checks, check_search_index
+
+CATEGORIES = ['Fiction', 'Science', 'History', 'Poetry', 'Biography']
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'the checks read SQLite query plans')
+class QueryPlanTests(TestCase):
+    """The hot queries look rows up in an index instead of scanning a table.
+
+    Runs the checks of core.query_plans against a small seeded database;
+    scripts/check_query_plans.py runs them at a million loans.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        Book.objects.bulk_create(
+            Book(title=f'Book {i}', author=f'Author {i % 40}', isbn=f'978-{i:010d}',
+                 category=rng.choice(CATEGORIES), quantity=rng.randint(1, 5), available=1)
+            for i in range(400)
+        )
+        User = get_user_model()
+        User.objects.bulk_create(
+            User(username=f'reader{i}', email=f'reader{i}@university.edu', password='!') for i in range(50)
+        )
+        books = list(Book.objects.values_list('id', flat=True))
+        users = list(User.objects.values_list('id', flat=True))
+        now = timezone.now()
+        Loan.objects.bulk_create(
+            Loan(user_id=rng.choice(users), book_id=rng.choice(books), due_date=now + timedelta(days=rng.randint(-7, 14)),
+                 status=rng.choice(['borrowed', 'returned']))
+            for _ in range(2000)
+        )
+
+    def test_hot_queries_use_an_index(self):
+        loan = Loan.objects.select_related('book').order_by('-id').first()
+        sample = (loan.user_id, loan.book_id, loan.book.isbn, loan.book.category)
+        for name, queryset, pattern in build_checks(sample):
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertIsNone(pattern.search(plan), f'{name}:\n{plan}')
+
+    def test_unindexed_ordering_is_reported(self):
+        # the check itself: sorting the catalog on a column without an index fails
+        self.assertIsNotNone(UNINDEXED_ORDER.search(Book.objects.order_by('description')[:10].explain()))
+
+    def test_search_index_follows_the_catalog(self):
+        self.assertEqual(check_search_index(), [])
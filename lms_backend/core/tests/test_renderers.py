@@ -0,0 +1,68 @@
+import json
+import sys
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Book, Loan
+
+# the desktop client's decoder, as shipped
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / 'LMSFINAL'))
+from api_client import COLUMNAR_JSON, _decode  # noqa: E402
+
+
+class ColumnarRoundTripTests(TestCase):
+    """Columnar JSON (core.renderers) decoded by api_client equals plain JSON."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user('desk', 'desk@example.com', 'x', is_staff=True)
+        alice = User.objects.create_user('alice', 'alice@example.com', 'x')
+        books = [Book.objects.create(title=f'Book {i}', author='', quantity=2, available=2) for i in range(5)]
+        for book in books:
+            Loan.objects.create(user=alice, book=book)
+        # returned ones have a return date, open ones a null
+        Loan.objects.filter(book__in=books[:2]).update(status='returned', return_date=timezone.now())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def both(self, path, params=None):
+        """The plain JSON response to ``path``, and the columnar one decoded by the client."""
+        plain = self.client.get(path, params, HTTP_ACCEPT='application/json')
+        columnar = self.client.get(path, params, HTTP_ACCEPT=COLUMNAR_JSON)
+        self.assertEqual(plain.status_code, columnar.status_code)
+        self.assertTrue(columnar['Content-Type'].startswith(COLUMNAR_JSON))
+        return json.loads(plain.content), _decode(columnar.content, columnar['Content-Type']), columnar
+
+    def test_paginated_list(self):
+        plain, decoded, columnar = self.both('/api/loans/', {'page_size': 3})
+        self.assertEqual(decoded, plain)
+        self.assertEqual(len(plain['results']), 3)
+        self.assertIn('columns', json.loads(columnar.content)['results'])
+        # the next page too, through the cursor in the columnar response's link
+        plain, decoded, _ = self.both(decoded['next'])
+        self.assertEqual(decoded, plain)
+
+    def test_null_fields(self):
+        plain, decoded, _ = self.both('/api/loans/')
+        self.assertEqual(decoded, plain)
+        self.assertEqual(sum(loan['return_date'] is None for loan in decoded['results']), 3)
+        self.assertEqual({loan['book_author'] for loan in decoded['results']}, {''})
+
+    def test_empty_page(self):
+        plain, decoded, columnar = self.both('/api/loans/', {'status': 'lost'})
+        self.assertEqual(plain['results'], [])
+        self.assertEqual(decoded, plain)
+        self.assertEqual(json.loads(columnar.content)['results'], {'columns': [], 'rows': []})
+
+    def test_unpaginated_and_non_object_responses(self):
+        for path in ('/api/books/categories/', '/api/stats/dashboard/', '/api/loans/9999/'):
+            with self.subTest(path):
+                plain, decoded, _ = self.both(path)
+                self.assertEqual(decoded, plain)
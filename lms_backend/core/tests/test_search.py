@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Book
+
+
+class BookListSearchTests(TestCase):
+    """?search= on /api/books/ is answered from the FTS and ISBN indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hobbit = Book.objects.create(title='The Hobbit', author='J.R.R. Tolkien', isbn='978-0261102217',
+                                         category='Fantasy')
+        cls.dune = Book.objects.create(title='Dune', author='Frank Herbert', isbn='978-0441172719',
+                                       category='Science Fiction', description='hobbits do not appear')
+        cls.user = get_user_model().objects.create_user('reader', 'reader@example.com', 'x')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, text):
+        response = self.client.get('/api/books/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return [book['id'] for book in response.data['results']]
+
+    def test_words_match_title_or_author_prefixes(self):
+        self.assertEqual(self.search('hob'), [self.hobbit.id])
+        self.assertEqual(self.search('tolk hobbit'), [self.hobbit.id])
+        self.assertEqual(self.search('HERB'), [self.dune.id])
+        self.assertEqual(self.search('tolkien dune'), [])
+
+    def test_category_and_description_are_not_searched(self):
+        self.assertEqual(self.search('fantasy'), [])
+        self.assertEqual(self.search('appear'), [])
+
+    def test_isbn_prefix(self):
+        self.assertEqual(self.search('978-0441'), [self.dune.id])
+        self.assertEqual(self.search('978-0261102217'), [self.hobbit.id])
+
+    def test_search_follows_edits(self):
+        self.hobbit.title = 'There and Back Again'
+        self.hobbit.save()
+        self.assertEqual(self.search('hobbit'), [])
+        self.assertEqual(self.search('back again'), [self.hobbit.id])
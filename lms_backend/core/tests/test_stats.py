@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Book, Loan
+
+
+class DashboardStatsCacheTests(TestCase):
+    """Every write behind the admin dashboard counters drops the cached copy."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user('desk', 'desk@example.com', 'x', is_staff=True)
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'x')
+        cls.book = Book.objects.create(title='Emma', quantity=2, available=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        # cached from here on until something invalidates it
+        self.before = self.stats()
+
+    def stats(self):
+        response = self.client.get('/api/stats/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cached_between_writes(self):
+        Book.objects.create(title='Written behind the API', quantity=1, available=1)
+        self.assertEqual(self.stats(), self.before)
+
+    def test_borrow(self):
+        self.assertEqual(self.client.post('/api/loans/', {'book': self.book.pk}, format='json').status_code, 201)
+        after = self.stats()
+        self.assertEqual(after['checked_out'], self.before['checked_out'] + 1)
+        self.assertEqual(after['available_copies'], self.before['available_copies'] - 1)
+
+    def test_bulk_borrow(self):
+        response = self.client.post('/api/loans/bulk/', {'items': [{'book': self.book.pk, 'user': 'alice'}]},
+                                    format='json')
+        self.assertEqual(response.data['succeeded'], 1)
+        self.assertEqual(self.stats()['checked_out'], self.before['checked_out'] + 1)
+
+    def test_return(self):
+        loan = Loan.objects.create(user=self.alice, book=self.book)
+        Book.objects.filter(pk=self.book.pk).update(available=1)
+        cache.clear()
+        self.before = self.stats()
+        self.assertEqual(self.client.post(f'/api/loans/{loan.pk}/return/').status_code, 200)
+        after = self.stats()
+        self.assertEqual(after['checked_out'], self.before['checked_out'] - 1)
+        self.assertEqual(after['available_copies'], self.before['available_copies'] + 1)
+
+    def test_book_create(self):
+        response = self.client.post('/api/books/', {'title': 'Dune', 'quantity': 3, 'available': 3}, format='json')
+        self.assertEqual(response.status_code, 201)
+        after = self.stats()
+        self.assertEqual(after['total_books'], self.before['total_books'] + 1)
+        self.assertEqual(after['total_copies'], self.before['total_copies'] + 3)
+
+    def test_book_delete(self):
+        self.assertEqual(self.client.delete(f'/api/books/{self.book.pk}/').status_code, 204)
+        after = self.stats()
+        self.assertEqual(after['total_books'], self.before['total_books'] - 1)
+        self.assertEqual(after['total_copies'], self.before['total_copies'] - 2)
+
+    def test_user_create(self):
+        response = self.client.post('/api/users/', {'username': 'bob', 'email': 'bob@example.com', 'password': 'x'},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stats()['total_users'], self.before['total_users'] + 1)
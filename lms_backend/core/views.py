@@ -1,21 +1,212 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, serializers, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 
 from .models import Book, Loan
 from .serializers import BookSerializer
 from .serializers_user import UserSerializer
-from .serializers_loan import LoanSerializer
+from .serializers_loan import LoanSerializer, resolve_book, resolve_user
+from .pagination import IdCursorPagination
+from .search import BookSearchFilter, search_books
+from .circulation import MAX_BATCH_SIZE, bulk_checkout, bulk_return
+from .conditional import (
+    LOAN_BOOK_FIELDS, book_etag, book_list_etag, loan_etag, loan_list_etag, my_loans_etag, touch_loans,
+)
+from .popularity import WINDOWS, borrow_updates, decayed, popular_books, trend_field, trending_books
+from .recommendations import (
+    forget_user_candidates, next_books, record_loans, remove_book_content, similar_books, similar_by_content,
+    update_book_content, user_candidates,
+)
 from django.db import transaction
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
+
+
+def _int_param(request, name, default, maximum):
+    # Optional positive integer query parameter, clamped to [1, maximum]
+    try:
+        return max(1, min(int(request.query_params.get(name, default)), maximum))
+    except ValueError:
+        raise ValidationError(f'{name} must be an integer')
+
+
+# Cache key of the admin dashboard counters (StatsViewSet.dashboard)
+DASHBOARD_STATS_KEY = 'dashboard-stats'
+
+
+def _forget_dashboard_stats():
+    # After any change to books, users or loans, so the cards show it on the next refresh
+    cache.delete(DASHBOARD_STATS_KEY)
+
+
+# Type and rendering of a sum of Loan.fine (UserViewSet.my_summary)
+FINE_FIELD = DecimalField(max_digits=8, decimal_places=2)
+FINE_REPRESENTATION = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+
+def _start_of_today():
+    # Loans due before local midnight are overdue, matching the UI's date comparison
+    return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
 
 
 class BookViewSet(viewsets.ModelViewSet):
     queryset = Book.objects.all().order_by('-id')
     serializer_class = BookSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = IdCursorPagination
+    filter_backends = [BookSearchFilter, filters.OrderingFilter]
+    # ?search=<terms>: every word starts a word of the title or author, or the
+    # term starts the ISBN (core.search; a substring match without FTS5)
+    search_fields = ['title', 'author', 'isbn']
+    # ?ordering=<field> or -<field>; the cursor then pages along (field, id)
+    ordering_fields = ['title', 'author', 'isbn', 'category', 'quantity', 'available']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Filter by category if requested
+        category = self.request.query_params.get('category', None)
+        if category is not None:
+            queryset = queryset.filter(category=category)
+        return queryset
+
+    # Answer If-None-Match with 304 before querying or serializing (core.conditional)
+    @method_decorator(condition(etag_func=book_list_etag))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(condition(etag_func=book_etag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    # Keep the content-based similarity index in step with the catalog
+    def perform_create(self, serializer):
+        update_book_content(serializer.save())
+        _forget_dashboard_stats()
+
+    def perform_update(self, serializer):
+        shown = [getattr(serializer.instance, field) for field in LOAN_BOOK_FIELDS]
+        book = serializer.save()
+        update_book_content(book)
+        _forget_dashboard_stats()
+        # Loans show these too; their ETags must change with them
+        if shown != [getattr(book, field) for field in LOAN_BOOK_FIELDS]:
+            touch_loans(book=book)
+
+    def perform_destroy(self, instance):
+        book_id = instance.pk
+        instance.delete()
+        remove_book_content(book_id)
+        _forget_dashboard_stats()
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        # Ranked full-text search: ?q=<words>[&category=<name>][&limit=<n>]
+        # Every word is matched as a prefix, best matches (BM25) first
+        query = request.query_params.get('q', '')
+        limit = _int_param(request, 'limit', 20, 100)
+        books = search_books(query, limit, request.query_params.get('category') or None)
+        return Response(self.get_serializer(books, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        # Books most often borrowed by readers of this one, ?k=<n> (default 10, max 50),
+        # served from the in-memory item-item model; ?source=content ranks by
+        # similar title, author, category and description instead (works for new books)
+        try:
+            book_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        k = _int_param(request, 'k', 10, 50)
+        source = request.query_params.get('source', 'loans')
+        if source not in ('loans', 'content'):
+            raise ValidationError({'source': 'Expected "loans" or "content".'})
+        neighbours = (similar_books if source == 'loans' else similar_by_content)(book_id, k)
+        # One query for the book itself (404 check) and its neighbours; every
+        # BookSerializer field is a plain column, so .values() gives the same
+        # output without building model instances
+        books = {
+            row['id']: row
+            for row in Book.objects.filter(pk__in=[book_id] + [n for n, _ in neighbours])
+            .values(*BookSerializer.Meta.fields)
+        }
+        if book_id not in books:
+            raise NotFound()
+        return Response([
+            dict(books[neighbour], similarity=round(score, 4))
+            for neighbour, score in neighbours if neighbour in books
+        ])
+
+    @action(detail=True, methods=['get'], url_path='next')
+    def next_books(self, request, pk=None):
+        # What readers of this book borrowed right after it, ?k=<n> (default 10, max 50),
+        # with the share of its readers' next loans as `probability`
+        try:
+            book_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        k = _int_param(request, 'k', 10, 50)
+        following = next_books(book_id, k)
+        books = {
+            row['id']: row
+            for row in Book.objects.filter(pk__in=[book_id] + [n for n, _ in following])
+            .values(*BookSerializer.Meta.fields)
+        }
+        if book_id not in books:
+            raise NotFound()
+        return Response([
+            dict(books[next_id], probability=round(score, 4))
+            for next_id, score in following if next_id in books
+        ])
+
+    @action(detail=False, methods=['get'], url_path=r'by-isbn/(?P<isbn>[^/]+)')
+    def by_isbn(self, request, isbn=None):
+        # Direct lookup for the barcode scanner / ISBN field, one indexed query
+        isbn = isbn.strip()
+        # a blank ISBN is not a lookup key, however many books have none
+        book = Book.objects.filter(isbn=isbn).order_by('id').first() if isbn else None
+        if book is None:
+            raise NotFound('No book with this ISBN')
+        return Response(self.get_serializer(book).data)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def categories(self, request):
+        # Distinct categories in name order, read off book_category_id_idx; open
+        # to anyone so that the registration form can offer them
+        categories = Book.objects.exclude(category='').order_by('category').values_list('category', flat=True)
+        return Response(list(categories.distinct()))
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        # Most borrowed lately: ?window=day|week|month (default week), ?limit=<n> (max 100).
+        # Read in order from the window's decayed-score index; only the rows
+        # served get their current score computed (see core.popularity)
+        window = request.query_params.get('window', 'week')
+        if window not in WINDOWS:
+            raise ValidationError({'window': f'Expected one of: {", ".join(WINDOWS)}.'})
+        limit = _int_param(request, 'limit', 20, 100)
+        field = trend_field(window)
+        now = timezone.now()
+        rows = trending_books(window, now).values(*BookSerializer.Meta.fields, field)[:limit]
+        books = []
+        for row in rows:
+            row['score'] = round(decayed(row.pop(field), window, now), 4)
+            books.append(row)
+        return Response(books)
+
+    @action(detail=False, methods=['get'])
+    def popular(self, request):
+        # All-time most borrowed, ?limit=<n> (default 20, max 100), from the borrow_count index
+        limit = _int_param(request, 'limit', 20, 100)
+        return Response(list(popular_books().values(*BookSerializer.Meta.fields)[:limit]))
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -28,6 +219,24 @@ class UserViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        _forget_dashboard_stats()
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        _forget_dashboard_stats()
+
+    def perform_update(self, serializer):
+        username = serializer.instance.username
+        super().perform_update(serializer)
+        # Loans show the username; their ETags must change with it
+        if serializer.instance.username != username:
+            touch_loans(user=serializer.instance)
+        # Cold-start recommendations follow the preferred categories
+        if 'preferred_categories' in serializer.validated_data:
+            forget_user_candidates([serializer.instance.pk])
+
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def me(self, request):
         user = request.user
@@ -36,13 +245,74 @@ class UserViewSet(viewsets.ModelViewSet):
             'username': user.username,
             'email': user.email,
             'is_staff': user.is_staff,
+            'preferred_categories': list(
+                user.preferred_categories.order_by('id').values_list('category', flat=True)
+            ),
         })
 
+    @action(detail=False, methods=['get'])
+    def lookup(self, request):
+        # Find one user by ?q=<id|username|email> without listing everyone
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError('q is required')
+        user = resolve_user(query)
+        if user is None:
+            raise NotFound('No user with this id, username or email')
+        return Response(self.get_serializer(user).data)
+
+    @action(detail=False, methods=['get'], url_path='me/loans', permission_classes=[permissions.IsAuthenticated])
+    @method_decorator(condition(etag_func=my_loans_etag))
+    def my_loans(self, request):
+        # The current user's loans, newest first, optionally ?status=borrowed|returned
+        queryset = Loan.objects.select_related('book', 'user').filter(user=request.user).order_by('-id')
+        loan_status = request.query_params.get('status', None)
+        if loan_status is not None:
+            queryset = queryset.filter(status=loan_status)
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = LoanSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='me/summary', permission_classes=[permissions.IsAuthenticated])
+    def my_summary(self, request):
+        # Student dashboard counters in one aggregate over the user's loans
+        start_of_year = _start_of_today().replace(month=1, day=1)
+        summary = Loan.objects.filter(user=request.user).aggregate(
+            borrowed=Count('id', filter=Q(status='borrowed')),
+            returned=Count('id', filter=Q(status='returned')),
+            overdue=Count('id', filter=Q(status='borrowed', due_date__lt=_start_of_today())),
+            late_returns=Count('id', filter=Q(status='returned', return_date__gt=F('due_date'))),
+            reads_this_year=Count('id', filter=Q(status='returned', return_date__gte=start_of_year)),
+            total_fines=Coalesce(Sum('fine'), Value(Decimal('0.00'), output_field=FINE_FIELD)),
+        )
+        # SQLite hands sums back unscaled (0, 4.5); render like Loan.fine ("0.00", "4.50")
+        summary['total_fines'] = FINE_REPRESENTATION.to_representation(summary['total_fines'])
+        return Response(summary)
+
+    @action(detail=False, methods=['get'], url_path='me/recommendations',
+            permission_classes=[permissions.IsAuthenticated])
+    def my_recommendations(self, request):
+        # "Recommended for you", ?k=<n> (default 10, max 50). The scored
+        # candidates are cached per user until their next checkout or return;
+        # availability is read fresh so books on the shelf come first
+        k = _int_param(request, 'k', 10, 50)
+        candidates = user_candidates(request.user.pk)
+        books = {
+            row['id']: row
+            for row in Book.objects.filter(pk__in=[book_id for book_id, _ in candidates])
+            .values(*BookSerializer.Meta.fields)
+        }
+        ranked = [(books[book_id], score) for book_id, score in candidates if book_id in books]
+        ranked.sort(key=lambda pair: pair[0]['available'] <= 0)  # stable: keeps score order
+        return Response([dict(book, score=round(score, 4)) for book, score in ranked[:k]])
+
 
 class LoanViewSet(viewsets.ModelViewSet):
     queryset = Loan.objects.select_related('book', 'user').all().order_by('-id')
     serializer_class = LoanSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = IdCursorPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -56,6 +326,14 @@ class LoanViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(status=status)
         return queryset
 
+    @method_decorator(condition(etag_func=loan_list_etag))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(condition(etag_func=loan_etag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         # Create a loan and decrement book availability atomically
         req_user = self.request.user
@@ -63,27 +341,148 @@ class LoanViewSet(viewsets.ModelViewSet):
         # allow staff to specify the target user in payload
         target_user = serializer.validated_data.get('user', None)
         with transaction.atomic():
-            book = Book.objects.select_for_update().get(pk=book.pk)
-            if book.available <= 0:
+            # Check and decrement in one UPDATE: concurrent checkouts of the
+            # last copy cannot both succeed, and no other column is rewritten.
+            # The same statement counts the loan for the popular/trending shelves
+            now = timezone.now()
+            taken = Book.objects.filter(pk=book.pk, available__gt=0).update(
+                available=F('available') - 1, updated_at=now, **borrow_updates(now)
+            )
+            if not taken:
                 raise ValidationError('Book is not available')
-            book.available = book.available - 1
-            book.save()
             if target_user and req_user.is_staff:
-                serializer.save(user=target_user)
+                loan = serializer.save(user=target_user)
             else:
-                serializer.save(user=req_user)
+                loan = serializer.save(user=req_user)
+        record_loans([loan])
+        forget_user_candidates([loan.user_id])
+        _forget_dashboard_stats()
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        _forget_dashboard_stats()
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        _forget_dashboard_stats()
+
+    def _active_loans(self, book_identifier, user_identifier=None):
+        # Open loans of one book (id or ISBN), oldest due first, optionally of one user
+        book = resolve_book(book_identifier)
+        if book is None:
+            raise NotFound('No book with this id or ISBN')
+        queryset = Loan.objects.select_related('book', 'user').filter(book=book, status='borrowed')
+        if user_identifier:
+            user = resolve_user(user_identifier)
+            if user is None:
+                raise NotFound('No user with this id, username or email')
+            queryset = queryset.filter(user=user)
+        return queryset.order_by('due_date', 'id')
+
+    def _return_loan(self, loan):
+        # Mark a loan returned and increment availability
+        now = timezone.now()
+        with transaction.atomic():
+            # Only the request that flips the loan gives the copy back, so a
+            # double-submitted return cannot push availability above stock
+            returned = Loan.objects.filter(pk=loan.pk, status='borrowed').update(
+                status='returned', return_date=now, updated_at=now
+            )
+            if not returned:
+                return Response({'detail': 'Loan already returned'}, status=status.HTTP_400_BAD_REQUEST)
+            Book.objects.filter(pk=loan.book_id).update(available=F('available') + 1, updated_at=now)
+        forget_user_candidates([loan.user_id])
+        _forget_dashboard_stats()
+        loan.status = 'returned'
+        loan.return_date = now
+        return Response(self.get_serializer(loan).data)
+
+    @action(detail=False, methods=['get'])
+    def active(self, request):
+        # Open loans of ?book=<id|isbn>[&user=<id|username|email>]
+        book_identifier = request.query_params.get('book', '')
+        if not book_identifier.strip():
+            raise ValidationError('book is required')
+        loans = self._active_loans(book_identifier, request.query_params.get('user'))
+        return Response(self.get_serializer(loans, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='return', url_name='return-by-book')
+    def return_by_book(self, request):
+        # Return a book by id or ISBN without looking the loan up first;
+        # with several copies out, the one due earliest (or the given user's) is returned
+        book_identifier = str(request.data.get('book', '')).strip()
+        if not book_identifier:
+            raise ValidationError('book is required')
+        loan = self._active_loans(book_identifier, request.data.get('user')).first()
+        if loan is None:
+            raise NotFound('This book has no active loan')
+        return self._return_loan(loan)
+
+    def _batch(self, request, key):
+        # Accept {"<key>": [...]} or a bare JSON list
+        items = request.data if isinstance(request.data, list) else request.data.get(key)
+        if not isinstance(items, list) or not items:
+            raise ValidationError(f'{key} must be a non-empty list')
+        if len(items) > MAX_BATCH_SIZE:
+            raise ValidationError(f'at most {MAX_BATCH_SIZE} {key} per request')
+        return items
+
+    def _batch_response(self, results):
+        loans = [result['loan'] for result in results if result['ok']]
+        forget_user_candidates(loan.user_id for loan in loans)
+        _forget_dashboard_stats()
+        data = iter(self.get_serializer(loans, many=True).data)
+        for result in results:
+            if result['ok']:
+                result['loan'] = next(data)
+        succeeded = len(loans)
+        return Response({'succeeded': succeeded, 'failed': len(results) - succeeded, 'results': results})
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        # Check out a batch: {"items": [{"book": <id|isbn>, "user": <id|username|email>}, ...]}
+        items = self._batch(request, 'items')
+        if not all(isinstance(item, dict) for item in items):
+            raise ValidationError('every item must be an object with "book" and "user"')
+        results = bulk_checkout(items, request.user)
+        record_loans(result['loan'] for result in results if result['ok'])
+        return self._batch_response(results)
+
+    @action(detail=False, methods=['post'], url_path='bulk-return')
+    def bulk_return(self, request):
+        # Return a batch of loans: {"loans": [<loan id>, ...]}
+        loan_ids = self._batch(request, 'loans')
+        try:
+            loan_ids = [int(loan_id) for loan_id in loan_ids]
+        except (TypeError, ValueError):
+            raise ValidationError('loans must be loan ids')
+        return self._batch_response(bulk_return(loan_ids))
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated], url_path='return')
     def return_(self, request, pk=None):
         # Return a loan and increment availability
-        loan = self.get_object()
-        if loan.status == 'returned':
-            return Response({'detail': 'Loan already returned'}, status=status.HTTP_400_BAD_REQUEST)
-        with transaction.atomic():
-            book = Book.objects.select_for_update().get(pk=loan.book.pk)
-            book.available = book.available + 1
-            book.save()
-            loan.status = 'returned'
-            loan.return_date = timezone.now()
-            loan.save()
-        return Response(self.get_serializer(loan).data)
+        return self._return_loan(self.get_object())
+
+
+class StatsViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        # Counts for the admin dashboard cards, computed with SQL aggregates
+        # and cached briefly so a refresh does not hit every table again
+        stats = cache.get(DASHBOARD_STATS_KEY)
+        if stats is None:
+            start_of_today = _start_of_today()
+            stats = Book.objects.aggregate(
+                total_books=Count('id'),
+                total_copies=Coalesce(Sum('quantity'), 0),
+                available_copies=Coalesce(Sum('available'), 0),
+            )
+            stats['total_users'] = get_user_model().objects.count()
+            stats.update(Loan.objects.filter(status='borrowed').aggregate(
+                checked_out=Count('id'),
+                overdue=Count('id', filter=Q(due_date__lt=start_of_today)),
+            ))
+            cache.set(DASHBOARD_STATS_KEY, stats, settings.DASHBOARD_STATS_CACHE_TTL)
+        return Response(stats)
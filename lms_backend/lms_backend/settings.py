@@ -22,6 +22,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it compresses the finished response (when the client sends
+    # Accept-Encoding: gzip, as requests does)
+    'django.middleware.gzip.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +76,58 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Seconds the admin dashboard counters (/api/stats/dashboard/) are cached for.
+# A write clears them only in the process that served it (see CACHES), so with
+# several server processes this is how stale the other processes' counters get
+DASHBOARD_STATS_CACHE_TTL = int(os.environ.get('LMS_DASHBOARD_STATS_CACHE_TTL', 30))
+
+# Recommendations (core.recommendations): neighbours kept per book, and the
+# age in seconds after which the in-memory models are rebuilt in the background
+RECOMMENDATIONS_NEIGHBOURS = int(os.environ.get('LMS_RECOMMENDATIONS_NEIGHBOURS', 50))
+RECOMMENDATIONS_MAX_AGE = int(os.environ.get('LMS_RECOMMENDATIONS_MAX_AGE', 24 * 3600))
+# Update the item-item model as loans are created instead of waiting for the
+# next rebuild; keeps the co-borrow count table in memory (8 bytes per pair)
+RECOMMENDATIONS_INCREMENTAL = os.environ.get('LMS_RECOMMENDATIONS_INCREMENTAL', '1') == '1'
+# Item-item lists written by `manage.py build_recommendations`; while this file
+# exists the web processes memory-map it instead of fitting the model, and
+# reload it when a new build replaces it (new loans then wait for that build).
+# Each build is written to a new item_neighbours.bin.<version> file that this
+# path is then pointed at, so a mapped file is never written over. Do not
+# share it between the workers of several hosts (e.g. on a network share):
+# build it on each host, one build at a time
+RECOMMENDATIONS_MODEL_FILE = os.environ.get('LMS_RECOMMENDATIONS_MODEL_FILE', str(BASE_DIR / 'item_neighbours.bin'))
+# Readers with at least this many distinct books get their "recommended for
+# you" candidates from the ALS factor model (core.recommendations.als) before
+# the item-item ones; 0 leaves it off and the model is never fitted
+RECOMMENDATIONS_ALS_MIN_HISTORY = int(os.environ.get('LMS_RECOMMENDATIONS_ALS_MIN_HISTORY', 0))
+# ALS book factors written by `manage.py build_recommendations --als`; while
+# this file exists the web processes memory-map it instead of fitting the
+# model. Versioned and built per host like RECOMMENDATIONS_MODEL_FILE
+RECOMMENDATIONS_ALS_FILE = os.environ.get('LMS_RECOMMENDATIONS_ALS_FILE', str(BASE_DIR / 'als_factors.bin'))
+# Approximate nearest-neighbour index of the catalog text written by
+# `manage.py build_recommendations --content-index`; while this file exists
+# the web processes search it for similar books instead of fitting the
+# TF-IDF model (edited books then wait for the next build)
+RECOMMENDATIONS_CONTENT_INDEX_FILE = os.environ.get(
+    'LMS_RECOMMENDATIONS_CONTENT_INDEX_FILE', str(BASE_DIR / 'content_index.bin'),
+)
+# Seconds a user's "recommended for you" candidates stay cached; a loan
+# checked out or returned by that user drops them sooner, but only in the
+# process that served it, so other processes can serve them this long (see CACHES)
+RECOMMENDATIONS_CACHE_TTL = int(os.environ.get('LMS_RECOMMENDATIONS_CACHE_TTL', 3600))
+
+# Process-local cache (dashboard counters, per-user recommendations); the
+# least recently used entries are dropped past MAX_ENTRIES. Deleting a key
+# only reaches this process, so with several server processes the TTLs above
+# bound staleness; point 'default' at a shared backend (e.g. Redis or
+# Memcached) to make invalidation reach every process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('LMS_CACHE_MAX_ENTRIES', 10000))},
+    }
+}
+
 # DRF & JWT config
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -81,4 +136,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # JSON unless the client asks for columnar JSON (Accept or ?format=columnar)
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'core.renderers.ColumnarJSONRenderer',
+    ),
 }
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
-from core.views import BookViewSet, UserViewSet, LoanViewSet
+from core.views import BookViewSet, UserViewSet, LoanViewSet, StatsViewSet
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -11,6 +11,7 @@ router = routers.DefaultRouter()
 router.register(r'books', BookViewSet, basename='book')
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'loans', LoanViewSet, basename='loan')
+router.register(r'stats', StatsViewSet, basename='stats')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
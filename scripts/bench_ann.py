@@ -0,0 +1,148 @@
+"""
+Benchmark the IVF nearest-neighbour index (core.recommendations.ann) against
+brute force: recall@10 and per-query latency for a range of ``n_probe``.
+
+Two kinds of book vectors:
+
+* ``--source synthetic`` (default): ``--vectors`` random vectors (1M by
+  default) scattered (``--noise``) around a few thousand topics, standing in
+  for a catalog of millions of titles;
+* ``--source content``: the content model's TF-IDF vectors, reduced to
+  ``--dim`` dimensions by ``ContentModel.embed()``, on the scratch database of
+  bench_content_similarity.py (``--reuse`` it if already seeded).
+
+The index is saved next to the database and loaded back as a memory map, as
+a server process would open it. Queries are books from the index itself; the
+exact top-k (brute force over the float32 vectors) is the reference for both
+storage types. Many books can have the same vector (same author, category
+and title words), so a result counts as found when its exact score reaches
+the k-th exact score, whichever of the tied books it is.
+
+Usage:
+    python scripts/bench_ann.py [--source synthetic|content] [--vectors 1000000] [--noise 1.2] [--dim 64]
+                                [--lists N] [--queries 500] [--books 500000] [--reuse]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import benchdb
+
+PROBES = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def synthetic_vectors(n, dim, noise, rng):
+    topics = rng.standard_normal((max(n // 500, 1), dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        stop = min(start + 100_000, n)
+        vectors[start:stop] = topics[rng.integers(0, len(topics), stop - start)]
+        vectors[start:stop] += noise * rng.standard_normal((stop - start, dim), dtype=np.float32)
+    return np.arange(1, n + 1), vectors
+
+
+def content_vectors(args):
+    reuse = args.reuse and os.path.exists(args.db)
+    benchdb.setup_django(args.db, fresh=not reuse)
+    if not reuse:
+        print(f"Seeding {args.books:,} books into {args.db} ...")
+        benchdb.seed_books(args.books, random.Random(0))
+    from core.recommendations.store import build_content_model
+
+    start = time.perf_counter()
+    model = build_content_model()
+    print(f"fitted the content model in {time.perf_counter() - start:.0f}s")
+    start = time.perf_counter()
+    ids, vectors = model.embed(args.dim)
+    print(f"embedded {len(ids):,} books in {time.perf_counter() - start:.1f}s")
+    return ids, vectors
+
+
+def recall(found, exact_scores, queries, ids, vectors):
+    """Share of the results scoring at least the exact k-th score (ties count as found)."""
+    order = np.argsort(ids)
+    rows = order[np.searchsorted(ids, found, sorter=order)]
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    scores = np.einsum('qkd,qd->qk', unit[rows], queries)
+    return float(np.mean((scores >= exact_scores[:, -1:] - 1e-5) & (found >= 0)))
+
+
+def timed_search(search, queries, k, **options):
+    results, samples = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query[None], k, **options))
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.concatenate([i for i, _ in results]), np.concatenate([s for _, s in results]), samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', choices=('synthetic', 'content'), default='synthetic')
+    parser.add_argument('--vectors', type=int, default=1_000_000, help='synthetic vectors')
+    parser.add_argument('--noise', type=float, default=1.2, help='spread of synthetic vectors around their topic')
+    parser.add_argument('--dim', type=int, default=64)
+    parser.add_argument('--lists', type=int, default=None, help='IVF lists (default: sqrt of the vectors)')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--books', type=int, default=500_000, help='books to seed for --source content')
+    parser.add_argument('--reuse', action='store_true', help='keep an already seeded database')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_content.sqlite3'))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.source == 'content':
+        ids, vectors = content_vectors(args)
+    else:
+        import django
+        django.setup()
+        start = time.perf_counter()
+        ids, vectors = synthetic_vectors(args.vectors, args.dim, args.noise, rng)
+        print(f"generated {len(ids):,} x {args.dim} vectors in {time.perf_counter() - start:.1f}s")
+    from core.recommendations.ann import IVFIndex
+    from core.recommendations.arrayfile import remove_arrays
+
+    queries = vectors[rng.choice(len(ids), min(args.queries, len(ids)), replace=False)]
+
+    path = os.path.splitext(args.db)[0] + '.ivf' if args.source == 'content' else \
+        os.path.join(tempfile.gettempdir(), 'lms_bench_ann.ivf')
+    exact = None
+    for dtype in ('float32', 'float16'):
+        start = time.perf_counter()
+        built = IVFIndex(n_lists=args.lists, dtype=dtype).fit(ids, vectors)
+        fitted = time.perf_counter() - start
+        size = built.save(path)
+        del built
+        start = time.perf_counter()
+        index = IVFIndex.load(path)
+        loaded = time.perf_counter() - start
+        print(f"\n{dtype}: built {len(index):,} vectors into {len(index.centroids):,} lists in {fitted:.1f}s, "
+              f"{size / 2**20:.0f} MiB file, loaded in {loaded * 1000:.2f} ms")
+
+        if exact is None:
+            _, exact, samples = timed_search(index.search_exact, queries, args.k)
+            print(f"  {'brute force':<14} recall@{args.k} 1.000  p50 {percentile(samples, 50):7.3f} ms  "
+                  f"p99 {percentile(samples, 99):7.3f} ms")
+        for n_probe in PROBES:
+            if n_probe > len(index.centroids):
+                break
+            found, _, samples = timed_search(index.search, queries, args.k, n_probe=n_probe)
+            print(f"  n_probe={n_probe:<6} recall@{args.k} {recall(found, exact, queries, ids, vectors):.3f}  p50 {percentile(samples, 50):7.3f} ms  "
+                  f"p99 {percentile(samples, 99):7.3f} ms")
+    remove_arrays(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
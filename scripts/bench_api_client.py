@@ -0,0 +1,197 @@
+"""
+Benchmark the frontend API client: pooled keep-alive session and dashboard fan-out.
+
+Serves the backend from a scratch database on a local port (Django's
+threaded development server, in this process), then:
+
+1. times sequential ``get_book()`` calls with a new connection per call, as
+   ``requests.get`` does (how api_client worked before the shared session),
+   and through ``api_client.get_book()``, which reuses pooled connections.
+   The server counts the TCP connections it accepts, so the output shows
+   both the round-trip time saved and where it comes from;
+2. times a cold load of the student and admin dashboards (no cached
+   responses) with their requests made one after another, and all at once
+   through ``api_client.aio.gather``. The server adds ``--latency`` ms to
+   every response, standing in for a backend across a network; on
+   loopback the requests only compete for the same CPU.
+
+Usage:
+    python scripts/bench_api_client.py [--calls 1000] [--books 1000] [--latency 50] [--loads 20]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import benchdb
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'LMSFINAL'))
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def serve(latency=None):
+    """Start the backend on a free local port; returns ``(server, accepted connections counter)``.
+
+    :param latency: one-element list; while ``latency[0]`` is set, every
+        response is delayed by that many seconds.
+    """
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    accepted = [0]
+    latency = latency or [0]
+    handler = WSGIHandler()
+
+    def app(environ, start_response):
+        if latency[0]:
+            time.sleep(latency[0])
+        return handler(environ, start_response)
+
+    class CountingServer(ThreadedWSGIServer):
+        def get_request(self):
+            accepted[0] += 1
+            sock, address = super().get_request()
+            # The development server writes the headers and the body of a
+            # response separately; on a kept-alive connection Nagle's
+            # algorithm then holds the body until the client's delayed ACK
+            # (~40 ms). Production servers disable it, and so does this one.
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return sock, address
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = CountingServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, accepted
+
+
+def report(name, samples, connections):
+    total = sum(samples) / 1000
+    print(f"{name:<28} {total:6.2f}s  p50 {percentile(samples, 50):.2f} ms  p95 {percentile(samples, 95):.2f} ms  "
+          f"p99 {percentile(samples, 99):.2f} ms  {connections:,} connections")
+
+
+def cold_loads(api_client, ways, loads):
+    """Time ``loads`` cold loads of a screen each way; ``{way: [ms per load]}``."""
+    timings = {}
+    for way, load in ways.items():
+        samples = []
+        for _ in range(loads):
+            api_client._responses.clear()  # cold: nothing to revalidate
+            start = time.perf_counter()
+            results = load()
+            samples.append((time.perf_counter() - start) * 1000)
+            if isinstance(results, dict):
+                failed = [r for r in results.values() if isinstance(r, Exception)]
+                assert not failed, failed
+        timings[way] = samples
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=50, help='ms added to each response in part 2')
+    parser.add_argument('--loads', type=int, default=20, help='cold loads per dashboard in part 2')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_api_client.sqlite3'))
+    args = parser.parse_args()
+
+    benchdb.setup_django(args.db)
+    benchdb.seed(args.books, 200, 20 * args.books)
+
+    import requests
+    import api_client
+    from django.contrib.auth import get_user_model
+    from core.models import Book
+
+    password = 'bench-password'
+    get_user_model().objects.create_user('bench', 'bench@example.com', password, is_staff=True)
+    reader = get_user_model().objects.filter(loan__status='borrowed').first()
+    reader.set_password(password)
+    reader.save()
+    book_ids = list(Book.objects.values_list('id', flat=True))
+    targets = [book_ids[i % len(book_ids)] for i in range(args.calls)]
+
+    latency = [0]
+    server, accepted = serve(latency)
+    api_client.API_BASE = f"http://127.0.0.1:{server.server_address[1]}/api"
+    api_client.login('bench', password)
+    api_client.close()
+
+    def per_call_connection(book_id):
+        r = requests.get(f"{api_client.API_BASE}/books/{book_id}/", headers=api_client._headers(), timeout=10)
+        r.raise_for_status()
+        return r.json()
+
+    print(f"{args.calls:,} sequential get_book() calls against {api_client.API_BASE}")
+    results = {}
+    for name, get in (('new connection per call', per_call_connection), ('pooled session', api_client.get_book)):
+        get(targets[0])  # warm up Django's URL resolver and the first connection
+        accepted[0] = 0
+        samples = []
+        for book_id in targets:
+            start = time.perf_counter()
+            get(book_id)
+            samples.append((time.perf_counter() - start) * 1000)
+        report(name, samples, accepted[0])
+        results[name] = sum(samples)
+
+    saved = results['new connection per call'] - results['pooled session']
+    print(f"pooled session saves {saved / args.calls:.2f} ms per call "
+          f"({saved / results['new connection per call']:.0%})")
+
+    # Part 2: the student dashboard as a reader who has loans and
+    # recommendations, the admin dashboard as staff
+    from api_client import aio
+    student = {
+        'sequential': lambda: (
+            api_client.get_my_summary(),
+            api_client.get_my_loans(status='borrowed'),
+            api_client.get_my_recommendations(k=5),
+        ),
+        'aio.gather': lambda: asyncio.run(aio.gather(
+            summary=aio.get_my_summary(),
+            loans=aio.get_my_loans(status='borrowed'),
+            recommendations=aio.get_my_recommendations(k=5),
+        )),
+    }
+    admin = {
+        'sequential': lambda: (
+            api_client.get_dashboard_stats(),
+            next(api_client.iter_loans(page_size=10), []),
+        ),
+        'aio.gather': lambda: asyncio.run(aio.gather(
+            stats=aio.get_dashboard_stats(),
+            loans=aio.first_page(aio.iter_loans(page_size=10)),
+        )),
+    }
+    staff_token = api_client._token
+    api_client.login(reader.username, password)
+    api_client.get_my_recommendations()  # builds the recommendation model once
+    latency[0] = args.latency / 1000
+    print(f"\ncold dashboard loads, {args.latency:g} ms added to every response")
+    for screen, ways in (('student dashboard', student), ('admin dashboard', admin)):
+        if screen == 'admin dashboard':
+            api_client.set_token(staff_token)
+        for way, samples in cold_loads(api_client, ways, args.loads).items():
+            print(f"{screen + ', ' + way:<32} p50 {percentile(samples, 50):7.1f} ms")
+    api_client.close()
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark loan list payloads: plain vs columnar JSON, with and without gzip.
+
+Serves the backend from a scratch database on a local port (as
+bench_api_client.py does), then pages through every loan with
+``/api/loans/?page_size=1000`` four ways: JSON or columnar JSON
+(``Accept: application/vnd.lms.columnar+json``), each uncompressed or
+gzipped. For each it reports the response bytes on the wire, the time to
+fetch all pages, and the client time to turn the bodies into lists of
+dicts (gunzip + ``api_client._decode``), and checks that all four give
+the same loans.
+
+Usage:
+    python scripts/bench_api_payloads.py [--loans 100000] [--books 2000] [--users 1000]
+"""
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import benchdb
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'LMSFINAL'))
+
+PAGE_SIZE = 1000
+
+
+def fetch_all(session, url, headers):
+    """Every page of ``url`` as sent: ``[(content type, content encoding, body bytes)]``."""
+    import api_client
+
+    pages = []
+    while url:
+        r = session.get(url, headers=headers, stream=True, timeout=60)
+        body = r.raw.read(decode_content=False)
+        r.raise_for_status()
+        encoding = r.headers.get('Content-Encoding', '')
+        content_type = r.headers['Content-Type']
+        pages.append((content_type, encoding, body))
+        page = api_client._decode(gzip.decompress(body) if encoding == 'gzip' else body, content_type)
+        url = page['next']
+    return pages
+
+
+def parse_all(pages):
+    import api_client
+
+    loans = []
+    for content_type, encoding, body in pages:
+        if encoding == 'gzip':
+            body = gzip.decompress(body)
+        loans.extend(api_client._decode(body, content_type)['results'])
+    return loans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loans', type=int, default=100_000)
+    parser.add_argument('--books', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5, help='parse runs per format; the best is reported')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_api_payloads.sqlite3'))
+    args = parser.parse_args()
+
+    benchdb.setup_django(args.db)
+    benchdb.seed(args.books, args.users, args.loans)
+
+    import api_client
+    from bench_api_client import serve
+    from django.contrib.auth import get_user_model
+
+    password = 'bench-password'
+    get_user_model().objects.create_user('bench', 'bench@example.com', password, is_staff=True)
+    server, _ = serve()
+    api_client.API_BASE = f"http://127.0.0.1:{server.server_address[1]}/api"
+    api_client.login('bench', password)
+    session = api_client._get_session()
+    url = f"{api_client.API_BASE}/loans/?page_size={PAGE_SIZE}"
+    ways = {
+        'json': ('application/json', 'identity'),
+        'json + gzip': ('application/json', 'gzip'),
+        'columnar': (api_client.COLUMNAR_JSON, 'identity'),
+        'columnar + gzip': (api_client.COLUMNAR_JSON, 'gzip'),
+    }
+
+    print(f"{args.loans:,} loans, {PAGE_SIZE} per page, from {api_client.API_BASE}")
+    print(f"{'':<18} {'bytes':>13} {'vs json':>8} {'fetch':>8} {'parse':>9}")
+    expected = baseline = None
+    for name, (accept, encoding) in ways.items():
+        headers = dict(api_client._headers(), **{'Accept': accept, 'Accept-Encoding': encoding})
+        start = time.perf_counter()
+        pages = fetch_all(session, url, headers)
+        fetch = time.perf_counter() - start
+        size = sum(len(body) for _, _, body in pages)
+        baseline = baseline or size
+
+        parse = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            loans = parse_all(pages)
+            parse = min(parse, time.perf_counter() - start)
+        expected = expected or loans
+        assert loans == expected, f"{name} decodes to different loans"
+        print(f"{name:<18} {size:>13,} {size / baseline:>8.1%} {fetch:>7.2f}s {parse * 1000:>7.0f}ms")
+
+    api_client.close()
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
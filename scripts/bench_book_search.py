@@ -0,0 +1,90 @@
+"""
+Benchmark ranked FTS5 catalog search against the old icontains matching.
+
+For each catalog size a scratch SQLite database is seeded with synthetic
+books and a fixed set of queries is run through both paths, top 20 results
+each. icontains is given the same per-word AND semantics as ?search=.
+
+Usage:
+    python scripts/bench_book_search.py [--sizes 100000 1000000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import benchdb
+
+LIMIT = 20
+
+
+def icontains_ids(text, limit=LIMIT):
+    from django.db.models import Q
+    from core.models import Book
+
+    queryset = Book.objects.all()
+    for word in text.split():
+        queryset = queryset.filter(
+            Q(title__icontains=word) | Q(author__icontains=word)
+            | Q(category__icontains=word) | Q(description__icontains=word)
+        )
+    return list(queryset.values_list('id', flat=True)[:limit])
+
+
+def fts_ids(text, limit=LIMIT):
+    from core.search import search_book_ids
+    return search_book_ids(text, limit)
+
+
+def timed(func, text, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_search.sqlite3'))
+    args = parser.parse_args()
+
+    benchdb.setup_django(args.db)
+    rng = random.Random(0)
+    seeded = 0
+    for size in sorted(args.sizes):
+        print(f"\n=== {size:,} books ===")
+        start = time.perf_counter()
+        # Sizes only grow, so each round just adds the missing books
+        benchdb.seed_books(size - seeded, rng, start=seeded)
+        seeded = size
+        print(f"seeded (incl. FTS triggers) in {time.perf_counter() - start:.1f}s")
+
+        queries = {
+            'very common word': benchdb.VOCABULARY[0],
+            'common word': benchdb.VOCABULARY[20],
+            'mid-frequency': benchdb.VOCABULARY[400],
+            'prefix': benchdb.VOCABULARY[400][:3],
+            'two words': f"{benchdb.VOCABULARY[20]} {benchdb.VOCABULARY[400]}",
+            'rare (one title)': str(size - 7),
+            'no match': 'zzyzx',
+        }
+        print(f"{'query':<18} {'icontains p50/p95 ms':>22} {'fts5 p50/p95 ms':>18} {'speedup':>8}")
+        for label, text in queries.items():
+            ic50, ic95 = timed(icontains_ids, text, args.repeat)
+            ft50, ft95 = timed(fts_ids, text, args.repeat)
+            speedup = ic50 / ft50 if ft50 else float('inf')
+            print(f"{label:<18} {ic50:>10.2f} / {ic95:<9.2f} {ft50:>7.2f} / {ft95:<8.2f} {speedup:>7.1f}x")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Concurrent checkout stress test.
+
+Hundreds of borrowers, each on its own thread and database connection, race
+through POST /api/loans/ for a handful of books with only a few copies each.
+Afterwards every book must satisfy ``available >= 0`` and
+``quantity - available == open loans``, and the number of successful
+checkouts must equal the number of copies: anything above is an oversell.
+Half of the winners then return their copies concurrently (each return
+submitted twice) to check that returns cannot inflate availability either.
+
+Usage:
+    python scripts/bench_concurrent_checkout.py [--borrowers 400] [--books 5] [--copies 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import benchdb
+
+
+def _client(user):
+    from rest_framework.test import APIClient
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def _race(jobs, threads):
+    """Run ``jobs`` (callables) on ``threads`` threads released together.
+
+    Returns (results, per-request latencies in ms, wall time in s).
+    """
+    from django.db import connection
+
+    barrier = threading.Barrier(min(threads, len(jobs)))
+
+    def run(job):
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        start = time.perf_counter()
+        try:
+            result = job()
+        except Exception as exc:
+            # e.g. "database is locked" when writers deadlock
+            result = type(exc).__name__
+        finally:
+            connection.close()
+        return result, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(run, jobs))
+    wall = time.perf_counter() - start
+    return [result for result, _ in outcomes], [ms for _, ms in outcomes], wall
+
+
+def _report(label, codes, latencies, wall):
+    latencies = sorted(latencies)
+    counts = {code: codes.count(code) for code in sorted(set(codes), key=str)}
+    print(f"{label}: {len(codes)} requests in {wall:.2f}s = {len(codes) / wall:.0f} req/s, "
+          f"p50 {statistics.median(latencies):.1f} ms, p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, "
+          f"status codes {counts}")
+
+
+def check_books(book_ids):
+    """Return a list of invariant violations for the given books."""
+    from django.db.models import Count, Q
+    from core.models import Book
+
+    problems = []
+    books = Book.objects.filter(pk__in=book_ids).annotate(
+        open_loans=Count('loan', filter=Q(loan__status='borrowed'))
+    )
+    for book in books:
+        if book.available < 0:
+            problems.append(f"book {book.pk}: available is {book.available}")
+        if book.quantity - book.available != book.open_loans:
+            problems.append(
+                f"book {book.pk}: {book.open_loans} open loans but "
+                f"{book.quantity - book.available} copies out"
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--borrowers', type=int, default=400)
+    parser.add_argument('--books', type=int, default=5)
+    parser.add_argument('--copies', type=int, default=20, help='copies of each contested book')
+    parser.add_argument('--threads', type=int, default=None, help='default: one per borrower')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_checkout.sqlite3'))
+    args = parser.parse_args()
+    threads = args.threads or args.borrowers
+
+    benchdb.setup_django(args.db)
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from core.models import Book, Loan
+
+    User = get_user_model()
+    user_ids = benchdb.seed_users(args.borrowers)
+    users = list(User.objects.filter(pk__in=user_ids))
+    book_ids = [
+        Book.objects.create(
+            title=f"Contested {i}", author='Bench', isbn=f"979-{i:010d}", category='Fiction',
+            quantity=args.copies, available=args.copies,
+        ).pk
+        for i in range(args.books)
+    ]
+    connection.close()
+
+    rng = random.Random(0)
+    print(f"{args.borrowers} borrowers on {threads} threads, {args.books} books x {args.copies} copies")
+
+    def borrow(user, book_id):
+        return lambda: _client(user).post('/api/loans/', {'book': book_id}, format='json').status_code
+
+    codes, latencies, wall = _race([borrow(u, rng.choice(book_ids)) for u in users], threads)
+    _report('checkout', codes, latencies, wall)
+    wins = codes.count(201)
+    oversell = max(0, wins - args.books * args.copies)
+
+    # Return half of the open loans, every return sent twice at once
+    loans = list(Loan.objects.filter(book_id__in=book_ids, status='borrowed').select_related('user'))
+    returning = loans[: len(loans) // 2]
+    connection.close()
+
+    def give_back(loan):
+        return lambda: _client(loan.user).post(f'/api/loans/{loan.pk}/return/').status_code
+
+    codes, latencies, wall = _race([give_back(loan) for loan in returning for _ in range(2)], threads)
+    _report('return (x2)', codes, latencies, wall)
+
+    problems = check_books(book_ids)
+    print(f"\nsuccessful checkouts: {wins} of {args.books * args.copies} copies, oversell: {oversell}")
+    print(f"successful returns: {codes.count(200)} of {len(returning)} loans")
+    for problem in problems:
+        print(f"  {problem}")
+    errors = sum(1 for code in codes if not isinstance(code, int))
+    if oversell or problems or errors or codes.count(200) != len(returning):
+        print("❌ availability invariant broken")
+        return 1
+    print("✅ no oversell, availability matches open loans")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
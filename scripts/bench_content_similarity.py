@@ -0,0 +1,109 @@
+"""
+Benchmark the content-based (TF-IDF) similarity model.
+
+Seeds a scratch SQLite database with synthetic books (500k by default), builds
+the model from it and reports build time and peak memory, then measures what a
+book save costs through the API (PATCH /api/books/{id}/ re-indexes that one
+book) and the latency of GET /api/books/{id}/similar/?source=content.
+
+Usage:
+    python scripts/bench_content_similarity.py [--books 500000] [--edits 200] [--requests 2000] [--reuse]
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import benchdb
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=500_000)
+    parser.add_argument('--edits', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--reuse', action='store_true', help='keep an already seeded database')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_content.sqlite3'))
+    args = parser.parse_args()
+
+    reuse = args.reuse and os.path.exists(args.db)
+    benchdb.setup_django(args.db, fresh=not reuse)
+    if not reuse:
+        print(f"Seeding {args.books:,} books into {args.db} ...")
+        start = time.perf_counter()
+        benchdb.seed_books(args.books, random.Random(0))
+        print(f"seeded in {time.perf_counter() - start:.0f}s")
+
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+    from core.models import Book
+    from core.recommendations import content_model
+    from core.recommendations.store import build_content_model
+
+    before = peak_rss_mib()
+    start = time.perf_counter()
+    model = build_content_model()
+    built = time.perf_counter() - start
+    content_model.set(model)
+    filled = (model.neighbors >= 0).sum(axis=1).mean()
+    print(f"built {len(model.book_ids):,} books in {built:.1f}s, peak RSS {peak_rss_mib():.0f} MiB "
+          f"(+{peak_rss_mib() - before:.0f} MiB), {len(model.vocabulary):,} terms, "
+          f"{filled:.1f}/{model.k} neighbours per book")
+
+    User = get_user_model()
+    admin = User.objects.filter(username='bench-admin').first() or User.objects.create_user(
+        'bench-admin', 'bench-admin@example.com', 'x', is_staff=True,
+    )
+    client = APIClient()
+    client.force_authenticate(admin)
+    rng = random.Random(1)
+    book_ids = list(Book.objects.values_list('id', flat=True))
+
+    edits = []
+    for _ in range(args.edits):
+        book_id = rng.choice(book_ids)
+        payload = {'description': 'A book about ' + ' '.join(benchdb._word(rng) for _ in range(12))}
+        start = time.perf_counter()
+        response = client.patch(f'/api/books/{book_id}/', payload, format='json')
+        edits.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+    start = time.perf_counter()
+    model.update(book_ids[0], 'River Shadow', 'Ana Reyes', 'Fiction', 'A book about rivers')
+    print(f"PATCH /books/{{id}}/  p50 {percentile(edits, 50):.1f} ms  p99 {percentile(edits, 99):.1f} ms "
+          f"(model.update alone {(time.perf_counter() - start) * 1000:.1f} ms)")
+
+    targets = [rng.choice(book_ids) for _ in range(args.requests)]
+    for book_id in targets[:50]:  # warm up
+        client.get(f'/api/books/{book_id}/similar/', {'source': 'content'})
+    requests = []
+    for book_id in targets:
+        start = time.perf_counter()
+        response = client.get(f'/api/books/{book_id}/similar/', {'source': 'content'})
+        requests.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+    print(f"/similar/?source=content (k=10)  p50 {percentile(requests, 50):.2f} ms  "
+          f"p99 {percentile(requests, 99):.2f} ms")
+
+    sample = Book.objects.get(pk=targets[0])
+    print(f"\nexample: {sample.title!r} ({sample.category}) ->")
+    for neighbour, score in model.similar(sample.pk, 5):
+        other = Book.objects.get(pk=neighbour)
+        print(f"  {score:.3f}  {other.title!r} ({other.category}) by {other.author}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
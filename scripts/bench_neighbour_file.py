@@ -0,0 +1,172 @@
+"""
+Benchmark the offline item-item build (``manage.py build_recommendations``)
+against fitting the model inside each web process.
+
+Seeds (or reuses) the same scratch database as bench_recommendations.py,
+then reports:
+
+1. the in-process fit: time and memory every web worker would pay at startup;
+2. the sharded build over ``--workers`` processes and the file size;
+3. opening the file (``numpy.memmap``) and the first /similar/ request;
+4. that the file serves the same lists (scores are stored as float16);
+5. /similar/ latency from the file vs from the in-memory model;
+6. memory of ``--processes`` processes that map the file and read all of it:
+   resident (RSS) vs proportional (PSS) size, showing one shared page-cached copy.
+
+Usage:
+    python scripts/bench_neighbour_file.py [--books 100000] [--users 50000] [--loans 5000000]
+                                           [--workers 4] [--processes 4] [--requests 2000] [--reuse]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import benchdb
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def mapping_memory_mib(path):
+    """``(rss, pss)`` in MiB of this process's mappings of ``path``, from /proc (Linux only)."""
+    rss = pss = 0.0
+    with open('/proc/self/smaps') as f:
+        inside = False
+        for line in f:
+            fields = line.split()
+            if '-' in fields[0] and ':' not in fields[0]:  # a new mapping: "start-end perms ... pathname"
+                inside = fields[-1] == path
+            elif inside and fields[0] in ('Rss:', 'Pss:'):
+                if fields[0] == 'Rss:':
+                    rss += int(fields[1]) / 1024
+                else:
+                    pss += int(fields[1]) / 1024
+    return rss, pss
+
+
+def read_whole_file(path, barrier, results):
+    from core.recommendations import NeighbourFile
+    from core.recommendations.arrayfile import data_path
+
+    model = NeighbourFile(path)
+    # Touch every page, as a process serving requests for all books eventually would
+    for array in (model.book_ids, model.indptr, model.neighbors, model.scores):
+        array.sum()
+    barrier.wait()
+    results.put(mapping_memory_mib(data_path(path)))
+    barrier.wait()
+
+
+def request_latency(client, book_ids, k):
+    samples = []
+    for book_id in book_ids:
+        start = time.perf_counter()
+        response = client.get(f'/api/books/{book_id}/similar/', {'k': k})
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--loans', type=int, default=5_000_000)
+    parser.add_argument('--workers', type=int, default=4, help='build processes')
+    parser.add_argument('--processes', type=int, default=4, help='processes sharing the mapped file')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--reuse', action='store_true', help='keep an already seeded database')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_recommendations.sqlite3'))
+    args = parser.parse_args()
+
+    reuse = args.reuse and os.path.exists(args.db)
+    path = os.path.join(tempfile.gettempdir(), 'lms_bench_item_neighbours.bin')
+    os.environ['LMS_RECOMMENDATIONS_MODEL_FILE'] = path
+    benchdb.setup_django(args.db, fresh=not reuse)
+    if not reuse:
+        print(f"Seeding {args.books:,} books, {args.users:,} users, {args.loans:,} loans into {args.db} ...")
+        start = time.perf_counter()
+        benchdb.seed(args.books, args.users, args.loans)
+        print(f"seeded in {time.perf_counter() - start:.0f}s")
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from rest_framework.test import APIClient
+    from core.recommendations import CooccurrenceModel, NeighbourFile, item_model, loan_arrays
+    from core.recommendations.arrayfile import data_path, remove_arrays
+
+    remove_arrays(path)
+
+    user_ids, book_ids = loan_arrays()
+    before = peak_rss_mib()
+    start = time.perf_counter()
+    fitted = CooccurrenceModel(k=settings.RECOMMENDATIONS_NEIGHBOURS).fit(user_ids, book_ids)
+    print(f"in-process fit: {time.perf_counter() - start:.1f}s, peak RSS +{peak_rss_mib() - before:.0f} MiB, "
+          f"model {(fitted.neighbors.nbytes + fitted.scores.nbytes) / 2**20:.0f} MiB per process")
+    del user_ids, book_ids
+
+    start = time.perf_counter()
+    call_command('build_recommendations', workers=args.workers, stdout=open(os.devnull, 'w'))
+    print(f"build_recommendations --workers {args.workers}: {time.perf_counter() - start:.1f}s "
+          f"(including loading the loans), {os.path.getsize(data_path(path)) / 2**20:.1f} MiB file, {os.cpu_count()} CPUs")
+
+    rng = random.Random(0)
+    targets = [int(fitted.book_ids[rng.randrange(len(fitted.book_ids))]) for _ in range(args.requests)]
+    admin = get_user_model().objects.create_user(f'bench-{time.time_ns()}', 'bench@example.com', 'x', is_staff=True)
+    client = APIClient()
+    client.force_authenticate(admin)
+
+    item_model.clear()
+    start = time.perf_counter()
+    model = item_model.get()
+    opened = time.perf_counter() - start
+    first = request_latency(client, targets[:1], 10)[0]
+    assert isinstance(model, NeighbourFile)
+    print(f"startup: opened the file in {opened * 1000:.2f} ms, first /similar/ request {first:.2f} ms")
+
+    differ = 0
+    for book_id in fitted.book_ids.tolist():
+        got, want = model.similar(book_id, model.k), fitted.similar(book_id, fitted.k)
+        if len(got) != len(want) or not np.allclose([s for _, s in got], [s for _, s in want], rtol=1e-3):
+            differ += 1
+    print(f"{differ} of {len(fitted.book_ids):,} lists differ from the in-process fit beyond float16 rounding")
+
+    for name, served in (('file', model), ('in-memory', fitted)):
+        item_model.set(served)
+        request_latency(client, targets[:50], 10)  # warm up
+        samples = request_latency(client, targets, 10)
+        print(f"/similar/ from {name:<9} p50 {percentile(samples, 50):.2f} ms  p99 {percentile(samples, 99):.2f} ms")
+
+    if os.path.exists('/proc/self/smaps'):
+        barrier, results = multiprocessing.Barrier(args.processes), multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=read_whole_file, args=(path, barrier, results))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        sizes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        print(f"{args.processes} processes reading the whole file: "
+              f"RSS {sum(r for r, _ in sizes):.0f} MiB in total, PSS {sum(p for _, p in sizes):.0f} MiB "
+              f"(one shared page-cached copy of the {os.path.getsize(data_path(path)) / 2**20:.0f} MiB file)")
+    remove_arrays(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
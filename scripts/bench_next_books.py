@@ -0,0 +1,110 @@
+"""
+Benchmark the "what to read next" transition model and GET /api/books/{id}/next/.
+
+Seeds (or reuses) the same scratch database as bench_recommendations.py,
+then reports:
+
+1. the streaming rebuild (loans read in (reader, borrow date) order through
+   ``.iterator()``): time and peak memory, next to the memory of loading
+   every loan at once as the item-item model does;
+2. the effect of a tight ``--max-pairs`` on the lists served (books whose
+   top 10 changed);
+3. /next/ latency percentiles through the DRF test client.
+
+Usage:
+    python scripts/bench_next_books.py [--books 100000] [--users 50000] [--loans 5000000]
+                                       [--max-pairs 200000] [--requests 2000] [--reuse]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import benchdb
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def traced(fn):
+    """``(result, seconds, peak MiB allocated)`` of ``fn()``; NumPy reports its buffers to tracemalloc."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--loans', type=int, default=5_000_000)
+    parser.add_argument('--max-pairs', type=int, default=200_000, help='tight pair budget to compare with')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--reuse', action='store_true', help='keep an already seeded database')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_recommendations.sqlite3'))
+    args = parser.parse_args()
+
+    reuse = args.reuse and os.path.exists(args.db)
+    benchdb.setup_django(args.db, fresh=not reuse)
+    if not reuse:
+        print(f"Seeding {args.books:,} books, {args.users:,} users, {args.loans:,} loans into {args.db} ...")
+        start = time.perf_counter()
+        benchdb.seed(args.books, args.users, args.loans)
+        print(f"seeded in {time.perf_counter() - start:.0f}s")
+
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+    from core.models import Loan
+    from core.recommendations import TransitionModel, loan_arrays, sequence_model
+    from core.recommendations.store import FETCH_SIZE, build_sequence_model
+
+    def ordered_loans():
+        return Loan.objects.order_by('user_id', 'borrow_date', 'id').values_list('user_id', 'book_id') \
+            .iterator(chunk_size=FETCH_SIZE)
+
+    model, seconds, peak = traced(build_sequence_model)
+    print(f"streaming rebuild: {seconds:.1f}s, peak {peak:.0f} MiB, "
+          f"{len(model.book_ids):,} books with {len(model.next_ids):,} next books "
+          f"({(model.next_ids.nbytes + model.scores.nbytes + model.indptr.nbytes) / 2**20:.1f} MiB)")
+
+    start = time.perf_counter()
+    tight = TransitionModel(max_pairs=args.max_pairs, chunk_size=FETCH_SIZE).fit(ordered_loans())
+    changed = sum(
+        [n for n, _ in model.following(book_id, 10)] != [n for n, _ in tight.following(book_id, 10)]
+        for book_id in model.book_ids.tolist()
+    )
+    print(f"--max-pairs {args.max_pairs:,}: {time.perf_counter() - start:.1f}s, top 10 changed for "
+          f"{changed:,} of {len(model.book_ids):,} books")
+
+    (user_ids, book_ids), seconds, peak = traced(loan_arrays)
+    print(f"for comparison, loading all {len(book_ids):,} loans at once: {seconds:.1f}s, peak {peak:.0f} MiB")
+    del user_ids, book_ids
+
+    sequence_model.set(model)
+    rng = random.Random(0)
+    targets = [int(model.book_ids[rng.randrange(len(model.book_ids))]) for _ in range(args.requests)]
+    admin = get_user_model().objects.create_user(f'bench-{time.time_ns()}', 'bench@example.com', 'x', is_staff=True)
+    client = APIClient()
+    client.force_authenticate(admin)
+    samples = []
+    for book_id in targets:
+        start = time.perf_counter()
+        response = client.get(f'/api/books/{book_id}/next/', {'k': 10})
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+    print(f"/next/ p50 {percentile(samples, 50):.2f} ms  p95 {percentile(samples, 95):.2f} ms  "
+          f"p99 {percentile(samples, 99):.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
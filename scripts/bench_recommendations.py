@@ -0,0 +1,85 @@
+"""
+Benchmark the item-item recommendation model and GET /api/books/{id}/similar/.
+
+Seeds a scratch SQLite database (100k books, 5M loans by default), times
+loading the loans and fitting the model, then calls the endpoint for random
+borrowed books through the DRF test client and reports latency percentiles.
+
+Usage:
+    python scripts/bench_recommendations.py [--books 100000] [--users 50000] [--loans 5000000]
+                                            [--requests 2000] [--reuse]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import benchdb
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--loans', type=int, default=5_000_000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--reuse', action='store_true', help='keep an already seeded database')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_recommendations.sqlite3'))
+    args = parser.parse_args()
+
+    reuse = args.reuse and os.path.exists(args.db)
+    benchdb.setup_django(args.db, fresh=not reuse)
+    if not reuse:
+        print(f"Seeding {args.books:,} books, {args.users:,} users, {args.loans:,} loans into {args.db} ...")
+        start = time.perf_counter()
+        benchdb.seed(args.books, args.users, args.loans)
+        print(f"seeded in {time.perf_counter() - start:.0f}s")
+
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+    from core.recommendations import CooccurrenceModel, item_model, loan_arrays
+    from django.conf import settings
+
+    start = time.perf_counter()
+    user_ids, book_ids = loan_arrays()
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    model = CooccurrenceModel(k=settings.RECOMMENDATIONS_NEIGHBOURS).fit(user_ids, book_ids)
+    fitted = time.perf_counter() - start
+    item_model.set(model)
+    print(f"loaded {len(book_ids):,} loans in {loaded:.1f}s, fitted {len(model.book_ids):,} books in {fitted:.1f}s "
+          f"({(model.neighbors.nbytes + model.scores.nbytes) / 2**20:.0f} MiB)")
+
+    client = APIClient()
+    client.force_authenticate(get_user_model().objects.filter(is_staff=False).first())
+    rng = random.Random(1)
+    targets = [int(book_ids[rng.randrange(len(book_ids))]) for _ in range(args.requests)]
+
+    for book_id in targets[:50]:  # warm up
+        client.get(f'/api/books/{book_id}/similar/')
+    lookups, requests = [], []
+    for book_id in targets:
+        start = time.perf_counter()
+        model.similar(book_id, 10)
+        lookups.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        response = client.get(f'/api/books/{book_id}/similar/')
+        requests.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+
+    print(f"model lookup      p50 {percentile(lookups, 50):.3f} ms  p99 {percentile(lookups, 99):.3f} ms")
+    print(f"/similar/ (k=10)  p50 {percentile(requests, 50):.2f} ms  p99 {percentile(requests, 99):.2f} ms")
+    sample = targets[0]
+    print(f"\nexample: book {sample} -> {model.similar(sample, 5)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
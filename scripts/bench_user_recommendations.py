@@ -0,0 +1,99 @@
+"""
+Benchmark GET /api/users/me/recommendations/ and its per-user cache.
+
+Seeds a scratch SQLite database, builds the recommendation models, then
+replays a mix of student dashboard opens (each one fetches the
+recommendations) and loan events: every ``--event-every``-th action is a
+checkout or return by that student, which drops their cached candidates.
+Active students open the dashboard more often (Zipf-like). Reports the cache
+hit rate and latency percentiles for hits and misses.
+
+Usage:
+    python scripts/bench_user_recommendations.py [--books 20000] [--users 5000] [--loans 500000]
+                                                 [--opens 5000] [--event-every 10] [--reuse]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import benchdb
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=20_000)
+    parser.add_argument('--users', type=int, default=5_000)
+    parser.add_argument('--loans', type=int, default=500_000)
+    parser.add_argument('--opens', type=int, default=5000, help='dashboard opens to replay')
+    parser.add_argument('--event-every', type=int, default=10, help='one checkout/return per this many actions')
+    parser.add_argument('--reuse', action='store_true', help='keep an already seeded database')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_user_recommendations.sqlite3'))
+    args = parser.parse_args()
+
+    reuse = args.reuse and os.path.exists(args.db)
+    benchdb.setup_django(args.db, fresh=not reuse)
+    if not reuse:
+        print(f"Seeding {args.books:,} books, {args.users:,} users, {args.loans:,} loans into {args.db} ...")
+        start = time.perf_counter()
+        benchdb.seed(args.books, args.users, args.loans)
+        print(f"seeded in {time.perf_counter() - start:.0f}s")
+
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+    from core.models import Book, Loan
+    from core.recommendations import content_model, item_model
+    from core.recommendations.store import _user_key
+
+    start = time.perf_counter()
+    item_model.get()
+    content_model.get()
+    print(f"built the models in {time.perf_counter() - start:.1f}s")
+
+    students = list(get_user_model().objects.filter(is_staff=False).order_by('id'))
+    rng = random.Random(2)
+
+    def pick():
+        # log-uniform rank => a few students open the dashboard far more often
+        return students[int(len(students) ** rng.random()) - 1]
+
+    available = list(Book.objects.filter(available__gt=0).values_list('id', flat=True)[:50_000])
+    client = APIClient()
+
+    hits, misses, events = [], [], 0
+    for action in range(args.opens + args.opens // max(args.event_every - 1, 1)):
+        student = pick()
+        client.force_authenticate(student)
+        if action % args.event_every == args.event_every - 1:
+            loan = Loan.objects.filter(user=student, status='borrowed').order_by('id').first()
+            if loan is not None and rng.random() < 0.5:
+                response = client.post(f'/api/loans/{loan.pk}/return/')
+            else:
+                response = client.post('/api/loans/', {'book': rng.choice(available)}, format='json')
+            events += response.status_code in (200, 201)
+            continue
+        cached = cache.get(_user_key(student.pk)) is not None
+        start = time.perf_counter()
+        response = client.get('/api/users/me/recommendations/')
+        (hits if cached else misses).append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+
+    opens = hits + misses
+    print(f"{len(opens):,} dashboard opens, {events:,} checkouts/returns, "
+          f"cache hit rate {len(hits) / len(opens):.1%}")
+    for name, samples in (('all', opens), ('hits', hits), ('misses', misses)):
+        if samples:
+            print(f"  {name:<6} p50 {percentile(samples, 50):6.2f} ms  p99 {percentile(samples, 99):6.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
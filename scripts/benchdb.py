@@ -0,0 +1,192 @@
+"""
+Shared helpers for the benchmark and query-plan scripts.
+
+Points Django at a scratch SQLite database (never the development one) and
+fills it with synthetic books, users and loans shaped roughly like a
+university library: readers stick to a couple of favourite categories and a
+few titles in each category are far more popular than the rest.
+"""
+import os
+import sys
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lms_backend'))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms_backend.settings')
+
+CATEGORIES = [
+    'Fiction', 'Non-Fiction', 'Science', 'History', 'Memoir', 'Dystopian',
+    'Fantasy', 'Romance', 'Science Fiction', 'Political Fiction', 'Poetry', 'Biography',
+]
+
+_WORDS = (
+    'river shadow empire garden winter machine silent storm crown letter ocean '
+    'memory forest stone city glass fire harbor journey secret island mountain '
+    'light night star ghost kingdom war song voyage dream bridge tower wolf'
+).split()
+
+_SYLLABLES = 'ka lo mi ra ne sul tor vin da el fa gor hin ul ya zen bri cor'.split()
+
+# Titles and descriptions draw from a vocabulary of a few thousand words with
+# a Zipf-like frequency curve, so a few words are very common (like "river"
+# here) and most are rare, as in real catalog text.
+VOCABULARY = _WORDS + sorted({
+    a + b + c for a in _SYLLABLES for b in _SYLLABLES for c in _SYLLABLES
+} - set(_WORDS))[:5000]
+
+
+def _word(rng):
+    # log-uniform rank => P(rank r) roughly proportional to 1/r
+    return VOCABULARY[int(len(VOCABULARY) ** rng.random()) - 1]
+
+_FIRST_NAMES = 'Ana Ben Carla David Elena Felix Grace Hugo Iris Jonas Kira Leo Maya Noah Olga Paul'.split()
+_LAST_NAMES = 'Reyes Tolkien Austen Orwell Bradbury Lee Salinger Rowling Huxley Le-Guin Morrison Atwood'.split()
+
+# Loans are spread over this many days before "now"
+HISTORY_DAYS = 3 * 365
+
+BATCH_SIZE = 5000
+
+
+def setup_django(db_path, fresh=True):
+    """Configure Django against a scratch SQLite file and migrate it."""
+    if fresh and os.path.exists(db_path):
+        os.remove(db_path)
+
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+    # Benchmarks hammer the database from several threads
+    settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def _ts(value):
+    """Adapt an aware datetime the same way the ORM would for this backend."""
+    from django.db import connection
+    return connection.ops.adapt_datetimefield_value(value) if value is not None else None
+
+
+def _insert(cursor, table, columns, rows):
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(table, ', '.join(columns), ', '.join(['%s'] * len(columns)))
+    for start in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+
+
+def seed_books(n_books, rng, start=0):
+    """Insert ``n_books`` synthetic books and return (id, category) for all books.
+
+    :param start: number of the first book, so repeated calls never reuse a
+        title number or ISBN.
+    """
+    from django.db import connection, transaction
+    from core.models import Book
+
+    now = _ts(datetime.now(dt_timezone.utc))
+    rows = []
+    for i in range(start, start + n_books):
+        category = rng.choice(CATEGORIES)
+        title = ' '.join(_word(rng).capitalize() for _ in range(rng.randint(1, 4)))
+        author = f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}"
+        description = f"A {category.lower()} book about " + ' '.join(_word(rng) for _ in range(12))
+        quantity = rng.randint(1, 8)
+        rows.append((
+            f"{title} {i}", author, f"978-{i:010d}", category, quantity, quantity,
+            description, '', 0, now, now,
+        ))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _insert(cursor, Book._meta.db_table, [
+            'title', 'author', 'isbn', 'category', 'quantity', 'available',
+            'description', 'cover_url', 'borrow_count', 'created_at', 'updated_at',
+        ], rows)
+    return list(Book.objects.order_by('id').values_list('id', 'category'))
+
+
+def seed_users(n_users):
+    """Insert ``n_users`` synthetic readers and return their ids."""
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+
+    User = get_user_model()
+    now = _ts(datetime.now(dt_timezone.utc))
+    offset = User.objects.count()
+    rows = [
+        ('!', False, f"reader{offset + i}", '', '', f"reader{offset + i}@university.edu", False, True, now)
+        for i in range(n_users)
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        _insert(cursor, User._meta.db_table, [
+            'password', 'is_superuser', 'username', 'first_name', 'last_name',
+            'email', 'is_staff', 'is_active', 'date_joined',
+        ], rows)
+    return list(User.objects.filter(username__startswith='reader').order_by('id').values_list('id', flat=True))
+
+
+def seed_loans(n_loans, books, user_ids, rng, open_ratio=0.05):
+    """Insert ``n_loans`` loans in borrow-date order.
+
+    :param books: (id, category) pairs as returned by :func:`seed_books`.
+    :param open_ratio: share of the most recent loans left in 'borrowed' state.
+    """
+    from django.db import connection, transaction
+    from core.models import Loan
+
+    by_category = {}
+    for book_id, category in books:
+        by_category.setdefault(category, []).append(book_id)
+    all_ids = [book_id for book_id, _ in books]
+    favourites = {uid: rng.sample(CATEGORIES, 2) for uid in user_ids}
+
+    def pick(pool):
+        # Zipf-like skew: low positions in the pool are borrowed far more often
+        return pool[min(int(rng.paretovariate(1.2)) - 1, len(pool) - 1)]
+
+    now = datetime.now(dt_timezone.utc)
+    start = now - timedelta(days=HISTORY_DAYS)
+    step = timedelta(days=HISTORY_DAYS) / max(n_loans, 1)
+    first_open = int(n_loans * (1 - open_ratio))
+
+    columns = ['user_id', 'book_id', 'borrow_date', 'due_date', 'return_date', 'status', 'fine', 'updated_at']
+    rows = []
+    with connection.cursor() as cursor:
+        for i in range(n_loans):
+            user_id = rng.choice(user_ids)
+            if rng.random() < 0.8:
+                book_id = pick(by_category[rng.choice(favourites[user_id])])
+            else:
+                book_id = rng.choice(all_ids)
+            borrow_date = start + step * i
+            due_date = borrow_date + timedelta(days=14)
+            if i >= first_open:
+                rows.append((user_id, book_id, _ts(borrow_date), _ts(due_date), None, 'borrowed', 0, _ts(borrow_date)))
+            else:
+                return_date = borrow_date + timedelta(days=rng.randint(1, 21))
+                rows.append((user_id, book_id, _ts(borrow_date), _ts(due_date), _ts(return_date), 'returned', 0,
+                             _ts(return_date)))
+            # Insert as we go so millions of loans never sit in memory at once
+            if len(rows) >= 40 * BATCH_SIZE or i == n_loans - 1:
+                with transaction.atomic():
+                    _insert(cursor, Loan._meta.db_table, columns, rows)
+                rows = []
+
+
+def seed(n_books, n_users, n_loans, seed=0):
+    """Fill the scratch database and refresh the planner statistics."""
+    from django.db import connection
+    from core.models import Book, Loan
+    from core.popularity import recompute
+
+    rng = random.Random(seed)
+    books = seed_books(n_books, rng)
+    user_ids = seed_users(n_users)
+    seed_loans(n_loans, books, user_ids, rng)
+    # Raw inserts bypass the checkout path that keeps the borrow counters
+    recompute(Book, Loan)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
@@ -0,0 +1,67 @@
+"""
+Check, end to end, that the live item-item model matches a full rebuild.
+
+On a small seeded scratch database: build the live model, check out books
+through POST /api/loans/ and /api/loans/bulk/, then compare the live model
+with a fresh rebuild from the Loan table. The model-level comparison of
+``add_loan()`` against ``fit()`` runs with ``manage.py test``
+(core.tests.test_cooccurrence), which also says when lists match.
+
+Exits with status 1 on any mismatch.
+
+Usage:
+    python scripts/check_incremental_recommendations.py [--api-loans 300]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+
+import benchdb
+
+
+def check_api(n_books, n_users, n_loans, n_api_loans):
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+    from core.models import Book
+    from core.recommendations import item_model
+    from core.recommendations.store import build_item_model
+    from core.tests.test_cooccurrence import mismatches
+
+    benchdb.seed(n_books, n_users, n_loans)
+    live = item_model.get()
+    rng = random.Random(3)
+    students = list(get_user_model().objects.filter(is_staff=False))
+    staff = get_user_model().objects.create_user('check-staff', 'check-staff@example.com', 'x', is_staff=True)
+    books = list(Book.objects.filter(available__gt=0).values_list('id', flat=True))
+    client = APIClient()
+    created = 0
+    for _ in range(n_api_loans):
+        client.force_authenticate(rng.choice(students))
+        created += client.post('/api/loans/', {'book': rng.choice(books)}, format='json').status_code == 201
+    client.force_authenticate(staff)
+    items = [{'book': rng.choice(books), 'user': rng.choice(students).pk} for _ in range(n_api_loans // 2)]
+    created += client.post('/api/loans/bulk/', {'items': items}, format='json').data['succeeded']
+
+    bad = mismatches(live, build_item_model())
+    print(f"  {created} loans created through the API: {len(bad)} of {len(live.book_ids):,} lists differ")
+    return bool(bad)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--api-loans', type=int, default=300, help='loans created through the API')
+    args = parser.parse_args()
+
+    benchdb.setup_django(os.path.join(tempfile.gettempdir(), 'lms_check_incremental.sqlite3'), fresh=True)
+    logging.getLogger('django.request').setLevel(logging.ERROR)  # checkouts of a book with no copy left
+    print("API: live model vs rebuild")
+    failed = check_api(2000, 300, 20_000, args.api_loans)
+    print("FAILED" if failed else "OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
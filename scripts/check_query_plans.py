@@ -0,0 +1,69 @@
+"""
+Query-plan regression check for the circulation hot paths.
+
+Seeds a scratch SQLite database (1M loans by default), runs EXPLAIN QUERY
+PLAN on the querysets the API builds for its main filters, lookups and
+orderings, and exits non-zero if any of them falls back to a full table
+scan. Also checks that the book search index still follows the catalog after
+all migrations (its triggers exist, and a new, edited or deleted book is
+found or not).
+
+The checks live in core.query_plans; ``manage.py test`` runs the same ones
+against a small database (core.tests.test_query_plans). This script is for
+checking the plans at production-like volumes.
+
+Usage:
+    python scripts/check_query_plans.py [--loans 1000000] [--books 100000] [--users 20000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import benchdb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loans', type=int, default=1_000_000)
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_query_plans.sqlite3'))
+    args = parser.parse_args()
+
+    print(f"Seeding {args.books} books, {args.users} users, {args.loans} loans into {args.db} ...")
+    benchdb.setup_django(args.db)
+    benchdb.seed(args.books, args.users, args.loans)
+
+    from core.models import Loan
+    from core.query_plans import build_checks, check_search_index
+    loan = Loan.objects.select_related('book').order_by('-id').first()
+    sample = (loan.user_id, loan.book_id, loan.book.isbn, loan.book.category)
+
+    failures = 0
+    for name, queryset, pattern in build_checks(sample):
+        plan = queryset.explain()
+        scans = pattern.findall(plan)
+        status = 'FAIL' if scans else 'ok'
+        failures += bool(scans)
+        print(f"[{status:>4}] {name}")
+        for line in plan.splitlines():
+            print(f"         {line}")
+
+    index_failures = check_search_index()
+    print(f"[{'FAIL' if index_failures else 'ok':>4}] book search index follows the catalog")
+    for message in index_failures:
+        print(f"         {message}")
+
+    if failures:
+        print(f"\n❌ {failures} quer{'y' if failures == 1 else 'ies'} fell back to a full table scan")
+        return 1
+    if index_failures:
+        print("\n❌ The book search index is out of sync with the catalog")
+        return 1
+    print("\n✅ All hot queries use an index")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""
+Offline evaluation and latency benchmark for the book recommenders.
+
+Replays the loan history in time order and holds out each reader's last
+borrow. Every recommender is then fitted on the remaining loans and asked
+for ``--k`` books from the reader's earlier history. Readers whose last book
+was already in their earlier history are skipped, because recommenders
+never suggest those. Reported per recommender:
+
+* quality on ``--sample`` readers:
+  * ``precision@k``: held-out hits per suggested slot;
+  * ``recall@k``: share of readers whose held-out book was suggested;
+  * ``coverage``: share of the catalog suggested to at least one reader;
+  * ``diversity``: share of the book pairs in one list that have different categories;
+* serving latency of ``recommend()`` over ``--requests`` calls:
+  * single-threaded, then from ``--threads`` threads at once;
+  * p50/p95/p99 in ms and throughput in requests/s.
+
+Recommenders (``--recommenders``, comma separated; all by default):
+
+* ``popular``: most borrowed books, the baseline to beat;
+* ``item-item``: ``CooccurrenceModel`` fitted in process;
+* ``item-item-file``: the same lists from ``build_neighbour_file``, memory-mapped;
+* ``als``: ``ALSModel`` (implicit matrix factorisation), readers folded in per request;
+* ``content``: ``ContentModel`` (TF-IDF over the catalog text);
+* ``hybrid``: item-item first, topped up from content, as ``user_candidates()`` does.
+
+Results go to ``--output`` as JSON, with the commit they were measured at.
+``--compare`` prints them next to an earlier file to spot regressions.
+
+Usage:
+    python scripts/evaluate_recommenders.py [--books 20000] [--users 5000] [--loans 500000] [--reuse]
+                                            [--recommenders popular,item-item,...] [--k 10] [--sample 2000]
+                                            [--requests 2000] [--threads 8] [--workers N]
+                                            [--output recommender_eval.json]
+                                            [--compare previous.json]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+
+import benchdb
+
+METRICS = ('precision@k', 'recall@k', 'coverage', 'diversity')
+PERCENTILES = (50, 95, 99)
+
+# recall@k is also broken down by the length of the reader's history
+HISTORY_BUCKETS = ((1, 4), (5, 19), (20, 49), (50, None))
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def hold_out_last(user_ids, book_ids, weights):
+    """Split off every reader's last loan (the loans are in time order).
+
+    :returns: ``(train_users, train_books, train_weights, histories)``;
+        ``histories`` maps each evaluable reader to ``(earlier books, held-out book)``.
+    """
+    # Last occurrence of each user = first occurrence in the reversed order
+    users, last = np.unique(user_ids[::-1], return_index=True)
+    last = len(user_ids) - 1 - last
+    train = np.ones(len(user_ids), dtype=bool)
+    train[last] = False
+    train_users, train_books, train_weights = user_ids[train], book_ids[train], weights[train]
+
+    order = np.argsort(train_users, kind='stable')  # keeps each reader's loans in time order
+    sorted_users, sorted_books = train_users[order], train_books[order]
+    starts = np.searchsorted(sorted_users, users, side='left')
+    stops = np.searchsorted(sorted_users, users, side='right')
+    histories = {}
+    for user_id, start, stop, held_out in zip(users.tolist(), starts, stops, book_ids[last].tolist()):
+        history = list(dict.fromkeys(sorted_books[start:stop].tolist()))
+        if history and held_out not in history:
+            histories[user_id] = (history, held_out)
+    return train_users, train_books, train_weights, histories
+
+
+class PopularRecommender:
+    """Most borrowed books in the training loans, minus the reader's own."""
+
+    def __init__(self, book_ids):
+        books, counts = np.unique(book_ids, return_counts=True)
+        order = np.argsort(-counts, kind='stable')
+        self.ranked = list(zip(books[order].tolist(), counts[order].astype(float).tolist()))
+
+    def recommend(self, history, k=10):
+        seen = set(history)
+        return [pair for pair in self.ranked[:k + len(seen)] if pair[0] not in seen][:k]
+
+
+class HybridRecommender:
+    """Item-item candidates topped up with content ones, like ``user_candidates()``."""
+
+    def __init__(self, item, content):
+        self.item, self.content = item, content
+
+    def recommend(self, history, k=10):
+        candidates = self.item.recommend(history, k)
+        if len(candidates) < k:
+            seen = set(history).union(book_id for book_id, _ in candidates)
+            candidates += [
+                (book_id, score) for book_id, score in self.content.recommend(history, k) if book_id not in seen
+            ][:k - len(candidates)]
+        return candidates
+
+
+def build_recommender(name, train, workdir, workers):
+    from django.conf import settings
+    from core.recommendations import ALSModel, CooccurrenceModel, NeighbourFile, build_neighbour_file
+    from core.recommendations.store import build_content_model
+
+    train_users, train_books, train_weights = train
+    if name == 'popular':
+        return PopularRecommender(train_books)
+    if name == 'item-item':
+        return CooccurrenceModel(k=settings.RECOMMENDATIONS_NEIGHBOURS).fit(train_users, train_books)
+    if name == 'item-item-file':
+        path = os.path.join(workdir, 'item_neighbours.bin')
+        build_neighbour_file(path, train_users, train_books, workers=workers, k=settings.RECOMMENDATIONS_NEIGHBOURS)
+        return NeighbourFile(path)
+    if name == 'als':
+        return ALSModel(workers=workers).fit(train_users, train_books, train_weights)
+    if name == 'content':
+        return build_content_model()
+    if name == 'hybrid':
+        return HybridRecommender(
+            build_recommender('item-item', train, workdir, workers),
+            build_recommender('content', train, workdir, workers),
+        )
+    raise ValueError(f"unknown recommender {name!r}")
+
+
+RECOMMENDERS = ('popular', 'item-item', 'item-item-file', 'als', 'content', 'hybrid')
+
+
+def _bucket(length):
+    for low, high in HISTORY_BUCKETS:
+        if high is None or length <= high:
+            return low
+
+
+def quality(model, histories, k, categories, n_books):
+    hits, suggested, diversity = 0, set(), []
+    by_length = {low: [] for low, _ in HISTORY_BUCKETS}
+    for history, held_out in histories:
+        ids = [book_id for book_id, _ in model.recommend(history, k)]
+        hits += held_out in ids
+        by_length[_bucket(len(history))].append(held_out in ids)
+        suggested.update(ids)
+        if len(ids) > 1:
+            same = sum(c * (c - 1) for c in Counter(categories.get(book_id) for book_id in ids).values())
+            diversity.append(1 - same / (len(ids) * (len(ids) - 1)))
+    n = max(len(histories), 1)
+    result = {
+        'precision@k': hits / (n * k),
+        'recall@k': hits / n,
+        'coverage': len(suggested) / max(n_books, 1),
+        'diversity': float(np.mean(diversity)) if diversity else 0.0,
+    }
+    result = {metric: round(value, 4) for metric, value in result.items()}
+    result['recall@k by history length'] = {
+        f'{low}+' if high is None else f'{low}-{high}': {
+            'readers': len(by_length[low]),
+            'recall@k': round(float(np.mean(by_length[low])), 4) if by_length[low] else None,
+        }
+        for low, high in HISTORY_BUCKETS
+    }
+    return result
+
+
+def latency(model, histories, k, requests, threads):
+    calls = [histories[i % len(histories)][0] for i in range(requests)]
+
+    def run(batch):
+        samples = []
+        for history in batch:
+            start = time.perf_counter()
+            model.recommend(history, k)
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    run(calls[:50])  # warm up
+    results = {}
+    for label, workers in (('single', 1), ('concurrent', threads)):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            samples = [s for part in pool.map(run, [calls[i::workers] for i in range(workers)]) for s in part]
+        elapsed = time.perf_counter() - start
+        results[label] = {f'p{p}_ms': round(percentile(samples, p), 4) for p in PERCENTILES}
+        results[label].update(threads=workers, requests_per_s=round(len(samples) / elapsed, 1))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, previous):
+    print(f"\nvs {previous.get('commit') or 'previous run'} ({previous.get('created', '?')}):")
+    for name, result in report['recommenders'].items():
+        before = previous.get('recommenders', {}).get(name)
+        if before is None:
+            print(f"  {name}: new")
+            continue
+        changes = [f"{metric} {before[metric]:.4f} -> {result[metric]:.4f}" for metric in METRICS]
+        for label in ('single', 'concurrent'):
+            old, new = before['latency'][label], result['latency'][label]
+            changes.append(f"{label} p50 {old['p50_ms']:.3f} -> {new['p50_ms']:.3f} ms, "
+                           f"{old['requests_per_s']:.0f} -> {new['requests_per_s']:.0f} req/s")
+        print(f"  {name}:\n    " + '\n    '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=20_000)
+    parser.add_argument('--users', type=int, default=5_000)
+    parser.add_argument('--loans', type=int, default=500_000)
+    parser.add_argument('--recommenders', default=','.join(RECOMMENDERS))
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--sample', type=int, default=2000, help='readers to evaluate')
+    parser.add_argument('--requests', type=int, default=2000, help='recommend() calls per latency run')
+    parser.add_argument('--threads', type=int, default=8, help='threads for the concurrent latency run')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processes for the offline builds')
+    parser.add_argument('--output', default='recommender_eval.json')
+    parser.add_argument('--compare', help='earlier --output file to compare with')
+    parser.add_argument('--reuse', action='store_true', help='keep an already seeded database')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'lms_bench_user_recommendations.sqlite3'))
+    args = parser.parse_args()
+    names = [name.strip() for name in args.recommenders.split(',') if name.strip()]
+    unknown = set(names) - set(RECOMMENDERS)
+    if unknown:
+        parser.error(f"unknown recommenders: {', '.join(sorted(unknown))} (choose from {', '.join(RECOMMENDERS)})")
+
+    reuse = args.reuse and os.path.exists(args.db)
+    benchdb.setup_django(args.db, fresh=not reuse)
+    if not reuse:
+        print(f"Seeding {args.books:,} books, {args.users:,} users, {args.loans:,} loans into {args.db} ...")
+        start = time.perf_counter()
+        benchdb.seed(args.books, args.users, args.loans)
+        print(f"seeded in {time.perf_counter() - start:.0f}s")
+
+    from core.models import Book
+    from core.recommendations.store import weighted_loan_arrays
+
+    user_ids, book_ids, weights = weighted_loan_arrays(order_by=('borrow_date', 'id'))
+    train_users, train_books, train_weights, histories = hold_out_last(user_ids, book_ids, weights)
+    categories = dict(Book.objects.values_list('id', 'category'))
+    rng = random.Random(0)
+    evaluated = sorted(histories)
+    if len(evaluated) > args.sample:
+        evaluated = sorted(rng.sample(evaluated, args.sample))
+    sample = [histories[user_id] for user_id in evaluated]
+    print(f"{len(book_ids):,} loans, {len(histories):,} readers with a new last book, evaluating {len(sample):,}")
+    if not sample:
+        print("no reader has a history to evaluate")
+        return 1
+
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'dataset': {
+            'db': args.db, 'books': len(categories), 'loans': len(book_ids),
+            'readers': len(histories), 'evaluated': len(sample),
+        },
+        'k': args.k,
+        'recommenders': {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            start = time.perf_counter()
+            model = build_recommender(name, (train_users, train_books, train_weights), workdir, args.workers)
+            fitted = time.perf_counter() - start
+            result = {'fit_seconds': round(fitted, 2)}
+            result.update(quality(model, sample, args.k, categories, len(categories)))
+            result['latency'] = latency(model, sample, args.k, args.requests, args.threads)
+            report['recommenders'][name] = result
+            single, concurrent = result['latency']['single'], result['latency']['concurrent']
+            print(f"{name:<15} fit {fitted:6.1f}s  P@{args.k} {result['precision@k']:.4f}  "
+                  f"R@{args.k} {result['recall@k']:.4f}  coverage {result['coverage']:.4f}  "
+                  f"diversity {result['diversity']:.3f}")
+            print(f"{'':<15} R@{args.k} by history length: " + '  '.join(
+                f"{bucket} {found['recall@k']:.4f} ({found['readers']})"
+                for bucket, found in result['recall@k by history length'].items() if found['readers']
+            ))
+            print(f"{'':<15} 1 thread  p50 {single['p50_ms']:.3f} p95 {single['p95_ms']:.3f} "
+                  f"p99 {single['p99_ms']:.3f} ms  {single['requests_per_s']:,.0f} req/s")
+            print(f"{'':<15} {args.threads} threads p50 {concurrent['p50_ms']:.3f} p95 {concurrent['p95_ms']:.3f} "
+                  f"p99 {concurrent['p99_ms']:.3f} ms  {concurrent['requests_per_s']:,.0f} req/s")
+            del model
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())